@@ -30,18 +30,26 @@ int lim_2_val = 0;
 // last command
 int last_command;
 
+// status byte read by the RPi4: bit 0 at left (home) limit, bit 1 moving, bit 2 at right limit
+volatile byte status = 0;
+
 
 // init stepper motors ( for gantry system )
 const int stepsPerRevolution = 200;
 Stepper myStepper(stepsPerRevolution, 11, 10, 9, 8);
 int direction = 0;
 
+// steps per loop: step() blocks until they are done, so a stop (or a limit switch) takes effect within
+// stepChunk steps, 2 steps at 50 rpm = 12 ms (100 steps used to block for 0.6 s)
+const int stepChunk = 2;
+
 
 // setup
 void setup() {
   // Join I2C bus as follower
   Wire.begin(0x8);
   Wire.onReceive(receiveEvent);
+  Wire.onRequest(requestEvent);
 
   // Limit switches
   pinMode(lim_1, INPUT);
@@ -76,12 +84,12 @@ void setSpeed(int dir) {
   // set direction
   // enable and disable enable pins to regulate current flow to stepper motors
   if ( dir == 1 ) {
-    direction = 100;
+    direction = stepChunk;
     digitalWrite(en1, HIGH);
     digitalWrite(en2, HIGH);
   }
   else if ( dir == 2 ) {
-    direction = -100;
+    direction = -stepChunk;
     digitalWrite(en1, HIGH);
     digitalWrite(en2, HIGH);
   }
@@ -93,6 +101,8 @@ void setSpeed(int dir) {
 }
 
 // set solenoid output
+// 3 - 6 open one solenoid (others keep their state so several can pour at once)
+// 7 closes all solenoids, 8 - 11 close one solenoid
 void setSol(int dir) {
   // disable stepper motor
   direction = 0;
@@ -100,10 +110,26 @@ void setSol(int dir) {
   digitalWrite(en2, LOW);
 
   // clear solenoid pinout
-  digitalWrite(Sol1_Pin, LOW);
-  digitalWrite(Sol2_Pin, LOW);
-  digitalWrite(Sol3_Pin, LOW);
-  digitalWrite(Sol4_Pin, LOW);
+  if ( dir == 7 ) {
+    digitalWrite(Sol1_Pin, LOW);
+    digitalWrite(Sol2_Pin, LOW);
+    digitalWrite(Sol3_Pin, LOW);
+    digitalWrite(Sol4_Pin, LOW);
+  }
+
+  // Disable specific solenoid
+  if ( dir == 8 ) {
+    digitalWrite(Sol1_Pin, LOW);
+  }
+  else if ( dir == 9 ) {
+    digitalWrite(Sol2_Pin, LOW);
+  }
+  else if ( dir == 10 ) {
+    digitalWrite(Sol3_Pin, LOW);
+  }
+  else if ( dir == 11 ) {
+    digitalWrite(Sol4_Pin, LOW);
+  }
 
   // Enable specific solenoid
   if ( dir == 3 ) {
@@ -132,6 +158,7 @@ void loop() {
   //set limits 
   lim_1_val = digitalRead(lim_1);
   lim_2_val = digitalRead(lim_2);
+  updateStatus();
   
   // hit right
   if( lim_2_val == 1 ) {
@@ -159,9 +186,31 @@ void moveToStart() {
   Serial.println("restarting");
   while( lim_1_val != 1 ) {
     lim_1_val = digitalRead(lim_1);
+    updateStatus();
     myStepper.step(direction);
   }
   setSpeed(0);
+  updateStatus();
+}
+
+// keep the status byte current for requestEvent
+void updateStatus() {
+  byte s = 0;
+  if ( lim_1_val == 1 ) {
+    s |= 1;
+  }
+  if ( direction != 0 ) {
+    s |= 2;
+  }
+  if ( lim_2_val == 1 ) {
+    s |= 4;
+  }
+  status = s;
+}
+
+// RPi4 I2C read: limit switches and whether the gantry is moving
+void requestEvent() {
+  Wire.write(status);
 }
 
 // RPi4 I2C recieve event
@@ -178,7 +227,7 @@ void receiveEvent(int howMany) {
       setSpeed(in);
     }
     // Pour
-    else if (in == 3 || in == 4 || in == 5 || in == 6 || in == 7){
+    else if (in >= 3 && in <= 11){
       setSol(in);
     }
   }
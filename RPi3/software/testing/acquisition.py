@@ -0,0 +1,108 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Background acquisition for the Arducam TOF camera. A thread owns the camera, copies every depth
+#   frame into a preallocated buffer and releases it right away, then publishes it as the latest
+#   frame. Processing never waits on requestFrame and the camera never waits on processing. Frames
+#   that are not picked up in time are overwritten (dropped), never queued. With amplitude on, each
+#   frame's amplitude image is copied alongside its depth, for per-pixel confidence masking.
+#
+
+
+import threading
+import time
+
+import numpy as np
+
+
+# no frame came from the camera in time (not a TimeoutError, so it is never mistaken for a socket timeout)
+class CameraStall(Exception):
+    pass
+
+
+class Acquisition(threading.Thread):
+    # two buffers alternate between the camera and the published frame, the third keeps the frame the
+    # consumer is still working on from being overwritten
+    n_buffers = 3
+
+    def __init__(self, cam, timeout=200, amplitude=False):
+        super().__init__(daemon=True)
+        self.cam = cam
+        self.timeout = timeout
+        self.amplitude = amplitude  # also copy every frame's amplitude image
+
+        self.buffers = None
+        self.amplitudes = None  # amplitude image of each buffer, when copied
+        self.front = -1         # index of the latest published buffer
+        self.held = -1          # index of the buffer handed to the consumer
+        self.seq = 0            # number of frames published
+        self.stamp = 0.0        # capture time of the latest frame (time.monotonic)
+        self.last_seq = 0       # last frame handed to the consumer
+        self.held_stamp = 0.0   # capture time of the frame handed to the consumer
+        self.dropped = 0        # published frames the consumer never saw
+        self.recorder = None    # optional recorder.Recorder, gets a copy of every frame
+
+        self.cond = threading.Condition()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            frame = self.cam.requestFrame(self.timeout)
+            if frame is None:
+                continue
+            stamp = time.monotonic()
+            depth = frame.getDepthData()
+            amplitude = frame.getAmplitudeData() if self.amplitude else None
+
+            with self.cond:
+                if self.buffers is None or self.buffers[0].shape != depth.shape:
+                    self.buffers = [np.empty(depth.shape, dtype=depth.dtype) for i in range(self.n_buffers)]
+                    self.amplitudes = None
+                    self.front = -1
+                    self.held = -1
+                if amplitude is not None and self.amplitudes is None:
+                    self.amplitudes = [np.empty(amplitude.shape, dtype=amplitude.dtype) for i in range(self.n_buffers)]
+                back = next(i for i in range(self.n_buffers) if i != self.front and i != self.held)
+
+            np.copyto(self.buffers[back], depth)
+            if amplitude is not None:
+                np.copyto(self.amplitudes[back], amplitude)
+            self.cam.releaseFrame(frame)
+            if self.recorder is not None:
+                self.recorder.record(self.buffers[back], stamp)
+
+            with self.cond:
+                if self.seq > self.last_seq:
+                    self.dropped += 1
+                self.front = back
+                self.seq += 1
+                self.stamp = stamp
+                self.cond.notify_all()
+
+    # stop the thread (the camera itself is left to the caller)
+    def stop(self):
+        self.running = False
+        self.join(timeout=1.0)
+
+    # get the newest frame that has not been handed out yet
+    # the returned array is shared with the acquisition thread and stays valid until the next call
+    def latest(self, timeout=1.0):
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > self.last_seq, timeout):
+                raise CameraStall("no frame from camera within " + str(timeout) + " s")
+            self.held = self.front
+            self.last_seq = self.seq
+            self.held_stamp = self.stamp
+
+            return self.buffers[self.held]
+
+    # the frame last handed out by latest() (shared, same lifetime)
+    def current(self):
+        with self.cond:
+            return self.buffers[self.held] if self.held >= 0 else None
+
+    # amplitude image of the frame last handed out by latest() (shared, same lifetime), None if not copied
+    def current_amplitude(self):
+        with self.cond:
+            return self.amplitudes[self.held] if self.held >= 0 and self.amplitudes is not None else None
@@ -0,0 +1,129 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Empty-tray background model. A per-pixel depth map of the bare tray is learned from frames with no
+#   cup in view, kept up to date with a slow moving average while the tray stays empty, and saved to
+#   disk so it survives a restart. Ground height and "how far does this pixel stick up out of the
+#   tray" then come from a subtraction against the model instead of being re-derived every frame.
+#   Frames may come with a confidence mask (see fusion.confidence_mask); masked pixels are neither
+#   learned nor counted as something in view.
+#
+
+
+import os
+
+import numpy as np
+
+import geometry
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'background.npy')
+
+
+class Background:
+    # threshold: height (m) above the tray that counts as something in view
+    # flatness: height spread (m) a frame may have to be learned from before the model is ready
+    # min_frames: frames learned before the model is used, alpha: update rate once it is
+    def __init__(self, path=DEFAULT_PATH, threshold=0.02, flatness=0.03, min_frames=10, alpha=0.05, max_range=0.5, min_pixels=20):
+        self.path = path
+        self.threshold = threshold
+        self.flatness = flatness
+        self.min_frames = min_frames
+        self.alpha = alpha
+        self.max_range = max_range
+        self.min_pixels = min_pixels
+
+        self.depth = None       # per-pixel empty-tray depth (m), nan where never seen
+        self.frames = 0         # frames learned
+        self.changed = False    # learned since the last save
+        self._ground = None
+
+    # the model has seen enough empty frames to be used
+    def ready(self):
+        return self.depth is not None and self.frames >= self.min_frames
+
+    # load a saved model, returns False (and leaves the model empty) if there is none
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            depth = np.load(self.path)
+        except (OSError, ValueError):
+            return False
+        self.depth = depth.astype(float)
+        self.frames = self.min_frames
+        self.changed = False
+        self._ground = None
+        return True
+
+    # save the model atomically
+    def save(self):
+        if self.path is None or self.depth is None:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, self.depth.astype(np.float32))
+        os.replace(tmp, self.path)
+        self.changed = False
+
+    # fold in a depth frame known to show the empty tray
+    def update(self, frame, valid=None):
+        frame = np.asarray(frame, dtype=float)
+        mask = np.isfinite(frame) & (frame > 0) & (frame <= self.max_range)
+        valid = mask if valid is None else mask & valid
+
+        if self.depth is None or self.depth.shape != frame.shape:
+            self.depth = np.where(valid, frame, np.nan)
+            self.frames = 1
+        else:
+            # running mean while learning, slow moving average afterwards
+            rate = max(self.alpha, 1.0 / (self.frames + 1))
+            unseen = valid & np.isnan(self.depth)
+            seen = valid & ~unseen
+            self.depth[unseen] = frame[unseen]
+            self.depth[seen] += rate * (frame[seen] - self.depth[seen])
+            self.frames += 1
+
+        self.changed = True
+        self._ground = None
+
+    # height (m) of every pixel of a depth frame above the empty tray
+    def frame_rise(self, frame):
+        return geometry.frame_heights(self.depth - frame)
+
+    # height (m) of every point of a laserScan above the empty tray (row defaults to the center row)
+    def rise(self, laserScan, row=None):
+        row = self.depth.shape[0] // 2 if row is None else row
+        return geometry.scan_heights(self.depth[row] - laserScan)
+
+    # nothing sticks up out of the tray in this frame
+    def empty(self, frame, valid=None):
+        with np.errstate(invalid='ignore'):
+            rising = self.frame_rise(frame) > self.threshold
+        if valid is not None:
+            rising &= valid
+        return np.count_nonzero(rising) < self.min_pixels
+
+    # learn from a frame if it shows the empty tray, returns whether it was used
+    # before the model is ready, a frame is taken as empty when it is flat
+    def observe(self, frame, valid=None):
+        if self.ready():
+            if not self.empty(frame, valid):
+                return False
+        else:
+            usable = np.isfinite(frame) & (frame > 0) & (frame <= self.max_range)
+            if valid is not None:
+                usable &= valid
+            if np.count_nonzero(usable) < self.min_pixels:
+                return False
+            lo, hi = np.percentile(geometry.frame_heights(frame)[usable], (1, 99))
+            if hi - lo >= self.flatness:
+                return False
+        self.update(frame, valid)
+        return True
+
+    # height (m) of the tray below the camera plane
+    def ground(self):
+        if self._ground is None:
+            self._ground = float(np.nanmedian(geometry.frame_heights(self.depth)))
+        return self._ground
@@ -0,0 +1,146 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Offline calibration of the scan volume estimator. Recorded cups (one .npz per cup, see below) are
+#   measured in a process pool exactly as camera_node.py measures them, then the estimator's constants
+#   are fitted by least squares against the true volumes and written to volume_calibration.json, which
+#   camera_node.py loads at startup. Runs anywhere numpy does, no camera needed.
+#
+#   Recording format (.npz): depth  - (N, rows, cols) or (rows, cols) depth frames (m) of a still cup
+#                            volume - true volume of the cup (oz)
+#                            background (optional) - (rows, cols) depth frame of the empty tray
+#
+#   usage: python3 calibrate.py recordings/ [more.npz ...] [-o volume_calibration.json] [-j workers]
+#
+#   height_scale, radius_scale and shape only ever enter the volume as a product with adjust, so they
+#   are kept as they are and adjust, bend, power and scale are fitted.
+#
+
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import fusion
+import geometry
+import volume_model
+
+
+# measure one recording, returns (inside height, radius, true volume, confidence) or None if no cup
+def measure_recording(path):
+    data = np.load(path)
+    depth = data["depth"]
+    if depth.ndim == 2:
+        depth = depth[None]
+
+    # fuse the center row like camera_node.py's volume buffer
+    buffer = fusion.FrameBuffer(size=len(depth), mode='trimmed')
+    row = depth.shape[1] // 2
+    for frame in depth:
+        buffer.push(frame[row])
+    laserScan = fusion.fill_scan(buffer.fused())
+    if laserScan is None:
+        return None
+
+    gnd = None
+    if "background" in data.files:
+        gnd = float(np.nanmedian(geometry.frame_heights(data["background"])))
+
+    shape = volume_model.measure(laserScan, gnd)
+    return (shape["rim"] - shape["center"], shape["radius"], float(data["volume"]), shape["confidence"])
+
+# least squares fit of adjust, bend, power and scale (knee and the other multipliers are kept)
+# every (adjust, power) pair on a grid is solved for scale and bend in closed form at once
+def fit(height, radius, truth, constants, weights=None):
+    y = np.asarray(truth, dtype=float)
+    w = np.ones_like(y) if weights is None else np.asarray(weights, dtype=float)
+    base = volume_model.volumes(height, radius, dict(constants, adjust=1.0, bend=0.0, scale=1.0))
+
+    def solve(adjusts, powers):
+        u = adjusts[:, None, None] * base[None, None, :]                           # (A, 1, n)
+        k = np.maximum(u - constants["knee"], 0)**powers[None, :, None]            # (A, P, n)
+        u = np.broadcast_to(u, k.shape)
+
+        # weighted normal equations of y = scale * u - (scale * bend) * k
+        suu = (w * u * u).sum(-1)
+        suk = (w * u * k).sum(-1)
+        skk = (w * k * k).sum(-1)
+        suy = (w * u * y).sum(-1)
+        sky = (w * k * y).sum(-1)
+        det = suu * skk - suk**2
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bent = det > 1e-12 * suu * skk
+            scale = np.where(bent, (skk * suy - suk * sky) / det, suy / suu)
+            sb = np.where(bent, (suu * sky - suk * suy) / det, 0.0)
+        sse = (w * (scale[..., None] * u - sb[..., None] * k - y)**2).sum(-1)
+
+        # ties (nothing above the knee) go to the adjust closest to the current one
+        sse = sse + 1e-9 * np.abs(np.log(adjusts / constants["adjust"]))[:, None]
+        a, p = np.unravel_index(np.nanargmin(sse), sse.shape)
+        return adjusts[a], powers[p], scale[a, p], sb[a, p]
+
+    # coarse grid, then a fine one around the best point
+    adjust, power, scale, sb = solve(constants["adjust"] * np.geomspace(0.25, 4, 57), np.linspace(1.0, 3.0, 21))
+    adjust, power, scale, sb = solve(adjust * np.geomspace(0.95, 1.05, 41), np.clip(power + np.linspace(-0.1, 0.1, 21), 0.5, None))
+
+    # with nothing bent above the knee the power means nothing, keep the current one
+    fitted = dict(constants)
+    fitted.update({"adjust": float(adjust), "scale": float(scale), "bend": float(sb / scale) if scale else 0.0})
+    if fitted["bend"] != 0.0:
+        fitted["power"] = float(power)
+    return fitted
+
+# root mean square error (oz) of the constants on the measured recordings
+def rms(height, radius, truth, constants):
+    return float(np.sqrt(np.mean((volume_model.volumes(height, radius, constants) - truth)**2)))
+
+# .npz files given directly or found in given directories
+def recordings(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.npz'))))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fit the scan volume estimator's constants to recorded cups")
+    parser.add_argument("paths", nargs='+', help="recordings (.npz) or directories of them")
+    parser.add_argument("-o", "--output", default=volume_model.CALIBRATION_PATH, help="calibration file to write")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="measuring processes")
+    parser.add_argument("--dry-run", action='store_true', help="fit and report, but don't write the file")
+    args = parser.parse_args()
+
+    files = recordings(args.paths)
+    if not files:
+        sys.exit("no recordings found")
+
+    with multiprocessing.Pool(args.workers) as pool:
+        measured = pool.map(measure_recording, files, chunksize=max(1, len(files) // (4 * args.workers)))
+
+    rows = [m for m in measured if m is not None]
+    print(str(len(rows)) + " of " + str(len(files)) + " recordings measured")
+    if len(rows) < 4:
+        sys.exit("need at least 4 measured recordings to fit")
+    height, radius, truth, confidence = (np.array(column) for column in zip(*rows))
+
+    current = volume_model.load(args.output)
+    fitted = fit(height, radius, truth, current, confidence)
+    before = rms(height, radius, truth, current)
+    after = rms(height, radius, truth, fitted)
+
+    for key in volume_model.DEFAULTS:
+        print(key + ": " + "{:.4f}".format(current[key]) + " -> " + "{:.4f}".format(fitted[key]))
+    print("rms error: " + "{:.3f}".format(before) + " oz -> " + "{:.3f}".format(after) + " oz")
+
+    if not args.dry_run:
+        volume_model.save(dict(fitted, samples=len(rows), rms_oz=after), args.output)
+        print("wrote " + args.output)
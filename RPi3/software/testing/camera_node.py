@@ -11,208 +11,551 @@
 
 import ArducamDepthCamera as ac
 import numpy as np
-import math
-import socket
+import os
+import sys
+import threading
 
-# alert 'Master' node when a cup is centered under TOF camera
-def center(s, cam):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+import log
+import metrics
+import protocol
+
+import acquisition
+import background
+import cup_profiles
+import fill_monitor
+import fusion
+import geometry
+import presence
+import reconstruction
+import recorder
+import rim
+import volume_model
+
+# 'Master' node address, and the station (gantry and valves) this camera watches
+HOST = '169.254.12.13'
+PORT = 9009
+STATION = 0
+
+# volume estimator: 'scan' (center row + experimental multipliers) or 'cloud' (full-frame frustum fit)
+VOLUME_ESTIMATOR = 'scan'
+
+# multipliers of the scan estimator, as fitted by calibrate.py (hand-tuned values if never calibrated)
+VOLUME_CONSTANTS = volume_model.load()
+
+# rolling buffers of recent data, fused per pixel instead of rejecting whole frames
+# (centering uses a short window so a moving cup doesn't lag, volume uses a longer one on a still cup)
+center_buffer = fusion.FrameBuffer(size=3, mode='median')
+volume_buffer = fusion.FrameBuffer(size=5, mode='trimmed')
+frame_buffer = fusion.FrameBuffer(size=5, mode='median')
+
+# empty-tray model: ground height and cup presence by subtraction, learned whenever no cup is in view
+tray = background.Background()
+
+# cup types seen before: a quick look of PROFILE_FRAMES frames is enough to recognise one
+profiles = cup_profiles.ProfileStore()
+PROFILE_FRAMES = 2
+
+# per-pixel confidence: returns weaker than this amplitude are masked (None = mask by range only)
+MIN_AMPLITUDE = 30
+# with confidence masking, the volume scan is done as soon as every column has this many trusted samples
+VOLUME_SAMPLES = 3
+
+# a rim has to stand out of its surroundings at least this much (0 - 1, see rim.detect) to count
+RIM_CONFIDENCE = 0.5
+
+# while centering with nothing in view, only a coarse presence check runs, at IDLE_FPS frames per
+# second (None = never idle, 0 = coarse check on every frame)
+coarse = presence.Presence(min_amplitude=MIN_AMPLITUDE)
+IDLE_FPS = 5
+# idle frames between full-frame updates of the empty-tray model (the tray hardly changes)
+IDLE_LEARN_EVERY = 10
+
+# where per-stage timings are exported at the end of every cycle (Prometheus text, or JSON for *.json)
+METRICS_PATH = '/tmp/smartsip_camera.prom'
+
+# optional flight recorder of raw frames and the decisions made on them (None = off), e.g. '/home/pi/smartsip'
+# keeps the last RECORD_FRAMES frames in <path>.frames / .index, read back with recorder.RecordingReader
+RECORD_PATH = None
+RECORD_FRAMES = 600
+recording = None
+
+# empty frames in a row before a poured cup counts as taken
+REMOVAL_FRAMES = 3
+
+# a camera that sends no frame for this long (s) is given up on, shorter stalls are waited out
+STALL_LIMIT = 10.0
+
+# cleared to stop serve() at the next dropped connection
+serving = True
+
+# cup found by the last volume estimate, used to monitor the pour
+# rim_z / base_z: depth of rim and inside bottom (m), lo / hi: rim columns, volume: oz
+cup = None
+
+# stream cup position to the 'Master' node until it reports the gantry stopped
+# every frame with a cup in view is sent as CENTER telemetry (signed offset and velocity in pixels)
+# while nothing is in view, frames only get the coarse presence check, at the idle frame rate
+def center(conn, acq):
     centering_threshold = 12
     gnd = 0
+    prev_offset = None
+    prev_stamp = None
+    idle = False
+    idle_frames = 0
+
+    # frames from the last cycle show a different cup
+    center_buffer.clear()
     
     while True:
+        # master decides when to stop (it predicts ahead of the camera), then ends centering
+        # (when idle, waiting for it is what spaces the frames out)
+        msg = conn.recv(timeout=1 / IDLE_FPS if idle and IDLE_FPS else 0)
+        if msg is not None and msg.type == protocol.CENTERED:
+            log.info("Centered!")
+            note(acq, "centered")
+            return
+
+        # idle: the full pipeline only picks up again once something turns up
+        if idle:
+            frame = next_frame(acq)
+            if not anything_there(acq):
+                metrics.count('camera_idle_frames_total')
+                idle_frames += 1
+                if idle_frames % IDLE_LEARN_EVERY == 0:
+                    with metrics.timer('camera_background_seconds'):
+                        tray.observe(frame, confidence(acq))
+                continue
+            log.debug("something in view, centering")
+            idle = False
+
         # get laserscan
-        laserScan = get_scan(cam)
-        laserScan_cpy = laserScan.copy()
+        laserScan = get_scan(acq, center_buffer)
+        stamp = acq.held_stamp
         
-        # get ground height
-        gnd = np.amax(laserScan)
-        gnd = get_height(laserScan, gnd, np.where(laserScan == gnd)[0][0])
+        # get ground height (from the empty-tray model once it has been learned)
+        with metrics.timer('camera_ground_seconds'):
+            if tray.ready():
+                gnd = tray.ground()
+            else:
+                gnd_idx = np.argmax(laserScan)
+                gnd = get_height(laserScan, laserScan[gnd_idx], gnd_idx)
         
         # get rims
-        val_1, val_2, idx_1, idx_2 = get_rim(laserScan, 15)
+        with metrics.timer('camera_rim_seconds'):
+            rims = rim.detect(laserScan, 15)
+        val_1, val_2 = rims.val_1, rims.val_2
+        idx_1, idx_2 = int(round(rims.pos_1)), int(round(rims.pos_2))
         
-        # printing
-        string = "gnd: " + str(gnd) + "  " + str(abs(int((idx_1 + idx_2)/2))) + " vs " + str(int(len(laserScan)/2)) 
-        string += " : " + "{:.2}".format(val_1) + " - {:.2}".format(val_2)
-        print(string)
+        # per-frame detail (formatted off the hot path, only written out in a dump)
+        log.debug("gnd: {}  {:.1f} vs {} : {:.2} - {:.2}", float(gnd), (rims.pos_1 + rims.pos_2) / 2, int(len(laserScan)/2), float(val_1), float(val_2), every=0.5)
 
 
-        # check to see if there are two valid rims 
-        if val_1 - gnd < -0.06 and val_2 - gnd < -0.06:
-            print("cup present")
-            
-            avg_pixel = abs(int((idx_1 + idx_2) / 2))
-            cen_pixel = int(len(laserScan) / 2)
-            # check to see if centered
-            if abs(avg_pixel - cen_pixel) < centering_threshold:
-                
-                # additional printing for verbosity
-                print("Centered!")
-                print(avg_pixel)
-                print(cen_pixel)
-                print(str(val_1) + " " + str(idx_1))
-                print(str(val_2) + " " + str(idx_2))
-                print(gnd)
-
-                ret = '1'
-                print("sending centered code!")
-                s.send(ret.encode())
-                return
+        # check to see if there are two valid rims (both standing well out of the tray)
+        if tray.ready():
+            rise = tray.rise(laserScan)
+            present = rise[idx_1] > 0.06 and rise[idx_2] > 0.06
+        else:
+            present = val_1 - gnd < -0.06 and val_2 - gnd < -0.06
+        if present and min(rims.conf_1, rims.conf_2) >= RIM_CONFIDENCE:
+            log.debug("cup present")
             
-            # if not centered
-            else:
-                ret = '0'
-                s.send(ret.encode())
+            # sub-pixel offset from the center column
+            offset = (rims.pos_1 + rims.pos_2) / 2 - len(laserScan) / 2
+
+            # cup velocity from the previous frame with a cup in view
+            velocity = 0.0
+            if prev_offset is not None and stamp > prev_stamp:
+                velocity = (offset - prev_offset) / (stamp - prev_stamp)
+            prev_offset = offset
+            prev_stamp = stamp
+
+            # centered flag is kept as a fallback for the master
+            centered = abs(offset) < centering_threshold
+            status = protocol.pack_center(True, centered, offset, velocity, gnd, val_1, val_2, idx_1, idx_2)
+            conn.send(protocol.CENTER, status, stamp)
+            note(acq, "offset " + "{:.1f}".format(offset))
+            metrics.count('camera_center_messages_total')
+        else:
+            prev_offset = None
+
+            # nothing in view, keep the empty-tray model up to date
+            with metrics.timer('camera_background_seconds'):
+                tray.observe(acq.current(), confidence(acq))
+
+            # not even part of a cup: idle until the coarse check sees one (older frames are stale by then)
+            if IDLE_FPS is not None and not anything_there(acq):
+                idle = True
+                center_buffer.clear()
                 
-# make a volume estimate of a cup based on laserScan
-def volume_estimate(s, cam):
-    # get scan
-    laserScan = get_scan(cam)
-    laserScan_cpy = laserScan.copy()
-    
-    # get rim
-    val_1, val_2, idx_1, idx_2 = get_rim(laserScan, 5)
-    
-    
-    # ground calculation
-    gnd = get_height(laserScan_cpy, laserScan_cpy[idx_1 - 5], idx_1 - 5) + get_height(laserScan_cpy, laserScan_cpy[idx_2 + 5], idx_2 + 5)
-    gnd = gnd / 2
-    
-    # get center
-    centers = np.zeros(20)
-    center_idx = int(len(laserScan_cpy)/2)
-    for i in range(center_idx - 10, center_idx + 10):
-        centers[i - (center_idx - 10)] = gnd - get_height(laserScan_cpy, laserScan_cpy[i], i)
-    center = np.max(centers)
-
-    # pick smaller rim as rim height
-    rim = 0
-    if val_1 < val_2:
-        rim = gnd - get_height(laserScan_cpy, val_1, idx_1)
-        print('\r' + "gnd - " + str(gnd) + " | rim and height --> [" + "{:.3}".format(gnd - val_1) + ' ' + "{:.3}".format(rim) + "]  : center --> [" + "{:.3}".format(center) + "]     ")
+# make a volume estimate of a cup with the selected estimator
+# a known cup type is recognised from a quick look and gets its averaged volume right away
+@metrics.timed('camera_volume_seconds')
+def volume_estimate(conn, acq, estimator=None):
+    estimator = VOLUME_ESTIMATOR if estimator is None else estimator
+
+    # quick look (the frames stay in the buffer for a full scan estimate)
+    volume_buffer.clear()
+    for i in range(PROFILE_FRAMES):
+        laserScan = get_scan(acq, volume_buffer)
+    shape = measure_scan(laserScan)
+    signature = (2 * shape["radius"], shape["rim"], shape["rim"] - shape["center"])
+
+    known = profiles.match(estimator, signature)
+    if known is not None:
+        # refine the profile with this sighting (weighted down for the fewer frames), then trust its average
+        if estimator == 'scan':
+            known.add(signature, scan_volume(shape), shape["confidence"] * PROFILE_FRAMES / volume_buffer.size)
+        log.info("known cup ({} sightings): {}", known.sightings, known.volume)
+        metrics.count('camera_profile_hits_total')
+        note(acq, "known cup " + "{:.2f}".format(known.volume))
+        set_cup(shape, known.volume)
+        return known.volume
+
+    metrics.count('camera_profile_misses_total')
+    if estimator == 'cloud':
+        volume = volume_estimate_cloud(acq)
     else:
-        rim = gnd - get_height(laserScan_cpy, val_2, idx_2)
-        print('\r' + "gnd - " + str(gnd) + " | rim and height --> [" + "{:.3}".format(gnd - val_2) + ' ' + "{:.3}".format(rim) + "]  : center --> [" + "{:.3}".format(center) + "]     ")
+        volume = volume_estimate_scan(conn, acq)
+    if volume > 0:
+        profiles.add(estimator, signature, volume, shape["confidence"])
+    note(acq, estimator + " volume " + "{:.2f}".format(volume))
+    return volume
 
-    # calculate approximate volume
-    h = (rim - center) * 0.9 # <=== experimental multiplier
-    radius = get_radius(laserScan, val_1, val_2, idx_1, idx_2) * 0.78 # <=== experimental multiplier
-    print("height: " + str(h))
-    print("radius: " + str(radius))
+# make a volume estimate of a cup from a full-frame 3D reconstruction
+def volume_estimate_cloud(acq):
+    frame_buffer.clear()
+    for i in range(frame_buffer.size):
+        depth = get_frame(acq, frame_buffer)
+    global cup
+    shape = reconstruction.reconstruct(depth)
+    if shape is None:
+        # the last cycle's cup must not be monitored in its place
+        log.warning("no cup found in point cloud")
+        cup = None
+        return 0.0
 
-    volume = math.pi * radius**2 * h * 0.745 * 33814.023 # <==== experimental multiplier and convert to oz from square meters
-    print("volume: " + str(volume) + " - shape-adjusted volume: " + str(volume * 0.85))
-    
-    # make shape and error adjustments to volume estimation
-    volume = volume * 0.85
-    if volume > 10:
-        volume = volume - 0.05*(volume - 10)**1.8
+    log.info("rim radius: {:.3} base radius: {:.3} height: {:.3}", shape["rim_radius"], shape["base_radius"], shape["height"])
+    volume = reconstruction.frustum_volume(shape)
+    log.info("frustum volume: {}", volume)
 
-    volume = volume * 0.9
-    print("error adjusted volume: " + str(volume))
+    # rim columns in the center row, projected from the fitted circle
+    cols = depth.shape[1]
+    mid = cols / 2 + shape["center"][0] * geometry.FOCAL / shape["rim_z"]
+    half = shape["rim_radius"] * geometry.FOCAL / shape["rim_z"]
+    cup = {"rim_z": shape["rim_z"], "base_z": shape["base_z"], "lo": mid - half, "hi": mid + half, "volume": volume}
+
+    return volume
+
+# make a volume estimate of a cup based on laserScan
+def volume_estimate_scan(conn, acq):
+    # get scan (fused over a full window of frames on the now still cup, on top of the quick look),
+    # or only until every column has enough samples the camera vouches for
+    laserScan = get_scan(acq, volume_buffer)
+    while volume_buffer.count < volume_buffer.size and not trusted(acq, volume_buffer):
+        laserScan = get_scan(acq, volume_buffer)
+    # frames the last estimate was fused from (a count, not a duration for the seconds histograms)
+    metrics.gauge('camera_volume_frames', volume_buffer.count)
+
+    shape = measure_scan(laserScan)
+    volume = scan_volume(shape)
+    set_cup(shape, volume)
     
     return volume
+
+# measure a cup in a laserScan: ground, rim and inside-bottom heights (m), radius and rim columns
+def measure_scan(laserScan):
+    # ground from the empty-tray model, or just outside each rim until it has been learned
+    shape = volume_model.measure(laserScan, tray.ground() if tray.ready() else None)
+    log.debug("gnd - {} | rim height --> [{:.3}]  : center --> [{:.3}]", shape["gnd"], shape["rim"], shape["center"])
+    return shape
+
+# volume (oz) of a cup measured by measure_scan, using the calibrated (or experimental) multipliers
+def scan_volume(shape):
+    volume = volume_model.volume(shape, VOLUME_CONSTANTS)
+    log.info("height: {} radius: {} volume: {}", shape["rim"] - shape["center"], shape["radius"], volume)
+    return volume
+
+# remember the cup measured by measure_scan for monitoring the pour
+def set_cup(shape, volume):
+    global cup
+    cup = {"rim_z": shape["gnd"] - shape["rim"], "base_z": shape["gnd"] - shape["center"], "lo": shape["lo"], "hi": shape["hi"], "volume": volume}
         
-# get laserScan
-def get_scan(cam):
+# watch the cup fill at full frame rate and tell the master when each valve's target is reached
+# targets are (valve, oz) pairs, monitoring ends when the master reports the pour is over
+# a cup that can't be watched is reported to the master (UNMONITORED), whose valve timers then decide
+def monitor(conn, acq, targets):
+    if cup is None:
+        unmonitored(conn, "no cup to monitor")
+        return
+
+    level = fill_monitor.FillMonitor(cup["rim_z"], cup["base_z"], cup["lo"], cup["hi"], cup["volume"])
+    waiting = sorted(targets, key=lambda target: target[1])
+
+    while True:
+        msg = conn.recv(timeout=0)
+        if msg is not None and msg.type == protocol.POURED:
+            return
+
+        depth = next_frame(acq)
+        row = int(depth.shape[0]/2)
+        if not level.usable(depth.shape[1]):
+            unmonitored(conn, "cup too narrow or too shallow to monitor")
+            return
+        frac = level.update(depth[row,:], confidence(acq, row))
+        if frac is None:
+            continue
+
+        # report every target the fill has passed
+        oz = level.fill(frac)
+        while waiting and oz >= waiting[0][1]:
+            valve, target = waiting.pop(0)
+            log.info("valve {} reached {:.2f} oz (target {:.2f})", valve, oz, target)
+            conn.send(protocol.LEVEL, protocol.pack_level(valve, oz), acq.held_stamp)
+            note(acq, "valve " + str(valve) + " at " + "{:.2f}".format(oz))
+
+# tell the master the pour isn't being watched, then wait for it to end like a monitored one
+def unmonitored(conn, reason):
+    log.warning("{}, the master's valve timers decide", reason)
+    metrics.count('camera_pours_unmonitored_total')
+    conn.send(protocol.UNMONITORED)
+    conn.recv_next(protocol.POURED)
+
+# watch the tray until the cup is gone (REMOVAL_FRAMES empty frames in a row), learning the empty tray
+def wait_removed(acq):
+    empty = 0
+    while empty < REMOVAL_FRAMES:
+        frame = next_frame(acq)
+        empty = empty + 1 if tray.observe(frame, confidence(acq)) else 0
+    log.info("cup removed")
+    note(acq, "removed")
+
+# newest frame from the acquisition thread, waiting out camera stalls (the cycle and the master
+# connection are unaffected) until STALL_LIMIT, when acquisition.CameraStall is raised after all
+def next_frame(acq):
+    stalled = 0.0
+    while True:
+        try:
+            return acq.latest(timeout=1.0)
+        except acquisition.CameraStall:
+            stalled += 1.0
+            metrics.count('camera_stalls_total')
+            log.warning("no frame from camera for {:.0f} s", stalled)
+            if stalled >= STALL_LIMIT:
+                raise
+
+# get laserScan fused over the recent frames in buffer
+def get_scan(acq, buffer):
     while(1):
-        # get frame
-        frame = cam.requestFrame(200)
-        depth = frame.getDepthData()
+        # get newest frame from the acquisition thread (no copy, already released to the camera)
+        with metrics.timer('camera_frame_wait_seconds'):
+            depth = next_frame(acq)
+        metrics.count('camera_frames_total')
         size = depth.shape
         
         # derive laserScan across center row (120 pixels across)
-        laserScan = depth[int(size[0]/2),:]
-        
-        cam.releaseFrame(frame)
+        # bad pixels (too weak a return, or values greater than 0.5 meters) are masked per pixel
+        row = int(size[0]/2)
+        buffer.push(depth[row,:], confidence(acq, row))
         
-        # rejection sampling for outlier values ( in our case, values greater than 0.5 meters indicate 'bad' data)
-        if not np.any(laserScan > 0.5):
+        # fill masked pixels from their neighbours, only retry if the whole row was bad
+        fused = buffer.fused()
+        metrics.count('camera_pixels_masked_total', int(np.count_nonzero(np.isnan(fused))))
+        laserScan = fusion.fill_scan(fused)
+        if laserScan is not None:
             return laserScan
+        metrics.count('camera_frames_rejected_total')
+
+# get a full depth frame fused over the recent frames in buffer (pixels never valid are marked nan)
+def get_frame(acq, buffer):
+    depth = next_frame(acq)
+    buffer.push(depth, confidence(acq))
+    return buffer.fused()
+
+# per-pixel confidence mask of the frame last handed out (or of one row of it) from its amplitude,
+# None when masking by range only
+def confidence(acq, row=None):
+    amplitude = acq.current_amplitude() if MIN_AMPLITUDE is not None else None
+    if amplitude is None:
+        return None
+    depth = acq.current()
+    if row is not None:
+        depth, amplitude = depth[row], amplitude[row]
+    return fusion.confidence_mask(depth, amplitude, MIN_AMPLITUDE)
 
-# get indicies and values of rim of a cup
+# coarse presence check of the frame last handed out: anything standing out of the empty tray
+@metrics.timed('camera_presence_seconds')
+def anything_there(acq):
+    return coarse.check(acq.current(), tray, acq.current_amplitude())
+
+# every pixel of buffer has VOLUME_SAMPLES samples the camera vouches for (confidence masking only)
+def trusted(acq, buffer):
+    if MIN_AMPLITUDE is None or acq.current_amplitude() is None:
+        return False
+    return buffer.samples().min() >= VOLUME_SAMPLES
+
+# attach a decision to the frame being worked on, when recording
+def note(acq, decision):
+    if recording is not None:
+        recording.decide(acq.held_stamp, decision)
+
+# tell the recorder which phase of which cycle the next frames belong to
+def phase(name, cycle=None):
+    if recording is not None:
+        recording.phase = name
+        if cycle is not None:
+            recording.cycle = cycle
+
+# get indicies and values of rim of a cup (nearest pixel, see rim.detect for sub-pixel positions)
 def get_rim(laserScan, rad):
-    # find first rim
-    val_1 = np.amin(laserScan)
-    idx_1 =  np.where(laserScan == val_1)[0][0]
-    
-    # ignore radius of pixels around rim
-    for i in range(idx_1 - rad, idx_1 + rad):
-        try:
-            laserScan[i] = 2;
-        except:
-            continue
-            
-    # find second rim
-    val_2 = np.amin(laserScan)
-    idx_2 = np.where(laserScan == val_2)[0][0]
-    return val_1, val_2, idx_1, idx_2
+    rims = rim.detect(laserScan, rad)
+    return rims.val_1, rims.val_2, int(round(rims.pos_1)), int(round(rims.pos_2))
 
 # get the height (z distance from camera plane) of a specified point
 def get_height(laserScan, value, idx):
-    # calculate theta
-    center_offset = abs(len(laserScan)/2 - idx)
-    theta = math.atan(center_offset / 225.69) #  derived from given image dimensions (240 x 180) and 70 diagonal degree view
-
-    # height
-    height  = value * math.cos(theta)
-
-    return height
+    return geometry.height_at(len(laserScan), value, idx)
 
 # get the radius of a cup, specified by two rims (assumes rims indicate actual diameter)
 def get_radius(laserScan, val1, val2, idx1, idx2):
-    # calculate thetas
-    offset1 = abs(len(laserScan)/2 - idx1)
-    offset2 = abs(len(laserScan)/2 - idx2)
-    theta1 = math.atan(offset1 / 225.69)
-    theta2 = math.atan(offset2 / 225.69)
-    
-    # diameter
-    diameter = val1 * math.sin(theta1) + val2 * math.sin(theta2)
+    return geometry.radius(len(laserScan), val1, val2, idx1, idx2)
 
-    return diameter / 2
+# connect to the 'Master' node, retrying with backoff until it is up
+def connect():
+    log.info("connecting to {}:{}", HOST, PORT)
+    with metrics.timer('camera_connect_seconds'):
+        s = protocol.connect(HOST, PORT)
+    log.info("connected")
+    conn = protocol.Connection(s)
+    conn.send(protocol.HELLO, protocol.pack_hello(STATION))
+    return conn
 
-# init TCP communication and Arducam TOF camera
-def init():
-    # init socket (TCP)
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    port = 9009
-    while 1:
-        try:
-            s.connect(('169.254.12.13', port))
-            break
-        except:
-            continue
-    
-    # init ToF camera in 2 meter mode
+# open the Arducam TOF camera in 2 meter mode and wait for its first frame
+# (depth output frames carry the amplitude image too)
+def open_camera():
     cam = ac.ArducamCamera()
     if cam.open(ac.TOFConnect.CSI, 0) != 0:
-        print("Failed to init")
+        log.error("Failed to init")
     if cam.start(ac.TOFOutput.DEPTH) != 0:
-        print("Failed to start")
+        log.error("Failed to start")
 
     cam.setControl(ac.TOFControl.RANG, 2)
+
+    # the first frame takes longest, get it out of the way
+    frame = cam.requestFrame(2000)
+    if frame is not None:
+        cam.releaseFrame(frame)
+    return cam
+
+# init TCP communication and Arducam TOF camera (the camera is brought up while connecting, an error
+# opening it is raised here once connected)
+def init():
+    opened = {}
+
+    def open_in_background():
+        try:
+            opened["cam"] = open_camera()
+        except Exception as e:
+            opened["error"] = e
+
+    opener = threading.Thread(target=open_in_background)
+    opener.start()
+    conn = connect()
+    opener.join()
+    if "error" in opened:
+        raise opened["error"]
+    return conn, opened["cam"]
+
+# run one drink cycle for the master: wait for START, center, estimate volume, monitor the pour
+def run_cycle(conn, acq, cycle):
+    # wait for start code, answering clock sync requests from the master
+    msg = conn.recv()
+    while msg.type == protocol.SYNC:
+        protocol.answer_sync(conn, msg)
+        msg = conn.recv()
+    log.info("{}", protocol.NAMES.get(msg.type))
+    conn.send(protocol.READY)
+    
+    # center
+    phase('center', cycle)
+    with metrics.timer('camera_center_seconds'):
+        center(conn, acq)
+    
+    # get volume estimate and send
+    phase('volume')
+    volume = volume_estimate(conn, acq)
+    conn.send(protocol.VOLUME, protocol.pack_volume(volume), acq.held_stamp)
     
-    return s, cam
+    # wait for pour code, then watch the fill level until the pour is over
+    msg = conn.recv()
+    log.info("{}", protocol.NAMES.get(msg.type))
+    if msg.type == protocol.POUR:
+        phase('pour')
+        with metrics.timer('camera_monitor_seconds'):
+            monitor(conn, acq, protocol.unpack_targets(msg.payload))
+
+        # the master sends the gantry home once the cup has been taken
+        phase('removal')
+        with metrics.timer('camera_removal_seconds'):
+            wait_removed(acq)
+        conn.send(protocol.REMOVED, b'', acq.held_stamp)
+    phase('idle')
+
+    # per-stage timing for this and all previous cycles
+    metrics.gauge('camera_frames_dropped', acq.dropped)
+    if recording is not None:
+        metrics.gauge('camera_frames_recorded', recording.recorded)
+        metrics.gauge('camera_frames_record_dropped', recording.dropped)
+    if tray.changed:
+        tray.save()
+    metrics.export(METRICS_PATH)
+    log.info("{}", metrics.summary())
+
+# serve the master for good: a dropped connection abandons the cycle it broke (the master starts it
+# over) and is re-established while the camera keeps running, then the next cycle waits for START as usual
+# clearing serving makes the next dropped connection the last; a camera gone for good (CameraStall)
+# ends serving, the master sees the connection drop and requeues the order
+def serve(conn, acq):
+    cycle = 0
+    while True:
+        cycle += 1
+        try:
+            run_cycle(conn, acq, cycle)
+        except acquisition.CameraStall:
+            log.error("camera stopped sending frames, giving up")
+            conn.close()
+            raise
+        except (ConnectionError, TimeoutError) as e:
+            # socket failures only, camera stalls are not TimeoutErrors
+            if not serving:
+                conn.close()
+                return
+            log.warning("connection lost ({}), reconnecting", str(e))
+            metrics.count('camera_reconnects_total')
+            phase('idle')
+            conn.close()
+            conn = connect()
 
 
 if __name__ == "__main__":
     # init TCP commuication and TOF camera
-    s, cam = init()
+    conn, cam = init()
 
-    while(1):
-        # wait for start code
-        print(s.recv(1024).decode())
-        
-        # center
-        center(s, cam)
-        
-        # get volume estimate and send
-        volume = volume_estimate(s, cam)
-        ret = str(volume)
-        s.send(ret.encode())
-        
-        # wait for pour code
-        print(s.recv(1024).decode())
+    # run the camera in the background so capture overlaps processing (with amplitude for confidence masking)
+    acq = acquisition.Acquisition(cam, amplitude=MIN_AMPLITUDE is not None)
+    if RECORD_PATH is not None:
+        recording = recorder.Recorder(RECORD_PATH, capacity=RECORD_FRAMES)
+        acq.recorder = recording
+    acq.start()
+
+    # empty-tray model from the last run, or learned now if the tray is clear
+    if tray.load():
+        log.info("background loaded")
+    else:
+        for i in range(tray.min_frames):
+            frame = next_frame(acq)
+            tray.observe(frame, confidence(acq))
+        log.info("background {}", "learned" if tray.ready() else "not learned yet, tray not empty")
 
-    s.close()
\ No newline at end of file
+    # a crash writes out the recent per-frame detail that was only kept in memory
+    with log.dumping():
+        serve(conn, acq)
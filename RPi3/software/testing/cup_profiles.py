@@ -0,0 +1,83 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Store of known cup types. A cup is described by a geometric signature (rim diameter, rim height,
+#   inside depth, all in meters) quantized to a few millimeters. Every full volume estimate of a cup is
+#   folded into its profile as a confidence-weighted average, so a cup type seen often ends up with a
+#   well-averaged volume that can be returned from a quick look. The store is bounded, the least
+#   recently seen profile is dropped first.
+#
+
+
+import collections
+
+import numpy as np
+
+
+class Profile:
+    def __init__(self, kind, geometry, volume, weight):
+        self.kind = kind                                    # estimator the volumes came from
+        self.geometry = np.asarray(geometry, dtype=float)   # weighted mean signature (m)
+        self.volume = volume                                # weighted mean volume (oz)
+        self.weight = weight                                # summed confidence of all sightings
+        self.sightings = 1
+
+    # fold in one more estimate
+    def add(self, geometry, volume, weight):
+        total = self.weight + weight
+        if total <= 0:
+            return
+        self.geometry += (np.asarray(geometry, dtype=float) - self.geometry) * weight / total
+        self.volume += (volume - self.volume) * weight / total
+        self.weight = total
+        self.sightings += 1
+
+
+class ProfileStore:
+    # step: quantization of each signature value (m), a cup matches a profile within one step of each
+    # confidence: summed weight a profile needs before its volume is returned without a full estimate
+    def __init__(self, size=16, step=(0.004, 0.004, 0.004), confidence=2.0):
+        self.size = size
+        self.step = np.asarray(step, dtype=float)
+        self.confidence = confidence
+        self.profiles = collections.OrderedDict()
+
+    def signature(self, geometry):
+        return tuple(int(v) for v in np.round(np.asarray(geometry) / self.step))
+
+    # closest profile from the same estimator within one step of every signature value
+    def find(self, kind, geometry):
+        geometry = np.asarray(geometry, dtype=float)
+        best = None
+        best_dist = None
+        for key, profile in self.profiles.items():
+            if profile.kind != kind:
+                continue
+            diff = np.abs(profile.geometry - geometry) / self.step
+            if np.all(diff <= 1.0) and (best is None or diff.sum() < best_dist):
+                best, best_dist = key, diff.sum()
+        if best is None:
+            return None
+        self.profiles.move_to_end(best)
+        return self.profiles[best]
+
+    # known cup with a volume trusted enough to skip the full estimate, or None
+    def match(self, kind, geometry):
+        profile = self.find(kind, geometry)
+        if profile is None or profile.weight < self.confidence:
+            return None
+        return profile
+
+    # fold an estimate into the cup's profile, starting a new one (and dropping the oldest) if needed
+    def add(self, kind, geometry, volume, weight):
+        profile = self.find(kind, geometry)
+        if profile is not None:
+            profile.add(geometry, volume, weight)
+            return profile
+
+        profile = Profile(kind, geometry, volume, weight)
+        self.profiles[(kind,) + self.signature(geometry)] = profile
+        while len(self.profiles) > self.size:
+            self.profiles.popitem(last=False)
+        return profile
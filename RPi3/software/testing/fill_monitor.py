@@ -0,0 +1,64 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Fill-level monitoring during a pour. The liquid surface is measured in the center row between the
+#   cup's rims (leaving out the pour stream under the nozzle), fused over several frames, and turned
+#   into a fill volume using the cup found by the volume estimate.
+#
+
+
+import numpy as np
+
+import fusion
+import geometry
+
+
+class FillMonitor:
+    # rim_z / base_z: depth (m, from the camera plane) of the rim and the inside bottom of the cup
+    # lo / hi: columns of the cup's rims in the laserScan, volume: estimated cup volume (oz)
+    def __init__(self, rim_z, base_z, lo, hi, volume, stream=6, margin=4, frames=5):
+        self.rim_z = rim_z
+        self.base_z = base_z
+        self.volume = volume
+        self.lo = int(lo)
+        self.hi = int(hi)
+        self.stream = stream
+        self.margin = margin
+        self.buffer = fusion.FrameBuffer(size=frames, mode='median')
+        self.columns = None
+
+    # columns inside the rims, clear of the rim itself and the pour stream
+    def _columns(self, width):
+        idx = np.arange(max(self.lo + self.margin, 0), min(self.hi - self.margin, width))
+        mid = (self.lo + self.hi) / 2
+        return idx[np.abs(idx - mid) > self.stream]
+
+    # whether the cup can be watched at all in a laserScan of the given width: columns left between its
+    # rims and an inside bottom below the rim (if not, update() never returns a fill)
+    def usable(self, width):
+        if self.columns is None:
+            self.columns = self._columns(width)
+        return len(self.columns) > 0 and self.base_z > self.rim_z
+
+    # fold in one laserScan (and its confidence mask, if any), returns the filled fraction of the cup
+    # (0 - 1) or None if nothing usable
+    def update(self, laserScan, valid=None):
+        if not self.usable(len(laserScan)):
+            return None
+
+        # surface height from bearing-corrected depths, fused over the last few frames
+        heights = geometry.scan_heights(laserScan)[self.columns]
+        self.buffer.push(heights, None if valid is None else valid[self.columns])
+        fused = self.buffer.fused()
+        fused = fused[~np.isnan(fused)]
+        if len(fused) == 0:
+            return None
+        surface = np.median(fused)
+
+        frac = (self.base_z - surface) / (self.base_z - self.rim_z)
+        return float(min(max(frac, 0.0), 1.0))
+
+    # fill volume (oz) for a filled fraction
+    def fill(self, frac):
+        return frac * self.volume
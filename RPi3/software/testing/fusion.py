@@ -0,0 +1,133 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Temporal fusion of noisy TOF data. A fixed-size ring buffer keeps the most recent depth frames (or
+#   laserScans) together with a per-pixel validity mask, so a bad pixel only costs one masked sample
+#   instead of the whole frame. Fused output is available after every push. Pixels can also be masked
+#   by the camera's own confidence (amplitude), which catches bad returns that land inside the range.
+#
+
+
+import numpy as np
+
+MODES = ('median', 'trimmed', 'ema')
+
+
+class FrameBuffer:
+    def __init__(self, size=5, mode='median', trim=0.2, alpha=0.5, max_range=0.5):
+        if mode not in MODES:
+            raise ValueError("unknown fusion mode: " + str(mode))
+
+        self.size = size
+        self.mode = mode
+        self.trim = trim
+        self.alpha = alpha
+        self.max_range = max_range
+
+        # storage is allocated on the first push, once the frame shape is known
+        self.data = None
+        self.valid = None
+        self.ema = None
+        self.count = 0
+        self.head = 0
+
+    # forget all buffered frames
+    def clear(self):
+        self.count = 0
+        self.head = 0
+        if self.ema is not None:
+            self.ema[:] = np.nan
+
+    # add a frame, marking pixels outside (0, max_range] as invalid, as well as any pixel that valid
+    # (a mask of the same shape, e.g. from confidence_mask) marks invalid
+    def push(self, frame, valid=None):
+        frame = np.asarray(frame)
+        if self.data is None or self.data.shape[1:] != frame.shape:
+            self.data = np.empty((self.size,) + frame.shape)
+            self.valid = np.zeros((self.size,) + frame.shape, dtype=bool)
+            self.ema = np.full(frame.shape, np.nan)
+            self.count = 0
+            self.head = 0
+
+        slot = self.head
+        np.copyto(self.data[slot], frame)
+        np.logical_and(np.isfinite(frame), frame > 0, out=self.valid[slot])
+        self.valid[slot] &= frame <= self.max_range
+        if valid is not None:
+            self.valid[slot] &= valid
+
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+        # exponential moving average is updated incrementally
+        mask = self.valid[slot]
+        fresh = mask & np.isnan(self.ema)
+        self.ema[fresh] = frame[fresh]
+        blend = mask & ~fresh
+        self.ema[blend] += self.alpha * (frame[blend] - self.ema[blend])
+
+        return mask
+
+    # fraction of valid samples per pixel in the buffered window
+    def coverage(self):
+        if self.count == 0:
+            return None
+        return self.valid[:self.count].mean(axis=0)
+
+    # number of valid samples per pixel in the buffered window
+    def samples(self):
+        if self.count == 0:
+            return None
+        return self.valid[:self.count].sum(axis=0)
+
+    # fuse the buffered frames; pixels with no valid sample are nan
+    def fused(self):
+        if self.count == 0:
+            return None
+
+        if self.mode == 'ema':
+            return self.ema.copy()
+
+        data = np.where(self.valid[:self.count], self.data[:self.count], np.nan)
+
+        if self.mode == 'median':
+            k = self.valid[:self.count].sum(axis=0)
+            out = np.full(data.shape[1:], np.nan)
+            ok = k > 0
+            out[ok] = np.nanmedian(data[:, ok], axis=0)
+            return out
+
+        # trimmed mean: nan sorts last, so valid samples occupy ranks [0, k)
+        data.sort(axis=0)
+        k = self.valid[:self.count].sum(axis=0)
+        lo = np.floor(k * self.trim).astype(int)
+        ranks = np.arange(self.count).reshape((-1,) + (1,) * (data.ndim - 1))
+        keep = (ranks >= lo) & (ranks < k - lo)
+        n = keep.sum(axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 0, np.where(keep, data, 0).sum(axis=0) / n, np.nan)
+
+
+# per-pixel validity of a depth frame (or laserScan) from its amplitude: a return too weak to trust
+# (below min_amplitude) or outside (0, max_range] is invalid
+def confidence_mask(depth, amplitude, min_amplitude, max_range=0.5):
+    valid = amplitude >= min_amplitude
+    valid &= depth > 0
+    valid &= depth <= max_range
+    return valid
+
+# fill invalid (nan) points of a laserScan from their valid neighbours
+def fill_scan(laserScan):
+    bad = np.isnan(laserScan)
+    if not np.any(bad):
+        return laserScan
+    good = ~bad
+    if not np.any(good):
+        return None
+
+    idx = np.arange(len(laserScan))
+    filled = laserScan.copy()
+    filled[bad] = np.interp(idx[bad], idx[good], laserScan[good])
+    return filled
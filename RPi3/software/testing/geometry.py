@@ -0,0 +1,89 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Bearing corrections for Arducam TOF depth data. The cos/sin of each pixel's bearing only depends
+#   on the sensor dimensions and field of view, so the tables are computed once and cached. Whole
+#   laserScans (or batches of them) and whole depth frames are then corrected with a single numpy
+#   multiply instead of per-pixel trig calls.
+#
+
+
+import numpy as np
+from functools import lru_cache
+
+# derived from given image dimensions (240 x 180) and 70 diagonal degree view
+FOCAL = 225.69
+
+
+# build read-only cos/sin tables for the bearing of every column in a laserScan
+@lru_cache(maxsize=8)
+def column_tables(width, focal=FOCAL):
+    offsets = np.abs(width / 2 - np.arange(width))
+    theta = np.arctan(offsets / focal)
+
+    cos = np.cos(theta)
+    sin = np.sin(theta)
+    cos.flags.writeable = False
+    sin.flags.writeable = False
+
+    return cos, sin
+
+# build read-only cos/sin tables for the bearing of every pixel in a depth frame
+@lru_cache(maxsize=8)
+def pixel_tables(shape, focal=FOCAL):
+    rows, cols = shape
+    dy = rows / 2 - np.arange(rows)
+    dx = cols / 2 - np.arange(cols)
+    theta = np.arctan(np.hypot(dy[:, None], dx[None, :]) / focal)
+
+    cos = np.cos(theta)
+    sin = np.sin(theta)
+    cos.flags.writeable = False
+    sin.flags.writeable = False
+
+    return cos, sin
+
+# get the height (z distance from camera plane) of every point in a laserScan (or a stack of them)
+def scan_heights(laserScan, focal=FOCAL):
+    cos, _ = column_tables(laserScan.shape[-1], focal)
+    return laserScan * cos
+
+# get the lateral distance from the optical axis of every point in a laserScan (or a stack of them)
+def scan_offsets(laserScan, focal=FOCAL):
+    _, sin = column_tables(laserScan.shape[-1], focal)
+    return laserScan * sin
+
+# get the height (z distance from camera plane) of every pixel in a depth frame
+def frame_heights(depth, focal=FOCAL):
+    cos, _ = pixel_tables(depth.shape[-2:], focal)
+    return depth * cos
+
+# get the height of a single range value as seen at column idx of a scan of the given width
+# (a column outside the scan is an error, a negative one would silently wrap around to the other end)
+def height_at(width, value, idx, focal=FOCAL):
+    if not 0 <= idx < width:
+        raise IndexError("column " + str(idx) + " outside a scan of width " + str(width))
+    cos, _ = column_tables(width, focal)
+    return value * cos[idx]
+
+# get the radius of a cup, specified by two rims (assumes rims indicate actual diameter)
+def radius(width, val1, val2, idx1, idx2, focal=FOCAL):
+    _, sin = column_tables(width, focal)
+    return (val1 * sin[idx1] + val2 * sin[idx2]) / 2
+
+# build read-only unit ray directions (x, y, z) through every pixel of a depth frame
+@lru_cache(maxsize=8)
+def pixel_rays(shape, focal=FOCAL):
+    rows, cols = shape
+    dy = np.arange(rows) - rows / 2
+    dx = np.arange(cols) - cols / 2
+
+    rays = np.empty((rows, cols, 3))
+    rays[..., 0] = dx[None, :]
+    rays[..., 1] = dy[:, None]
+    rays[..., 2] = focal
+    rays /= np.linalg.norm(rays, axis=-1, keepdims=True)
+    rays.flags.writeable = False
+
+    return rays
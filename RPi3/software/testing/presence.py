@@ -0,0 +1,54 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Coarse cup presence check, the cheap first stage in front of rim detection. Only a band of rows
+#   around the center row (the one the rims are found in) is looked at, and only every step-th row and
+#   column of it, compared against the same pixels of the empty-tray model. A few hundred pixels
+#   instead of the whole frame answer "is anything there?"; the full centering pipeline only runs once
+#   this says yes.
+#
+
+
+import numpy as np
+
+import fusion
+import geometry
+
+
+class Presence:
+    # band: rows looked at on either side of the center row, step: keep every step-th row and column
+    # threshold: height (m) above the tray that counts, min_pixels: coarse pixels that have to rise
+    # min_amplitude: returns weaker than this are ignored (None = range only)
+    def __init__(self, band=8, step=4, threshold=0.03, min_pixels=3, min_amplitude=None, max_range=0.5):
+        self.band = band
+        self.step = step
+        self.threshold = threshold
+        self.min_pixels = min_pixels
+        self.min_amplitude = min_amplitude
+        self.max_range = max_range
+
+    # rows of the band in a frame of the given number of rows, as offsets from its center row
+    def offsets(self, rows):
+        center = rows // 2
+        offsets = np.arange(-self.band, self.band + 1, self.step)
+        return offsets[(center + offsets >= 0) & (center + offsets < rows)]
+
+    # something stands out of the tray in the band of a depth frame (or a row of one)
+    # without a learned tray there is nothing to compare to, and the answer is always yes
+    def check(self, frame, tray, amplitude=None):
+        if not tray.ready():
+            return True
+        offsets = self.offsets(frame.shape[0])
+        rows = frame.shape[0] // 2 + offsets
+        depth = frame[rows, ::self.step]
+        empty = tray.depth[tray.depth.shape[0] // 2 + offsets, ::self.step]
+        cos = geometry.pixel_tables(frame.shape)[0][rows, ::self.step]
+
+        if amplitude is not None and self.min_amplitude is not None:
+            valid = fusion.confidence_mask(depth, amplitude[rows, ::self.step], self.min_amplitude, self.max_range)
+        else:
+            valid = (depth > 0) & (depth <= self.max_range)
+        with np.errstate(invalid='ignore'):
+            valid &= (empty - depth) * cos > self.threshold
+        return np.count_nonzero(valid) >= self.min_pixels
@@ -0,0 +1,127 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Full-frame cup reconstruction. Instead of a single center row, every pixel of the depth frame is
+#   turned into a 3D point using cached ray directions. The rim circle is fitted with a vectorized
+#   RANSAC + least squares fit, the inner wall is fitted as a frustum and the volume is integrated
+#   from the fitted shape.
+#
+
+
+import numpy as np
+
+import geometry
+
+# m^3 to oz
+M3_TO_OZ = 33814.023
+
+
+# convert a depth frame into an (N, 3) point cloud of valid pixels (z measured down from the camera)
+def point_cloud(depth, max_range=0.5):
+    rays = geometry.pixel_rays(depth.shape)
+    valid = np.isfinite(depth) & (depth > 0) & (depth < max_range)
+
+    return rays[valid] * depth[valid][:, None]
+
+# least squares circle through a set of 2D points (algebraic fit)
+def fit_circle(xy):
+    A = np.column_stack((xy[:, 0], xy[:, 1], np.ones(len(xy))))
+    b = (xy ** 2).sum(axis=1)
+    (a0, a1, a2), *_ = np.linalg.lstsq(A, b, rcond=None)
+
+    cx = a0 / 2
+    cy = a1 / 2
+    r = np.sqrt(max(a2 + cx**2 + cy**2, 0))
+    return cx, cy, r
+
+# robust circle fit: score many random 3-point circles at once, then refine on the best inlier set
+def ransac_circle(xy, iterations=200, tol=0.003, rng=None):
+    if len(xy) < 3:
+        return None
+
+    rng = np.random.default_rng(0) if rng is None else rng
+    samples = xy[rng.integers(0, len(xy), size=(iterations, 3))]
+
+    # circumcircle of every sampled triple
+    p1, p2, p3 = samples[:, 0], samples[:, 1], samples[:, 2]
+    d = 2 * (p1[:, 0] * (p2[:, 1] - p3[:, 1]) + p2[:, 0] * (p3[:, 1] - p1[:, 1]) + p3[:, 0] * (p1[:, 1] - p2[:, 1]))
+    ok = np.abs(d) > 1e-12
+    if not np.any(ok):
+        return fit_circle(xy)
+    p1, p2, p3, d = p1[ok], p2[ok], p3[ok], d[ok]
+
+    s1 = (p1 ** 2).sum(axis=1)
+    s2 = (p2 ** 2).sum(axis=1)
+    s3 = (p3 ** 2).sum(axis=1)
+    cx = (s1 * (p2[:, 1] - p3[:, 1]) + s2 * (p3[:, 1] - p1[:, 1]) + s3 * (p1[:, 1] - p2[:, 1])) / d
+    cy = (s1 * (p3[:, 0] - p2[:, 0]) + s2 * (p1[:, 0] - p3[:, 0]) + s3 * (p2[:, 0] - p1[:, 0])) / d
+    r = np.hypot(p1[:, 0] - cx, p1[:, 1] - cy)
+
+    # count inliers for every candidate in one broadcast
+    dist = np.abs(np.hypot(xy[None, :, 0] - cx[:, None], xy[None, :, 1] - cy[:, None]) - r[:, None])
+    inliers = dist < tol
+    best = np.argmax(inliers.sum(axis=1))
+
+    if inliers[best].sum() < 3:
+        return fit_circle(xy)
+    return fit_circle(xy[inliers[best]])
+
+# reconstruct a cup from a full depth frame
+# returns a dict of the fitted shape, or None if no cup could be found
+def reconstruct(depth, cup_threshold=0.03, rim_band=0.01):
+    points = point_cloud(depth)
+    if len(points) < 10:
+        return None
+
+    # ground is the far end of the height distribution
+    gnd = np.percentile(points[:, 2], 95)
+
+    # anything well above ground belongs to the cup, the top of it is the rim
+    cup = points[points[:, 2] < gnd - cup_threshold]
+    if len(cup) < 10:
+        return None
+    rim_z = np.percentile(cup[:, 2], 5)
+    rim_pts = cup[cup[:, 2] < rim_z + rim_band]
+
+    circle = ransac_circle(rim_pts[:, :2])
+    if circle is None:
+        return None
+    cx, cy, R = circle
+
+    # radial distance of every point from the fitted cup axis
+    rho = np.hypot(points[:, 0] - cx, points[:, 1] - cy)
+    inside = (rho < R) & (points[:, 2] > rim_z + rim_band)
+    if not np.any(inside):
+        return None
+
+    # base is the floor of the cup seen around its axis
+    core = inside & (rho < 0.4 * R)
+    base_z = np.median(points[core, 2]) if np.any(core) else np.max(points[inside, 2])
+    base_z = min(base_z, gnd)
+
+    # visible inner wall: fit radius as a linear function of depth (frustum)
+    wall = inside & (rho > 0.4 * R) & (points[:, 2] < base_z - 0.005)
+    r_base = R
+    if np.count_nonzero(wall) >= 10:
+        A = np.column_stack((np.ones(np.count_nonzero(wall)), points[wall, 2]))
+        (a, b), *_ = np.linalg.lstsq(A, rho[wall], rcond=None)
+        r_base = float(np.clip(a + b * base_z, 0.3 * R, R))
+
+    return {
+        "center": (cx, cy),
+        "rim_radius": R,
+        "base_radius": r_base,
+        "rim_z": rim_z,
+        "base_z": base_z,
+        "ground": gnd,
+        "height": base_z - rim_z,
+    }
+
+# integrate the volume (oz) of a fitted frustum
+def frustum_volume(shape, scale=1.0):
+    R = shape["rim_radius"]
+    r = shape["base_radius"]
+    h = max(shape["height"], 0)
+
+    return np.pi * h / 3 * (R**2 + R * r + r**2) * M3_TO_OZ * scale
@@ -0,0 +1,165 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Flight recorder for depth frames. Raw frames go into a preallocated ring file (np.memmap) next to a
+#   small index of capture time, cycle, phase and the decision made on each frame, so the last minute
+#   or so of what the camera saw is always on disk. The acquisition thread only copies a frame into a
+#   free staging slot (dropping it if none is free); a writer thread moves it into the ring file.
+#
+#   A recording is three files: <path>.json (shape, capacity), <path>.frames and <path>.index.
+#   RecordingReader slices a recording by cycle or time range without copying the frames, unless the
+#   slice runs across the end of the ring (or a phase filter leaves gaps), where it has to be gathered
+#   into a copy. Size the ring for the longest stretch you want to read as a view, e.g. for replay
+#   through the simulated camera:
+#
+#       frames, index = RecordingReader('/tmp/smartsip').cycle(12)
+#       ac.configure(replay=frames)
+#
+
+
+import json
+import queue
+import threading
+
+import numpy as np
+
+PHASES = ('idle', 'center', 'volume', 'pour', 'removal')
+
+INDEX_DTYPE = np.dtype([
+    ('seq', '<u8'),         # 0 = slot never written
+    ('stamp', '<f8'),       # capture time (time.monotonic on the camera node)
+    ('cycle', '<u4'),
+    ('phase', 'u1'),        # index into PHASES
+    ('decision', 'S32'),
+])
+
+
+class Recorder:
+    # capacity: frames kept in the ring file, staging: frames that can wait for the writer thread
+    def __init__(self, path, shape=(180, 240), capacity=600, staging=8):
+        self.path = path
+        self.shape = tuple(shape)
+        self.capacity = capacity
+
+        with open(path + '.json', 'w') as f:
+            json.dump({"shape": self.shape, "capacity": capacity, "dtype": "float32"}, f)
+        self.frames = np.memmap(path + '.frames', dtype=np.float32, mode='w+', shape=(capacity,) + self.shape)
+        self.index = np.memmap(path + '.index', dtype=INDEX_DTYPE, mode='w+', shape=(capacity,))
+
+        self.cycle = 0
+        self.phase = 'idle'
+        self.seq = 0
+        self.recorded = 0
+        self.dropped = 0
+
+        # staging slots go round free -> queue -> ring file -> free
+        self.staged = [np.empty(self.shape, dtype=np.float32) for i in range(staging)]
+        self.free = queue.SimpleQueue()
+        for i in range(staging):
+            self.free.put(i)
+        self.queue = queue.SimpleQueue()
+        self.slots = {}         # capture time -> ring slot, for decisions made after the frame was written
+        self.lock = threading.Lock()
+
+        self.writer = threading.Thread(target=self._run, daemon=True)
+        self.writer.start()
+
+    # copy a frame for recording, never waits (the frame is dropped if the writer is behind)
+    def record(self, depth, stamp):
+        if depth.shape != self.shape:
+            self.dropped += 1
+            return
+        try:
+            i = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return
+        np.copyto(self.staged[i], depth, casting='unsafe')
+        self.queue.put(('frame', i, stamp, self.cycle, PHASES.index(self.phase)))
+
+    # attach a decision (short text) to the frame captured at stamp
+    def decide(self, stamp, decision):
+        self.queue.put(('decision', stamp, decision))
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join(timeout=1.0)
+        self.frames.flush()
+        self.index.flush()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            if item[0] == 'frame':
+                _, i, stamp, cycle, phase = item
+                self.seq += 1
+                slot = (self.seq - 1) % self.capacity
+
+                # invalidate the slot first so a reader never pairs old metadata with a new frame
+                self.index['seq'][slot] = 0
+                self.frames[slot] = self.staged[i]
+                self.free.put(i)
+                self.index[slot] = (self.seq, stamp, cycle, phase, b'')
+
+                with self.lock:
+                    self.slots[stamp] = slot
+                    if len(self.slots) > self.capacity:
+                        self.slots.pop(next(iter(self.slots)))
+                self.recorded += 1
+            else:
+                _, stamp, decision = item
+                with self.lock:
+                    slot = self.slots.get(stamp)
+                if slot is not None:
+                    self.index['decision'][slot] = decision.encode()[:INDEX_DTYPE['decision'].itemsize]
+
+
+class RecordingReader:
+    def __init__(self, path):
+        with open(path + '.json') as f:
+            header = json.load(f)
+        shape = (header["capacity"],) + tuple(header["shape"])
+        self.frames = np.memmap(path + '.frames', dtype=header["dtype"], mode='r', shape=shape)
+        self.index = np.memmap(path + '.index', dtype=INDEX_DTYPE, mode='r', shape=(header["capacity"],))
+        self.refresh()
+
+    # re-read the index (a recording can be read while it is still being written)
+    def refresh(self):
+        seq = np.array(self.index['seq'])
+        written = np.flatnonzero(seq)
+        self.order = written[np.argsort(seq[written])]     # ring slots, oldest first
+
+    def __len__(self):
+        return len(self.order)
+
+    def cycles(self):
+        return np.unique(self.index['cycle'][self.order])
+
+    # frames and index entries of the given positions in recording order
+    # a view into the ring file when they are contiguous in it, a copy when they wrap around its end
+    # (or a phase filter leaves gaps)
+    def _take(self, positions):
+        if len(positions) == 0:
+            return self.frames[:0], self.index[:0]
+        slots = self.order[positions]
+        if np.all(np.diff(slots) == 1):
+            return self.frames[slots[0]:slots[-1] + 1], self.index[slots[0]:slots[-1] + 1]
+        return self.frames[slots], self.index[slots]
+
+    # everything recorded during one cycle, optionally only in one phase
+    def cycle(self, cycle, phase=None):
+        entries = self.index[self.order]
+        keep = entries['cycle'] == cycle
+        if phase is not None:
+            keep &= entries['phase'] == PHASES.index(phase)
+        return self._take(np.flatnonzero(keep))
+
+    # everything captured between two times (same clock as the recorded stamps)
+    def between(self, start, end):
+        stamps = self.index['stamp'][self.order]
+        lo, hi = np.searchsorted(stamps, (start, end), side='left')
+        return self._take(np.arange(lo, hi))
@@ -0,0 +1,159 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Vectorized rim detection. A cup's rims are the two closest local minima of a smoothed laserScan,
+#   at least a rim radius apart. Positions are refined to sub-pixel accuracy with a parabola
+#   through the minimum and its neighbours, and each rim gets a confidence from how far it stands out
+#   of its surroundings. Works on one scan or a stack of scans (last axis) and never modifies input;
+#   a single scan takes a scalar path with the same results, cheaper than the batch arrays for one row.
+#
+
+
+import collections
+
+import numpy as np
+
+Rims = collections.namedtuple('Rims', 'val_1 val_2 pos_1 pos_2 conf_1 conf_2')
+
+
+# moving sum of window pixels along the last axis of one scan (W,) or rows of scans (N, W), only where
+# the window fits (window is made odd and no wider than the scan): sums[..., j] is centered on pixel
+# j + window // 2. A moving average without the division, which ranks pixels the same, and nothing to
+# pad: the outermost window // 2 pixels just aren't centers
+def smooth(scans, window=3):
+    width = scans.shape[-1]
+    kernel = (1.0,) * (2 * min(window // 2, (width - 1) // 2) + 1)
+    if scans.ndim == 1:
+        return np.correlate(scans, kernel, 'valid')
+    return np.array([np.correlate(row, kernel, 'valid') for row in scans])
+
+# parabolic refinement of minima at integer indices idx (shape (N, K)) of the rows of y (shape (N, W)),
+# returns (position, value); minima next to a depth edge (a neighbour more than edge (m) further away,
+# e.g. tray beside the rim) are left on their pixel, a parabola across the edge would put them well
+# in front of the rim
+def _refine(y, rows, idx, edge):
+    width = y.shape[-1]
+    left = y[rows, np.maximum(idx - 1, 0)]
+    mid = y[rows, idx]
+    right = y[rows, np.minimum(idx + 1, width - 1)]
+
+    curve = left - 2 * mid + right
+    smooth_min = (idx > 0) & (idx < width - 1) & (curve > 0) & (np.maximum(left, right) - mid <= edge)
+    shift = 0.5 * (left - right) / np.where(smooth_min, curve, np.inf)
+    shift[~(np.abs(shift) <= 0.5)] = 0.0
+
+    return idx + shift, mid - 0.25 * (left - right) * shift
+
+# how far minima at idx stand out of the +-rad window around them, mapped to 0 - 1
+def _confidence(y, idx, val, rad, depth):
+    near = np.abs(np.arange(y.shape[-1]) - idx[..., None]) <= rad
+    surround = np.max(np.where(near, y[:, None], -np.inf), axis=-1)
+    return np.minimum(np.maximum((surround - val) / depth, 0.0), 1.0)
+
+# local minima along the last axis: lower than the pixel before and no higher than the one after
+# (the first pixel of a flat bottom), the ends of the scan count if they fall away towards them
+def local_minima(y):
+    minima = np.ones(y.shape, dtype=bool)
+    minima[..., 1:] &= y[..., 1:] < y[..., :-1]
+    minima[..., :-1] &= y[..., :-1] <= y[..., 1:]
+    return minima
+
+# move each index to the lowest pixel of its row of y within +-half of it
+def _snap(y, rows, idx, half):
+    if half == 0:
+        return idx
+    window = np.minimum(np.maximum(idx[..., None] + np.arange(-half, half + 1), 0), y.shape[-1] - 1)
+    lowest = np.argmin(y[rows[..., None], window], axis=-1)
+    return np.take_along_axis(window, lowest[..., None], -1)[..., 0]
+
+# _snap(), _refine() and _confidence() of a single minimum at idx of the raw scan, returns
+# (value, position, confidence)
+def _measure_one(raw, idx, half, rad, depth, edge):
+    lo = max(idx - half, 0)
+    start = max(lo - 1, 0)
+    near = raw[start:idx + half + 2].tolist()
+    k = near.index(min(near[lo - start:idx + half + 1 - start]), lo - start)
+    idx = start + k
+    val = mid = near[k]
+    pos = float(idx)
+    if 0 < idx < len(raw) - 1:
+        left, right = near[k - 1], near[k + 1]
+        curve = left - 2 * mid + right
+        if curve > 0 and max(left, right) - mid <= edge:
+            shift = 0.5 * (left - right) / curve
+            if abs(shift) <= 0.5:
+                pos, val = idx + shift, mid - 0.25 * (left - right) * shift
+    start = max(idx - rad, 0)
+    surround = raw.item(start + int(raw[start:idx + rad + 1].argmax()))
+    return val, pos, min(max((surround - val) / depth, 0.0), 1.0)
+
+# detect() on a single scan with plain slicing and scalar math, the batch path's (N, W) and (N, 2, W)
+# temporaries cost more than the work on one row. The scan isn't converted first: the sums, lists and
+# items it is read through are float64 whatever its dtype, as the batch path's converted copy is
+#
+# the lowest pixel of y is always a local minimum, and so is the lowest pixel outside rad (anything
+# before it is higher, anything after it no lower) unless it sits on the slope down into the blocked
+# pixels; only then are the local minima searched
+def _detect_one(raw, rad, window, depth, edge):
+    half = window // 2
+    y = smooth(raw, window) if half else raw
+    idx_1 = int(y.argmin())
+
+    lo, hi = max(idx_1 - rad + 1, 0), idx_1 + rad
+    masked = y.astype(float)
+    masked[lo:hi] = np.inf
+    idx_2 = int(masked.argmin())
+    if (idx_2 == lo - 1 and not y[idx_2] <= y[lo]) or (idx_2 == hi and not y[idx_2] < y[hi - 1]):
+        candidates = np.where(local_minima(y), masked, np.inf)
+        lowest = int(candidates.argmin())
+        if candidates[lowest] < np.inf:
+            idx_2 = lowest
+
+    # back on the raw scan, at the pixels the windows are centered on
+    val_1, pos_1, conf_1 = _measure_one(raw, idx_1 + half, half, 2 * rad, depth, edge)
+    val_2, pos_2, conf_2 = _measure_one(raw, idx_2 + half, half, 2 * rad, depth, edge)
+    return Rims(val_1, val_2, pos_1, pos_2, conf_1, conf_2)
+
+# find both rims in a laserScan (shape (W,)) or a stack of them (shape (..., W))
+# rad: pixels around the first rim that can't hold the second, window: smoothing width (1 = none)
+# depth: how far (m) a rim has to stand out of the +-2 rad window around it for full confidence
+# edge: jump (m) to a neighbouring pixel above which a rim is not refined past its pixel
+#
+# rims are picked among the local minima of the smoothed scan (noise can't win on its own, and the
+# second rim can't be a point on the slope of the first just outside rad), then measured on the raw scan
+# (smoothing would lift the rim's range), where snapping can still move them onto the outermost
+# window // 2 pixels; a scan with a single local minimum falls back on the closest
+# point outside rad for the second rim
+def detect(laserScan, rad=15, window=3, depth=0.05, edge=0.02):
+    scans = np.asarray(laserScan)
+    if scans.ndim == 1 and len(scans) > window:
+        return _detect_one(scans, rad, window, depth, edge)
+    scans = np.asarray(scans, dtype=float)
+    shape = scans.shape[:-1]
+    raw = scans.reshape(-1, scans.shape[-1])
+    rows = np.arange(raw.shape[0])
+    half = min(window // 2, (raw.shape[-1] - 1) // 2)
+    y = smooth(raw, window) if half else raw
+    cols = np.arange(y.shape[-1])
+    candidates = np.where(local_minima(y), y, np.inf)
+
+    # first rim: closest local minimum
+    idx_1 = np.argmin(candidates, axis=-1)
+
+    # second rim: closest local minimum outside the first rim's radius (no wrap-around at the edges)
+    blocked = np.abs(cols - idx_1[:, None]) < rad
+    outside = np.where(blocked, np.inf, candidates)
+    idx_2 = np.argmin(outside, axis=-1)
+    none = np.isinf(outside[rows, idx_2])
+    if none.any():
+        idx_2 = np.where(none, np.argmin(np.where(blocked, np.inf, y), axis=-1), idx_2)
+
+    # back on the raw scan at the pixels the windows are centered on, both rims at once
+    idx = _snap(raw, rows[:, None], np.stack([idx_1, idx_2], axis=-1) + half, half)
+    pos, val = _refine(raw, rows[:, None], idx, edge)
+    conf = _confidence(raw, idx, val, 2 * rad, depth)
+    rims = (val[:, 0], val[:, 1], pos[:, 0], pos[:, 1], conf[:, 0], conf[:, 1])
+    if not shape:
+        return Rims(*(float(v[0]) for v in rims))
+    return Rims(*(v.reshape(shape) for v in rims))
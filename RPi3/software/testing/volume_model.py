@@ -0,0 +1,93 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   The center-row volume estimate and its experimental constants. A cup is measured in a laserScan
+#   (ground, rim and inside-bottom heights, radius between the rims) and its volume computed as a
+#   cylinder scaled by the constants below. The constants are fitted by calibrate.py and read from
+#   volume_calibration.json at startup, falling back on the hand-tuned values if there is no file.
+#
+#   volume = pi * (radius * radius_scale)^2 * (height * height_scale) * shape * adjust   [oz]
+#   volume -= bend * (volume - knee)^power   above the knee
+#   volume *= scale
+#
+
+
+import json
+import os
+
+import numpy as np
+
+import geometry
+import rim
+
+# m^3 to oz
+M3_TO_OZ = 33814.023
+
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'volume_calibration.json')
+
+# hand-tuned constants (experimental multipliers)
+DEFAULTS = {
+    "height_scale": 0.9,
+    "radius_scale": 0.78,
+    "shape": 0.745,
+    "adjust": 0.85,
+    "knee": 10.0,
+    "bend": 0.05,
+    "power": 1.8,
+    "scale": 0.9,
+}
+
+
+# constants from a calibration file, defaults for anything it doesn't set
+def load(path=CALIBRATION_PATH):
+    constants = dict(DEFAULTS)
+    if path is not None and os.path.exists(path):
+        with open(path) as f:
+            fitted = json.load(f)
+        constants.update({key: float(value) for key, value in fitted.items() if key in DEFAULTS})
+    return constants
+
+# write constants atomically (anything extra, like fit statistics, goes in as is)
+def save(constants, path=CALIBRATION_PATH):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(constants, f, indent=1)
+    os.replace(tmp, path)
+
+# measure a cup in a laserScan: ground, rim and inside-bottom heights (m), radius and rim columns
+# gnd: ground height if already known (e.g. from the empty-tray model), else taken just outside the rims
+def measure(laserScan, gnd=None):
+    rims = rim.detect(laserScan, 5)
+    val_1, val_2 = rims.val_1, rims.val_2
+    idx_1, idx_2 = int(round(rims.pos_1)), int(round(rims.pos_2))
+    lo, hi = min(idx_1, idx_2), max(idx_1, idx_2)
+    width = len(laserScan)
+
+    if gnd is None:
+        out_lo, out_hi = max(lo - 5, 0), min(hi + 5, width - 1)
+        gnd = (geometry.height_at(width, laserScan[out_lo], out_lo) + geometry.height_at(width, laserScan[out_hi], out_hi)) / 2
+
+    # center: bearing-corrected heights of the 20 center pixels
+    center_idx = int(width / 2)
+    center = float(np.max(gnd - geometry.scan_heights(laserScan[center_idx - 10:center_idx + 10])))
+
+    # smaller rim range as rim height
+    if val_1 < val_2:
+        top = gnd - geometry.height_at(width, val_1, idx_1)
+    else:
+        top = gnd - geometry.height_at(width, val_2, idx_2)
+
+    return {"gnd": gnd, "rim": top, "center": center, "radius": geometry.radius(width, val_1, val_2, idx_1, idx_2),
+            "lo": lo, "hi": hi, "confidence": min(rims.conf_1, rims.conf_2)}
+
+# volume (oz) from inside heights and radii (m), scalars or arrays
+def volumes(height, radius, c):
+    v = np.pi * (np.asarray(radius) * c["radius_scale"])**2 * (np.asarray(height) * c["height_scale"]) * c["shape"] * M3_TO_OZ
+    v = v * c["adjust"]
+    v = v - c["bend"] * np.maximum(v - c["knee"], 0)**c["power"]
+    return v * c["scale"]
+
+# volume (oz) of a cup measured by measure()
+def volume(shape, c):
+    return float(volumes(shape["rim"] - shape["center"], shape["radius"], c))
@@ -2,7 +2,9 @@
 # Date: 04 / 03 / 2024
 # Organization: University of Rochester Electrical and Computer Engineering Department
 # Description:
-#   A basic GUI setup to write drink recipes to a orders.txt file
+#   A basic GUI setup to place drink recipes in the SmartSip order queue
+#   Every window is built once at startup and kept in a screen manager, navigating only swaps the
+#   current screen and resets what the customer changed on it. The images are loaded once and shared.
 #
 
 
@@ -11,16 +13,40 @@ Window.fullscreen = 'auto'
 from kivy.config import Config 
 Config.set('graphics', 'resizable', False)
 from kivy.app import App
-from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout 
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.spinner import Spinner
 from kivy.uix.textinput import TextInput
 from kivy.uix.widget import Widget
+from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
+from kivy.cache import Cache
 from kivy.clock import Clock
+from kivy.core.image import Image as CoreImage
 from kivy.graphics import Rectangle
-import time
+from kivy.resources import resource_add_path
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', '..'))
+import order_queue
+
+# images are found next to this file wherever the app is started from
+resource_add_path(HERE)
+IMAGES = ('bub2.jpg', 'rbutton.png', 'widget.png', 'option.png', 'down2.png')
+
+WINDOWS = (1, 2, 3, 4, 5, 6)
+OPTION_COLOR = (.5, .5, .5, 1)
+PLACEHOLDER = "Select to see your choices"
+FILL_PROMPT = 'Select Fill Percentage'
+
+# load every image once, kept for good (kivy otherwise drops a texture unused for a minute and
+# reloads it from the SD card the next time a window shows it)
+def preload(images=IMAGES):
+    Cache.register('kv.image', timeout=None)
+    Cache.register('kv.texture', timeout=None)
+    return {name: CoreImage(name).texture for name in images}
 
 class CustomKeyboard(GridLayout):
     def __init__(self, input_field, **kwargs):
@@ -48,21 +74,30 @@ class CustomKeyboard(GridLayout):
         self.input_field.text = ""
 
 class SmartSip(App):
+    orders_path = order_queue.DEFAULT_DB
+
     def build(self):
         self.choices = []
         self.percentages = []
         self.total = 0
         self.window = 1  # Track the current window
+        self.orders = order_queue.OrderQueue(self.orders_path)
+        self.textures = preload()
         
-        self.layout = BoxLayout(orientation='vertical')
-        self.window_layout = GridLayout(cols=2, spacing=10, padding=10)
-        self.window_layout.bind(pos=self.update_rect, size=self.update_rect)
-        with self.window_layout.canvas.before:
-            self.rect = Rectangle(source='bub2.jpg',size=self.window_layout.size,
-                           pos=self.window_layout.pos)
-            
+        # one background behind every window
+        self.layout = ScreenManager(transition=NoTransition())
+        self.layout.bind(pos=self.update_rect, size=self.update_rect)
+        with self.layout.canvas.before:
+            self.rect = Rectangle(texture=self.textures['bub2.jpg'], size=self.layout.size,
+                           pos=self.layout.pos)
 
-        self.layout.add_widget(self.window_layout)
+        # every window is built now, navigating just switches between them
+        self.window_layouts = {}
+        for window in WINDOWS:
+            screen = Screen(name=str(window))
+            self.window_layouts[window] = self.build_window(window)
+            screen.add_widget(self.window_layouts[window])
+            self.layout.add_widget(screen)
         
         self.update_window()
 
@@ -72,72 +107,100 @@ class SmartSip(App):
             self.rect.pos = instance.pos
             self.rect.size = instance.size
     
+    # build the widgets of a window
+    def build_window(self, window):
+        window_layout = GridLayout(cols=2, spacing=10, padding=10)
 
-    def update_window(self):
-        self.window_layout.clear_widgets()
-
-        if self.window == 1:
-            self.window_layout.add_widget(Widget())
-            self.window_layout.add_widget(Widget())
-            self.window_layout.add_widget(Label(text="Welcome to SmartSip!", font_size= 30,
+        if window == 1:
+            window_layout.add_widget(Widget())
+            window_layout.add_widget(Widget())
+            window_layout.add_widget(Label(text="Welcome to SmartSip!", font_size= 30,
                                                 halign='center', size_hint=(1, 1)))
-            #self.window_layout.add_widget(Widget())
-            #self.window_layout.add_widget(Widget())
-            self.window_layout.add_widget(Widget())
-            self.window_layout.add_widget(Widget())
-            #self.window_layout.add_widget(Button(text="Select a Drink!", on_press=self.custom_window, size_hint=(0.7, 0.7), 
+            #window_layout.add_widget(Widget())
+            #window_layout.add_widget(Widget())
+            window_layout.add_widget(Widget())
+            window_layout.add_widget(Widget())
+            #window_layout.add_widget(Button(text="Select a Drink!", on_press=self.custom_window, size_hint=(0.7, 0.7), 
                                                  #size=(250, 250), background_normal='widget.png', background_color=(.5, .5, .5, 1)))
-            self.window_layout.add_widget(Button(text="Start!", on_press=self.select_window, size_hint=(0.8, 0.8), 
+            window_layout.add_widget(Button(text="Start!", on_press=self.select_window, size_hint=(0.8, 0.8), 
                                                  size=(250, 250), background_normal='rbutton.png', background_down = 'down2.png')) #background_color=(.5, 0.5, .5, 1)))
-            #self.window_layout.add_widget(Widget())
+            #window_layout.add_widget(Widget())
 
-        elif self.window == 2:
+        elif window == 2:
             options = ["Milk", "Coffee", "Non-Dairy"]
-            self.placeholder_btn = Button(text="Select to see your choices", on_press=self.selected_options, background_normal='option.png', background_color=(.5, .5, .5, 1))
+            self.placeholder_btn = Button(text=PLACEHOLDER, on_press=self.selected_options, background_normal='option.png', background_color=OPTION_COLOR)
+            self.option_btns = []
             for option in options:
-                btn = Button(text=option, on_press=self.add_choice, background_normal='option.png', background_color=(.5, .5, .5, 1))
-                self.window_layout.add_widget(btn)
-            self.window_layout.add_widget(self.placeholder_btn)
-            #self.window_layout.add_widget(Widget())
+                btn = Button(text=option, on_press=self.add_choice, background_normal='option.png', background_color=OPTION_COLOR)
+                self.option_btns.append(btn)
+                window_layout.add_widget(btn)
+            window_layout.add_widget(self.placeholder_btn)
+            #window_layout.add_widget(Widget())
             
             self.keyboard_input = TextInput(multiline=False)
-            self.window_layout.add_widget(self.keyboard_input)
-            self.window_layout.add_widget(CustomKeyboard(input_field=self.keyboard_input))
-            self.window_layout.add_widget(Widget())
-            self.window_layout.add_widget(Button(text="Finish", on_press=self.damage_control, background_normal = 'widget.png', 
+            window_layout.add_widget(self.keyboard_input)
+            window_layout.add_widget(CustomKeyboard(input_field=self.keyboard_input))
+            window_layout.add_widget(Widget())
+            window_layout.add_widget(Button(text="Finish", on_press=self.damage_control, background_normal = 'widget.png', 
                                                  background_down = 'down2.png', 
                                                  ))#border = (30, 30, 30, 30), size_hint=(0.7, 0.7)))#, pos_hint={"x":0.3, "y":0.45}))
-        elif self.window == 3:
+        elif window == 3:
             # Add existing buttons
-            self.window_layout.add_widget(Button(text="Latte", on_press=self.add_choice, 
-                                                 background_normal='widget.png', background_color=(.5, .5, .5, 1)))
-            self.window_layout.add_widget(Button(text="Americano", on_press=self.add_choice, 
-                                                 background_normal='widget.png', background_color=(.5, .5, .5, 1)))
-            self.window_layout.add_widget(Button(text="Coffee", on_press=self.add_choice, 
-                                                 background_normal='widget.png', background_color=(.5, .5, .5, 1)))
-            fill_spinner = Spinner(text='Select Fill Percentage', values=('10', '20', '30', '40', '50', '60', '70', '80', '90', '100'), 
+            self.drink_btns = []
+            for drink in ("Latte", "Americano", "Coffee"):
+                btn = Button(text=drink, on_press=self.add_choice, 
+                             background_normal='widget.png', background_color=OPTION_COLOR)
+                self.drink_btns.append(btn)
+                window_layout.add_widget(btn)
+            self.fill_spinner = Spinner(text=FILL_PROMPT, values=('10', '20', '30', '40', '50', '60', '70', '80', '90', '100'), 
                                    on_text=self.add_choice, background_normal='widget.png', background_color=(.1, .8, .1, 1), size_hint=(0.5, 0.7))
-            fill_spinner.bind(text=self.on_spinner_select)  # Bind spinner selection to method
+            self.fill_spinner.bind(text=self.on_spinner_select)  # Bind spinner selection to method
             
             # Add the spinner to the layout
-            self.window_layout.add_widget(fill_spinner)
-            self.window_layout.add_widget(Widget())
-            self.window_layout.add_widget(Button(text="Finish", on_press=self.finish_order, background_normal = 'rbutton.png', 
+            window_layout.add_widget(self.fill_spinner)
+            window_layout.add_widget(Widget())
+            window_layout.add_widget(Button(text="Finish", on_press=self.finish_order, background_normal = 'rbutton.png', 
                                                  background_down = 'down2.png', size_hint=(0.7, 0.7), 
                                                  border = (30, 30, 30, 30), pos_hint={"x":0.35, "y":0.3}))
 
-        elif self.window == 4:
-            self.window_layout.add_widget(Label(text="Enjoy your Drink!", font_size= 80, size_hint=(1, 0.5)))
+        elif window == 4:
+            window_layout.add_widget(Label(text="Enjoy your Drink!", font_size= 80, size_hint=(1, 0.5)))
+
+        elif window == 5:
+            window_layout.add_widget(Label(text="Really o_o!\n Make sure your total amount is between 1 - 100.", 
+                                                halign='center', font_size= 30, size_hint=(1, 0.5), color=(1, 0, 0, 1)))
+
+        elif window == 6:
+            window_layout.add_widget(Label(text="Select Item before entering the amount \nthen press enter and continuing", 
+                                                halign='center', font_size= 30, size_hint=(1, 0.5), color=(1, 0, 0, 1)))
+
+        return window_layout
+
+    # undo what the last customer (or a rejected order) changed on a window
+    def reset_window(self, window):
+        if window == 2:
+            for btn in self.option_btns:
+                btn.background_color = OPTION_COLOR
+            self.placeholder_btn.text = PLACEHOLDER
+            self.keyboard_input.text = ""
+
+        elif window == 3:
+            for btn in self.drink_btns:
+                btn.background_color = OPTION_COLOR
+            self.fill_spinner.text = FILL_PROMPT
+
+    def update_window(self):
+        # show the window as if it had just been built
+        self.reset_window(self.window)
+        self.layout.current = str(self.window)
+
+        if self.window == 4:
             Clock.schedule_once(self.return_to_home, 10)
 
         elif self.window == 5:
-            self.window_layout.add_widget(Label(text="Really o_o!\n Make sure your total amount is between 1 - 100.", 
-                                                halign='center', font_size= 30, size_hint=(1, 0.5), color=(1, 0, 0, 1)))
             Clock.schedule_once(self.return_to_home, 3)
 
         elif self.window == 6:
-            self.window_layout.add_widget(Label(text="Select Item before entering the amount \nthen press enter and continuing", 
-                                                halign='center', font_size= 30, size_hint=(1, 0.5), color=(1, 0, 0, 1)))
             Clock.schedule_once(self.return_to_select, 3)
 
     def add_choice(self, instance):
@@ -148,6 +211,9 @@ class SmartSip(App):
         self.choices.append(':' + percentage + '\n')
 
     def on_spinner_select(self, spinner, text):
+        # the spinner being reset for the next customer is no choice
+        if text == FILL_PROMPT:
+            return
         if len(self.choices) > 1:
             self.choices.pop()
         text = ":" + text
@@ -180,7 +246,7 @@ class SmartSip(App):
             self.placeholder_btn.text = "No selections yet!"
             #time.sleep(1.5)
             Clock.schedule_once(lambda dt: 1.5)
-            self.placeholder_btn.text = "Select to see your choices"
+            self.placeholder_btn.text = PLACEHOLDER
 
     def damage_control(self, instance):
         #self.window += 1
@@ -249,8 +315,7 @@ class SmartSip(App):
 
     def get_order(self):
         
-        with open("orders.txt", "w") as file:
-            file.write(''.join(self.choices))
+        self.orders.put(''.join(self.choices))
         #return self.choices
 
 if __name__ == "__main__":
@@ -4,128 +4,268 @@
 # Description:
 #   This code serves as the backend control for the entirety of the coffee machine. It interpets camera_node.py's TCP-based messages and makes 
 #   decisions on cup centering and pouring. These decisions are then sent via I2C to a hardware controller.
+#   One master drives every station listed in STATIONS (see stations.py), each with its own camera node.
 #
 
 
+import os
 import socket
 import smbus
+import sys
+import threading
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+import controller
+import log
+import order_queue
+import pour_scheduler
+import metrics
+import protocol
+import stations
+import tracking
+
+# time between sending the stop command and the gantry actually stopping: the I2C write (about 1 ms)
+# plus the rest of the step chunk the Arduino loop is in (stepChunk in controller.ino, 2 steps at 50 rpm
+# = 12 ms)
+ACTUATION_LATENCY = 0.02
+# camera frame period, a stop due sooner than the next frame is scheduled instead of waited for
+FRAME_PERIOD = 1 / 30
+# how close to the center (pixels) the predicted stop has to be
+STOP_THRESHOLD = 2.0
+# no telemetry for this long (s) during the search: check whether the gantry ran out of travel
+SEARCH_POLL = 0.5
+# a poured cup not taken within this long (s) is left there and the gantry sent home anyway
+REMOVAL_TIMEOUT = 120.0
+# where per-stage timings are exported at the end of every cycle (Prometheus text, or JSON for *.json)
+METRICS_PATH = '/tmp/smartsip_master.prom'
+# stations on this master: station number (STATION in its camera_node.py) -> I2C address of its controller
+STATIONS = {0: 0x8}
+
 # initialize socket communication
 def int_com(s):
 
     # socket setup
     host = '169.254.12.13'
     port = 9009
+    # a restarted master can take the port straight back
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     s.bind(('', port))
 
-    s.listen( 1 )
+    s.listen( len(STATIONS) )
+
+# the gantry is on its way back to the left limit (from the controller's limit switch status)
+def homing(bus, address):
+    status = bus.read_byte(address)
+    return bool(status & controller.MOVING) and not status & controller.HOME
 
 # center a given cup
+# the cup is tracked from the camera's telemetry and the stop is sent early enough to cover latency
 def center(c, bus, address):
-    # sync with camera_node.py
-    print("connected to by :", addr)
-    c.send(b'Ready to make some coffee?')
+    # sync with camera_node.py (clock offset lets us measure capture -> master latency); a node that
+    # answers none of the rounds raises TimeoutError, the station drops it and retries the order
+    log.info("centering at station {}", hex(address))
+    clock_offset, rtt = protocol.sync_clock(c)
+    metrics.observe('master_tcp_rtt_seconds', rtt)
+    c.discard(protocol.CENTER)
+    c.send(protocol.START)
     
-    time.sleep(0.1)
+    # the camera is streaming once it acknowledges
+    # (a REMOVED from the last cycle that came after its removal timeout arrives before READY)
+    with metrics.timer('master_ready_wait_seconds'):
+        c.recv_next(protocol.READY)
+    c.discard(protocol.REMOVED)
 
-    # start search
-    bus.write_byte( address , 2 )
+    # start search, unless the gantry is still on its way home from the last drink: the next cup may
+    # turn up on the way back, otherwise the search starts once the left limit is reached
+    returning = homing(bus, address)
+    if not returning:
+        bus.write_byte( address , 2 )
     centered = False;
+    tracker = tracking.AlphaBetaTracker()
 
     while not centered:
-        # wait until camera node sends found code 1
-        inp = int(c.recv(1024).decode())
-        print(inp)
+        if returning and not homing(bus, address):
+            returning = False
+            bus.write_byte( address , 2 )
+            # offsets seen on the way home say nothing about the search
+            tracker.reset()
+
+        # act only on the camera node's newest frame
+        msg = c.recv_latest(protocol.CENTER, timeout=FRAME_PERIOD if returning else SEARCH_POLL)
+        if msg is None:
+            # the camera goes quiet once the cup is out of view; a gantry that stopped went past it
+            # (or never found it) and searches again, from the left limit (the Arduino drives back
+            # there from the right limit by itself) or on the way back to it
+            gantry = bus.read_byte(address) if not returning else controller.MOVING
+            if not gantry & controller.MOVING:
+                log.warning("{}: search ran out of travel, searching again", hex(address))
+                metrics.count('master_search_restarts_total')
+                if gantry & controller.HOME:
+                    bus.write_byte( address , 2 )
+                else:
+                    bus.write_byte( address , 1 )
+                    returning = True
+                tracker.reset()
+            continue
+        status = protocol.unpack_center(msg.payload)
+        capture = msg.stamp - clock_offset
+        tracker.update(status.offset, capture, status.velocity)
+        metrics.count('master_center_messages_total')
 
-        if inp == 1:
+        # predict when the stop has to go out, including the latency this frame has already seen
+        now = time.time()
+        metrics.observe('master_capture_latency_seconds', now - capture)
+        delay = tracker.stop_delay(now, ACTUATION_LATENCY, STOP_THRESHOLD)
+        log.debug("{:.1f} px  {:.1f} px/s  latency {:.1f} ms", status.offset, tracker.v, (now - capture) * 1000, every=0.5)
+
+        # fall back on the camera's own centered flag when the cup isn't seen moving in
+        if delay is None and status.centered and not tracker.approaching():
+            delay = 0.0
+
+        if delay is not None and delay < FRAME_PERIOD:
+            time.sleep(delay)
             bus.write_byte( address , 0 )
-            print('centered!')
+            c.send(protocol.CENTERED)
+            log.info('centered!')
             centered = True
 
 # pour based on volume estimate and given proportions
-def pour(vol, bus1, address1, recipe):
+# all ingredients pour at once, each valve closes when its own time is up
+# with the camera connection given, valves close as soon as the camera sees their fill target reached;
+# the timers still run for the recipe volume and cap the pour, and they alone decide once the camera
+# reports it can't watch this cup (UNMONITORED)
+def pour(vol, bus1, address1, recipe, max_open=None, c=None):
     # experimentally calculated flowrates
     flowrates = [0.2, 0.2, 0.2]
 
-    # for each ingredient in recipe, pour
-    for i in range(len(recipe)):
-        # pour time
-        t = vol * recipe[i] / flowrates[i] # oz * % / oz * s = s
-        
-        string =" pouring ingredient " + str(i) + " for " + str(t) + " seconds."
-        print(string)
-        
-        # pour
-        bus1.write_byte(address1, 3+i)
-        time.sleep(t)
-        bus1.write_byte(address1, 7)
+    jobs = pour_scheduler.plan(vol, recipe, flowrates)
+    scheduler = pour_scheduler.PourScheduler(bus1, address1, max_open)
+    if c is not None:
+        c.send(protocol.POUR, protocol.pack_targets(pour_scheduler.fill_targets(jobs, flowrates, max_open)))
+
+        def wait(timeout):
+            end = time.monotonic() + timeout
+            msg = c.recv_next((protocol.LEVEL, protocol.UNMONITORED), timeout)
+            if msg is None:
+                return None
+            if msg.type == protocol.UNMONITORED:
+                # plain timers from here on, this wait still runs to the next one
+                log.warning("camera can't monitor the pour, valves close on their timers")
+                metrics.count('master_pours_unmonitored_total')
+                scheduler.wait = None
+                time.sleep(max(end - time.monotonic(), 0.0))
+                return None
+            valve, oz = protocol.unpack_level(msg.payload)
+            log.info("camera: ingredient {} reached {:.2f} oz", valve, oz)
+            return valve
+        scheduler.wait = wait
+
+    t = scheduler.run(jobs)
+    log.info("poured in {} seconds.", t)
+
+    # a monitored valve that ran into its timer stopped at the estimated volume before the camera saw
+    # its fill target (the timers come from the volume estimate, so a low estimate cuts the pour)
+    if scheduler.wait is not None:
+        for valve in scheduler.timed_out:
+            log.info("ingredient {} stopped by its timer before the camera saw its target", valve)
+            metrics.count('master_pour_timer_stops_total')
+
+    if c is not None:
+        c.send(protocol.POURED)
 
     return
 
-# get a recipe from a txt file
-def get_recipe():
-    while(1):
-        # get text file
-        text = open('TS/smartSip/orders.txt', 'r')
-        text = text.readlines()
-
-        # convert txt contents to recipe array
-        if len(text) > 0:
-            recipe = [0.0,0.0,0.0]
-            for line in text:
-                split = line.split(':')
-                
-                if split[0] == "Milk":
-                    recipe[1] = float(split[1]) / 100
-                elif split[0] == "Coffee":
-                    recipe[2] = float(split[1]) / 100
-                elif split[0] == "Non-Dairy":
-                    recipe[0] = float(split[1]) / 100
-            return recipe
+# convert order text ("Milk:58" lines) to a recipe array
+def parse_recipe(text):
+    recipe = [0.0,0.0,0.0]
+    for line in text.splitlines():
+        split = line.split(':')
+        
+        if split[0] == "Milk":
+            recipe[1] = float(split[1]) / 100
+        elif split[0] == "Coffee":
+            recipe[2] = float(split[1]) / 100
+        elif split[0] == "Non-Dairy":
+            recipe[0] = float(split[1]) / 100
+    return recipe
 
-if __name__ == '__main__':
+# one drink at a station as a state machine: every state waits on an acknowledgment or sensor event
+# (camera READY, VOLUME and REMOVED, the controller's limit switches) instead of a fixed sleep, and
+# returns the next state; the gantry heads home at the end and the next cycle picks it up on the way
+class DrinkCycle:
+    def __init__(self, c, bus, address, recipe):
+        self.c = c
+        self.bus = bus
+        self.address = address
+        self.recipe = recipe
+        self.vol = 0.0
 
-    # init socket communication
-    sock = socket.socket()
-    int_com(sock)
+    def run(self):
+        log.info("{}: {}", hex(self.address), str(self.recipe))
+        state = 'center'
+        while state is not None:
+            with metrics.timer('master_' + state + '_seconds'):
+                state = getattr(self, state)()
 
-    # init bus specs
-    address1 = 0x8
-    bus1 = smbus.SMBus( 1 )
+    def center(self):
+        center(self.c, self.bus, self.address)
+        return 'volume'
 
-    # init com bus
-    c, addr = sock.accept()
+    # camera_node.py starts its estimate as soon as centering is over
+    def volume(self):
+        self.vol = protocol.unpack_volume(self.c.recv_latest(protocol.VOLUME).payload)
+        return 'pour'
 
-    while(1):
-        # get recipe
-        recipe = get_recipe()
-        print(recipe)
+    # camera_node.py watches the fill level
+    def pour(self):
+        pour(self.vol, self.bus, self.address, self.recipe, c=self.c)
+        return 'removal'
 
-        # center
-        center(c, bus1, address1)
+    # the cup has to be gone before the gantry moves on, or the next search finds it again
+    # (the camera node will not start the next cycle while it is still there either)
+    def removal(self):
+        if self.c.recv_next(protocol.REMOVED, timeout=REMOVAL_TIMEOUT) is None:
+            log.warning("{}: cup not taken within {:.0f} s, sending the gantry home anyway", hex(self.address), REMOVAL_TIMEOUT)
+            metrics.count('master_removal_timeouts_total')
+        return 'reset'
 
-        # sync centering_node.py
-        time.sleep(1)
-        msg = "Pouring"
-        c.send(msg.encode())
+    # send the nozzle home without waiting for it, the next cycle overlaps with the trip
+    def reset(self):
+        log.info("time to reset")
+        self.bus.write_byte(self.address, 1)
+        return None
 
-        
-        
-        # get volume estimate and pour
-        vol = float(c.recv(1024).decode())
-        pour(vol, bus1, address1, recipe)
-        
-        # clear file
-        text = open('TS/smartSip/orders.txt', 'w')
-        text.close()
-        
-        # reset nozzle position and break
-        print("time to reset")
-        bus1.write_byte(address1, 1)
-        time.sleep(5)
-        
+# make one drink at a station
+def cycle(c, bus, address, recipe):
+    DrinkCycle(c, bus, address, recipe).run()
+
+if __name__ == '__main__':
+
+    # init socket communication
+    sock = socket.socket()
+    int_com(sock)
+
+    # init bus specs, one controller client per station (writes go through its priority queue), all on
+    # I2C bus 1 and taking turns on it
+    bus, bus_lock = smbus.SMBus( 1 ), threading.Lock()
+    station_list = [stations.Station(number, controller.Controller(bus, address, bus_lock=bus_lock), address)
+                    for number, address in sorted(STATIONS.items())]
+
+    # init order queue (orders left half-made by a restart go back in line)
+    orders = order_queue.OrderQueue(consumer=True)
+    orders.requeue_unfinished()
 
-    # close coms
-    c.close()
-    sock.close()
\ No newline at end of file
+    # serve camera nodes and orders until interrupted, every station makes drinks on its own
+    master = stations.Master(sock, station_list, orders, cycle, parse_recipe, METRICS_PATH)
+    try:
+        with log.dumping():
+            master.run()
+    finally:
+        # close coms
+        for station in station_list:
+            log.info("{}", station.bus.summary())
+            station.bus.close()
+        bus.close()
+        orders.close()
+        sock.close()
@@ -0,0 +1,259 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Client for the Arduino hardware controller. Commands go through a priority queue to a dedicated
+#   writer thread: stop and all-off jump the queue (and cancel the moves / opens queued before them),
+#   redundant repeats are dropped, I/O errors are retried, and the latency of every command is kept
+#   in a fixed-bucket histogram. write_byte(address, value) keeps it a drop-in for smbus.SMBus.
+#
+#   Commands: 0 stop gantry, 1 gantry left, 2 gantry right, 3 - 6 open solenoid 1 - 4,
+#             7 close all solenoids, 8 - 11 close solenoid 1 - 4
+#   Status (read_byte): bit 0 gantry at the left (home) limit, bit 1 gantry moving, bit 2 at the right limit
+#
+
+
+import heapq
+import threading
+import time
+
+STOP = 0
+LEFT = 1
+RIGHT = 2
+OPEN = (3, 4, 5, 6)
+ALL_OFF = 7
+CLOSE = (8, 9, 10, 11)
+
+# status bits
+HOME = 1
+MOVING = 2
+RIGHT_LIMIT = 4
+
+# commands that must never wait behind other traffic, and what they cancel when queued
+URGENT = {STOP: (LEFT, RIGHT), ALL_OFF: OPEN}
+
+# latency histogram bucket upper bounds (ms)
+BUCKETS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, float('inf'))
+
+
+# in-memory bus for running without the Arduino, optionally failing every n-th write
+class FakeBus:
+    def __init__(self, delay=0.0, fail_every=0):
+        self.delay = delay
+        self.fail_every = fail_every
+        self.writes = []
+        self.count = 0
+
+    def write_byte(self, address, value):
+        self.count += 1
+        if self.fail_every and self.count % self.fail_every == 0:
+            raise OSError(121, "Remote I/O error")
+        if self.delay:
+            time.sleep(self.delay)
+        self.writes.append((time.monotonic(), address, value))
+
+    def read_byte(self, address):
+        return 0
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0.0
+        self.n = 0
+
+    def add(self, ms):
+        for i, bound in enumerate(self.bounds):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.total += ms
+        self.n += 1
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+
+class Command:
+    def __init__(self, value, queued):
+        self.value = value
+        self.queued = queued
+        self.cancelled = False
+        self.started = False    # taken off the queue by the writer, too late to cancel
+        self.ok = False
+        self.done = threading.Event()
+        self.repeats = []       # sends of the same command while this one was queued, they get its outcome
+
+    # mark done, and the repeats with it (ones that already gave up are left alone)
+    def finish(self):
+        for repeat in self.repeats:
+            if not repeat.done.is_set():
+                repeat.ok = self.ok
+                repeat.cancelled = self.cancelled
+                repeat.done.set()
+        self.done.set()
+
+
+class Controller:
+    # controllers of several stations on one physical bus share it and its bus_lock, so a write or status
+    # read of one never interleaves with another's
+    def __init__(self, bus=None, address=0x8, retries=3, retry_delay=0.002, repeat_window=0.05, bus_lock=None):
+        if bus is None:
+            import smbus
+            bus = smbus.SMBus(1)
+        self.bus = bus
+        self.address = address
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.repeat_window = repeat_window  # a non-urgent repeat of the last write within this is dropped
+
+        self.queue = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.bus_lock = bus_lock or threading.Lock()    # status reads and queued writes share the bus
+        self.running = True
+
+        self.last_value = None
+        self.last_time = 0.0
+        self.latency = {}       # command -> Histogram of enqueue -> written (ms)
+        self.errors = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self.writer = threading.Thread(target=self._run, daemon=True)
+        self.writer.start()
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.writer.join(timeout=1.0)
+
+    # queue a command, returns its Command (wait on .done, check .ok)
+    def send(self, value, wait=False, timeout=1.0):
+        now = time.monotonic()
+        cmd = Command(value, now)
+
+        with self.cond:
+            # redundant: the same command is already waiting (done when it is, with its outcome), or was
+            # just written
+            pending = [c for p, s, c in self.queue if not c.cancelled]
+            same = [c for c in pending if c.value == value]
+            repeat = value == self.last_value and now - self.last_time < self.repeat_window
+            if same:
+                self.dropped += 1
+                same[0].repeats.append(cmd)
+            elif repeat and value not in URGENT:
+                self.dropped += 1
+                cmd.ok = True
+                cmd.done.set()
+                return cmd
+            else:
+                # urgent commands jump the queue and cancel what they would undo
+                if value in URGENT:
+                    for c in pending:
+                        if c.value in URGENT[value]:
+                            c.cancelled = True
+                            c.finish()
+                            self.dropped += 1
+                    priority = 0
+                else:
+                    priority = 1
+
+                self.seq += 1
+                heapq.heappush(self.queue, (priority, self.seq, cmd))
+                self.cond.notify()
+
+        if wait:
+            cmd.done.wait(timeout)
+        return cmd
+
+    # drop-in for smbus.SMBus.write_byte: returns once the command is on the bus
+    # a command still queued after timeout is cancelled before raising, so it can never go out later;
+    # one the writer has already started is waited for
+    def write_byte(self, address, value, timeout=1.0):
+        cmd = self.send(value, wait=True, timeout=timeout)
+        with self.cond:
+            if not cmd.done.is_set() and not cmd.started:
+                cmd.cancelled = True
+                cmd.finish()
+                self.failed += 1
+                raise OSError("controller command " + str(value) + " not written within " + str(timeout) + " s, cancelled")
+        cmd.done.wait()
+        if not cmd.ok and not cmd.cancelled:
+            raise OSError("controller command " + str(value) + " failed")
+
+    # drop-in for smbus.SMBus.read_byte: the controller's status byte, read off the bus between writes
+    def read_byte(self, address):
+        with self.bus_lock:
+            return self.bus.read_byte(address)
+
+    def stop(self):
+        return self.send(STOP)
+
+    def move_left(self):
+        return self.send(LEFT)
+
+    def move_right(self):
+        return self.send(RIGHT)
+
+    def open_valve(self, valve):
+        return self.send(OPEN[valve])
+
+    def close_valve(self, valve):
+        return self.send(CLOSE[valve])
+
+    def all_off(self):
+        return self.send(ALL_OFF)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                priority, seq, cmd = heapq.heappop(self.queue)
+                if cmd.cancelled:
+                    continue
+                cmd.started = True
+                for repeat in cmd.repeats:
+                    repeat.started = True
+
+            for attempt in range(self.retries + 1):
+                try:
+                    with self.bus_lock:
+                        self.bus.write_byte(self.address, cmd.value)
+                    cmd.ok = True
+                    break
+                except OSError:
+                    self.errors += 1
+                    time.sleep(self.retry_delay * (attempt + 1))
+
+            now = time.monotonic()
+            with self.cond:
+                if cmd.ok:
+                    self.last_value = cmd.value
+                    self.last_time = now
+                    self.latency.setdefault(cmd.value, Histogram()).add((now - cmd.queued) * 1000)
+                else:
+                    self.failed += 1
+                cmd.finish()
+
+    # latency summary per command
+    def stats(self):
+        return {
+            "latency_ms": {value: {"n": h.n, "mean": h.mean(), "buckets": dict(zip(h.bounds, h.counts))}
+                           for value, h in sorted(self.latency.items())},
+            "errors": self.errors,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def summary(self):
+        lines = []
+        for value, h in sorted(self.latency.items()):
+            lines.append("cmd " + str(value) + ": n=" + str(h.n) + " mean=" + "{:.3f}".format(h.mean()) + " ms")
+        lines.append("errors=" + str(self.errors) + " failed=" + str(self.failed) + " dropped=" + str(self.dropped))
+        return "\n".join(lines)
@@ -3,7 +3,8 @@
 # Organization: University of Rochester Electrical and Computer Engineering Department
 # Description:
 #   This code provides a basic way of interfacing with the hardware controller (Arduino Uno).
-#   They use smbus to communicate via I2C protocol.
+#   They use smbus to communicate via I2C protocol, through the controller client so each command's
+#   latency is reported.
 #
 
 # Commands:
@@ -15,14 +16,21 @@
 # 5 to open solenoid 3
 # 6 to open solenoid 4
 # 7 to turn off all solenoids
+# 8 to close solenoid 1
+# 9 to close solenoid 2
+# 10 to close solenoid 3
+# 11 to close solenoid 4
 
 import smbus
 
+import controller
+
 if __name__ == "__main__":
     motor_address = 0x8
 
-    bus = smbus.SMBus( 1 )
+    bus = controller.Controller(smbus.SMBus( 1 ), motor_address, repeat_window=0)
 
     while True:
         command = int( input( "Enter Command: " ) )
-        bus.write_byte( motor_address, command )
\ No newline at end of file
+        bus.write_byte( motor_address, command )
+        print(bus.summary())
\ No newline at end of file
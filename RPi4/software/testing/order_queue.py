@@ -0,0 +1,122 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Durable FIFO order queue shared by the SmartSip GUI (producer) and centering.py (consumer). Orders
+#   are kept in a SQLite database so none are lost on a crash or overwritten by the next customer,
+#   and the consumer sleeps on a local datagram socket that producers poke after every new order
+#   instead of polling a file.
+#
+
+
+import os
+import socket
+import sqlite3
+import time
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TS', 'smartSip', 'orders.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipe TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    created REAL NOT NULL,
+    taken REAL,
+    done REAL
+)
+"""
+
+
+class OrderQueue:
+    def __init__(self, path=DEFAULT_DB, consumer=False):
+        self.path = path
+        self.sock_path = path + '.sock'
+
+        self.db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(SCHEMA)
+
+        # the consumer listens for wake-ups, producers only send them
+        self.listener = None
+        if consumer:
+            if os.path.exists(self.sock_path):
+                os.unlink(self.sock_path)
+            self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.listener.bind(self.sock_path)
+        self.notifier = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def close(self):
+        self.db.close()
+        self.notifier.close()
+        if self.listener is not None:
+            self.listener.close()
+            if os.path.exists(self.sock_path):
+                os.unlink(self.sock_path)
+
+    # add an order (raw recipe text as written by the GUI), returns its id
+    def put(self, recipe):
+        cur = self.db.execute('INSERT INTO orders (recipe, created) VALUES (?, ?)', (recipe, time.time()))
+
+        # wake the consumer; nobody listening just means nobody is waiting yet
+        try:
+            self.notifier.sendto(b'1', self.sock_path)
+        except OSError:
+            pass
+
+        return cur.lastrowid
+
+    # take the oldest queued order without waiting, returns (id, recipe) or None
+    def try_get(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.db.execute("SELECT id, recipe FROM orders WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                self.db.execute("UPDATE orders SET status = 'taken', taken = ? WHERE id = ?", (time.time(), row[0]))
+            self.db.execute('COMMIT')
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+
+        return row
+
+    # take the oldest queued order, sleeping until one arrives (None on timeout)
+    def get(self, timeout=None):
+        if self.listener is None:
+            raise RuntimeError("only a consumer queue can wait for orders")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            row = self.try_get()
+            if row is not None:
+                return row
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+
+            self.listener.settimeout(remaining)
+            try:
+                self.listener.recv(64)
+            except socket.timeout:
+                pass
+
+    # mark an order as poured
+    def done(self, order_id):
+        self.db.execute("UPDATE orders SET status = 'done', done = ? WHERE id = ?", (time.time(), order_id))
+
+    # put one taken order back in line (its station lost its camera mid-drink)
+    def requeue(self, order_id):
+        self.db.execute("UPDATE orders SET status = 'queued', taken = NULL WHERE id = ? AND status = 'taken'", (order_id,))
+
+    # give up on a taken order (it cannot be made, e.g. its recipe does not parse or the cycle keeps failing)
+    def fail(self, order_id):
+        self.db.execute("UPDATE orders SET status = 'failed', done = ? WHERE id = ? AND status = 'taken'", (time.time(), order_id))
+
+    # put orders that were taken but never finished (e.g. the master restarted mid-pour) back in line
+    def requeue_unfinished(self):
+        return self.db.execute("UPDATE orders SET status = 'queued', taken = NULL WHERE status = 'taken'").rowcount
+
+    # number of orders waiting
+    def pending(self):
+        return self.db.execute("SELECT COUNT(*) FROM orders WHERE status = 'queued'").fetchone()[0]
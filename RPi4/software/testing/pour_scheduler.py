@@ -0,0 +1,108 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Parallel pour scheduling. Every ingredient valve needed for a drink is opened together and closed
+#   when its own pour time is up, so a drink takes about as long as its longest ingredient instead of
+#   the sum of all of them. Close times are kept on a heap of monotonic deadlines. An optional wait
+#   function lets an outside event (e.g. the camera seeing the fill target reached) close a valve
+#   before its timer runs out.
+#
+#   Controller commands used: 3 - 6 open solenoid 1 - 4, 8 - 11 close solenoid 1 - 4, 7 close all.
+#
+
+
+import heapq
+import time
+
+import log
+
+OPEN = (3, 4, 5, 6)
+CLOSE = (8, 9, 10, 11)
+ALL_OFF = 7
+
+
+# pour time (s) for each ingredient: oz * % / (oz / s) = s
+def plan(vol, recipe, flowrates):
+    return [(i, vol * recipe[i] / flowrates[i]) for i in range(len(recipe)) if recipe[i] > 0]
+
+
+# cumulative volume (oz) in the cup at the moment each valve closes, if every valve runs its full time
+# returns (valve, oz) pairs following the same opening order and cap as PourScheduler
+def fill_targets(jobs, flowrates, max_open=None):
+    waiting = sorted(jobs, key=lambda job: job[1], reverse=True)
+    limit = len(waiting) if max_open is None else max(max_open, 1)
+
+    # replay the schedule on a virtual clock
+    spans = []
+    running = []
+    now = 0.0
+    while waiting or running:
+        while waiting and len(running) < limit:
+            valve, t = waiting.pop(0)
+            heapq.heappush(running, (now + t, valve, now))
+        now, valve, opened = heapq.heappop(running)
+        spans.append((valve, opened, now))
+
+    targets = []
+    for valve, opened, closed in spans:
+        oz = sum(flowrates[v] * max(0.0, min(c, closed) - o) for v, o, c in spans)
+        targets.append((valve, oz))
+    return targets
+
+
+class PourScheduler:
+    # clock / sleep default to time.monotonic / time.sleep, looked up when the scheduler is made
+    def __init__(self, bus, address, max_open=None, clock=None, sleep=None, wait=None):
+        self.bus = bus
+        self.address = address
+        self.max_open = max_open    # cap on valves open at once (None = no cap)
+        self.clock = time.monotonic if clock is None else clock
+        self.sleep = time.sleep if sleep is None else sleep
+
+        # wait(timeout) -> valve to close early, or None once timeout has passed with no event
+        self.wait = wait
+
+        # valves the last run closed on their timer rather than on an event
+        self.timed_out = []
+
+    # run the given (valve, seconds) jobs, returns the total pour time
+    def run(self, jobs):
+        # with a cap, longest pours go first so the drink finishes as early as possible
+        waiting = sorted(jobs, key=lambda job: job[1], reverse=True)
+        limit = len(waiting) if self.max_open is None else max(self.max_open, 1)
+
+        deadlines = []
+        self.timed_out = []
+        start = self.clock()
+        try:
+            while waiting or deadlines:
+                # open as many valves as allowed
+                while waiting and len(deadlines) < limit:
+                    valve, t = waiting.pop(0)
+                    log.info("pouring ingredient {} for {} seconds.", valve, t)
+                    self.bus.write_byte(self.address, OPEN[valve])
+                    heapq.heappush(deadlines, (self.clock() + t, valve))
+
+                # wait for the next valve that is due, or an early close
+                deadline, valve = deadlines[0]
+                remaining = deadline - self.clock()
+                if remaining > 0 and self.wait is not None:
+                    early = self.wait(remaining)
+                    if early is not None:
+                        if any(v == early for d, v in deadlines):
+                            deadlines = [(d, v) for d, v in deadlines if v != early]
+                            heapq.heapify(deadlines)
+                            self.bus.write_byte(self.address, CLOSE[early])
+                        continue
+                elif remaining > 0:
+                    self.sleep(remaining)
+
+                heapq.heappop(deadlines)
+                self.bus.write_byte(self.address, CLOSE[valve])
+                self.timed_out.append(valve)
+        finally:
+            # never leave a valve open
+            self.bus.write_byte(self.address, ALL_OFF)
+
+        return self.clock() - start
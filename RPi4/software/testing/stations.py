@@ -0,0 +1,228 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Multi-station master. One selector loop accepts camera node connections (each names its station
+#   in a HELLO), hands orders to the first free station and books them when they finish. Every station
+#   has its own gantry / valve controller address and makes its drink (centering, volume, pour) on its
+#   own worker, so stations pour at the same time and throughput grows with the number of stations.
+#
+
+
+import collections
+import selectors
+import socket
+import threading
+import time
+
+import log
+import metrics
+import protocol
+
+# times an order is handed out before it is given up on (it keeps losing its station's camera node)
+MAX_ATTEMPTS = 3
+
+
+class Station:
+    def __init__(self, number, bus, address):
+        self.number = number
+        self.bus = bus              # controller.Controller (or anything with write_byte)
+        self.address = address      # I2C address of the station's hardware controller
+        self.conn = None            # camera node connection, None until its HELLO
+        self.addr = None
+        self.order = None           # order id being made, None when free
+        self.orders = 0             # drinks made
+
+    def free(self):
+        return self.conn is not None and self.order is None
+
+
+class Master:
+    # cycle(conn, bus, address, recipe) makes one drink, raising ConnectionError / TimeoutError when the
+    # camera node is lost (the order is requeued, up to MAX_ATTEMPTS times); parse turns an order's text
+    # into the recipe handed to cycle; any other error from either fails that order only
+    # metrics are exported to metrics_path (if given) after every finished drink
+    def __init__(self, listener, stations, orders, cycle, parse=lambda text: text, metrics_path=None):
+        self.listener = listener
+        self.stations = {station.number: station for station in stations}
+        self.orders = orders
+        self.cycle = cycle
+        self.parse = parse
+        self.metrics_path = metrics_path
+
+        # workers report finished cycles here and poke the loop awake
+        self.finished = collections.deque()
+        self.wake_r, self.wake_w = socket.socketpair()
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(listener, selectors.EVENT_READ, self._accept)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, self._wake)
+        if orders.listener is not None:
+            self.selector.register(orders.listener, selectors.EVENT_READ, self._poked)
+
+        self.running = True
+        self.completed = 0
+        self.failed = 0             # cycles that did not finish (requeued or given up on)
+        self.attempts = {}          # order id -> times handed out
+
+    def close(self):
+        self.running = False
+        self.wake_w.send(b'1')
+
+    # run the loop until close()
+    def run(self):
+        self._dispatch()
+        while self.running:
+            for key, events in self.selector.select():
+                key.data(key.fileobj)
+            self._dispatch()
+        self.selector.close()
+
+    # a camera node connected, it is not a station until its HELLO arrives
+    def _accept(self, listener):
+        sock, addr = listener.accept()
+        protocol.keepalive(sock)
+        conn = protocol.Connection(sock)
+        self.selector.register(conn, selectors.EVENT_READ, lambda conn: self._hello(conn, addr))
+
+    def _hello(self, conn, addr):
+        try:
+            msg = conn.recv(timeout=0)
+        except (ConnectionError, TimeoutError):
+            self.selector.unregister(conn)
+            conn.close()
+            return
+        if msg is None:
+            return
+
+        self.selector.unregister(conn)
+        station = self.stations.get(protocol.unpack_hello(msg.payload)) if msg.type == protocol.HELLO else None
+        if station is None:
+            log.warning("unknown camera node {}, closing", str(addr))
+            conn.close()
+            return
+
+        # a reconnect replaces the old connection (a cycle still running on it fails and is requeued)
+        if station.conn is not None:
+            self._drop(station)
+        station.conn = conn
+        station.addr = addr
+        log.info("station {} connected to by : {}", station.number, str(addr))
+        metrics.count('master_station_connects_total')
+        if station.order is None:
+            self._watch(station)
+
+    # an idle station's camera only ever speaks up by hanging up
+    def _watch(self, station):
+        self.selector.register(station.conn, selectors.EVENT_READ, lambda conn: self._idle(station))
+
+    def _idle(self, station):
+        try:
+            station.conn.recv(timeout=0)
+        except (ConnectionError, TimeoutError):
+            log.warning("station {} lost its camera node", station.number)
+            self._drop(station)
+
+    def _drop(self, station):
+        conn = station.conn
+        station.conn = None
+        if station.order is None:
+            self.selector.unregister(conn)
+            conn.close()
+        else:
+            # wakes the worker blocked on it, which closes it when it reports back
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _poked(self, listener):
+        listener.recv(64)
+
+    def _wake(self, sock):
+        sock.recv(64)
+        while self.finished:
+            station, conn, order_id, outcome = self.finished.popleft()
+            station.order = None
+            attempts = self.attempts.pop(order_id, 1)
+            if outcome == 'done':
+                self.orders.done(order_id)
+                station.orders += 1
+                self.completed += 1
+            else:
+                self.failed += 1
+                if outcome == 'lost':
+                    # the camera node reconnects by itself
+                    if station.conn is conn:
+                        station.conn = None
+                    if attempts < MAX_ATTEMPTS:
+                        # the half-made order goes back in line
+                        self.attempts[order_id] = attempts
+                        self.orders.requeue(order_id)
+                    else:
+                        log.error("order {} lost its station {} times, giving up", order_id, attempts)
+                        self.orders.fail(order_id)
+                else:
+                    self.orders.fail(order_id)
+
+            # the connection may have been dropped or replaced while the worker had it
+            if station.conn is not conn:
+                conn.close()
+            if station.conn is not None:
+                self._watch(station)
+
+            # where this cycle's time went
+            if self.metrics_path is not None:
+                metrics.gauge('master_orders_waiting', self.orders.pending())
+                metrics.export(self.metrics_path)
+                log.info("{}", metrics.summary())
+                if hasattr(station.bus, 'summary'):
+                    log.info("station {}:\n{}", station.number, station.bus.summary())
+
+    # give queued orders to the free stations, lowest station number first
+    def _dispatch(self):
+        for number in sorted(self.stations):
+            station = self.stations[number]
+            if not station.free():
+                continue
+            row = self.orders.try_get()
+            if row is None:
+                return
+
+            order_id, text = row
+            station.order = order_id
+            self.attempts[order_id] = self.attempts.get(order_id, 0) + 1
+            self.selector.unregister(station.conn)
+            log.info("station {}: order {} ({} waiting)", number, order_id, self.orders.pending())
+            worker = threading.Thread(target=self._work, args=(station, station.conn, order_id, text), daemon=True)
+            worker.start()
+
+    # make one order on its station's worker; reports 'done', 'lost' (camera node gone, the order may be
+    # retried) or 'failed' (anything else, the order is given up on) back to the loop
+    def _work(self, station, conn, order_id, text):
+        start = time.perf_counter()
+        outcome = 'failed'
+        try:
+            self.cycle(conn, station.bus, station.address, self.parse(text))
+            outcome = 'done'
+            metrics.observe('master_cycle_seconds', time.perf_counter() - start)
+            metrics.count('master_orders_total')
+        except (ConnectionError, TimeoutError) as e:
+            outcome = 'lost'
+            log.warning("station {}: connection lost ({})", station.number, str(e))
+            metrics.count('master_reconnects_total')
+            self._home(station)
+        except Exception as e:
+            log.error("station {}: order {} failed ({})", station.number, order_id, repr(e))
+            metrics.count('master_orders_failed_total')
+            self._home(station)
+        finally:
+            self.finished.append((station, conn, order_id, outcome))
+            self.wake_w.send(b'1')
+
+    # send the gantry home after an abandoned cycle (the valves close with the move)
+    def _home(self, station):
+        try:
+            station.bus.write_byte(station.address, 1)
+        except OSError as e:
+            log.error("station {}: could not send the gantry home ({})", station.number, str(e))
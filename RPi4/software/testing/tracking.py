@@ -0,0 +1,74 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Cup tracking for predictive centering. An alpha-beta (constant velocity) filter smooths the pixel
+#   offsets streamed by camera_node.py and predicts when the cup will pass under the nozzle, so the
+#   stop command can be sent early enough to cover the camera -> TCP -> I2C -> motor latency.
+#
+
+
+class AlphaBetaTracker:
+    def __init__(self, alpha=0.6, beta=0.2, min_dt=0.01):
+        self.alpha = alpha
+        self.beta = beta
+        self.min_dt = min_dt    # frames closer than this don't get to swing the velocity
+
+        self.x = None       # filtered offset (pixels)
+        self.v = 0.0        # filtered velocity (pixels / s)
+        self.t = None       # capture time of the estimate (master clock, s)
+        self.updates = 0
+
+    def reset(self):
+        self.x = None
+        self.v = 0.0
+        self.t = None
+        self.updates = 0
+
+    # fold in one measurement taken at capture time t (velocity seeds the filter on the first frame)
+    def update(self, offset, t, velocity=0.0):
+        if self.x is None:
+            self.x = offset
+            self.v = velocity
+            self.t = t
+            self.updates = 1
+            return
+
+        dt = t - self.t
+        if dt <= 0:
+            return
+
+        # predict, then correct with the residual
+        x_pred = self.x + self.v * dt
+        residual = offset - x_pred
+        self.x = x_pred + self.alpha * residual
+        self.v = self.v + self.beta * residual / max(dt, self.min_dt)
+        self.t = t
+        self.updates += 1
+
+    # predicted offset at time t
+    def predict(self, t):
+        if self.x is None:
+            return None
+        return self.x + self.v * (t - self.t)
+
+    # whether the cup is moving towards the center
+    def approaching(self):
+        return self.x is not None and self.x * self.v < 0
+
+    # seconds from now until the stop command has to be sent so the cup stops within threshold of the center
+    # (0 if it should be sent right away, None if the cup is not approaching)
+    def stop_delay(self, now, actuation, threshold=1.0):
+        if self.x is None or self.updates < 2:
+            return None
+
+        # the stop takes effect actuation seconds after it is sent
+        x_stop = self.predict(now + actuation)
+        if abs(x_stop) <= threshold or x_stop * self.x < 0:
+            return 0.0
+        if not self.approaching():
+            return None
+
+        # time at which the cup reaches the center, measured from the estimate
+        t_center = self.t - self.x / self.v
+        return max(t_center - actuation - now, 0.0)
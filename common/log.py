@@ -0,0 +1,188 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Console logging off the hot path, shared by camera_node.py and centering.py. A log call only checks
+#   the level and appends its format string and arguments to a bounded ring buffer; a background
+#   thread formats and writes them out, so a slow terminal (SSH, serial console) never holds up a
+#   frame. When the console falls behind, the oldest lines are dropped and counted, never waited for.
+#   Messages below the echo level are still kept in a history ring and written out by dump(), e.g.
+#   when an error is logged or an exception leaves a dumping() block.
+#
+#   log.info("poured in {:.2f} seconds.", t)
+#   log.debug("{:.1f} px  {:.1f} px/s", offset, velocity, every=0.5)    # at most once per 0.5 s
+#   with log.dumping():
+#       ...
+#
+#   Arguments are formatted later on another thread, so pass values (numbers, strings), not arrays
+#   or objects that are about to change.
+#
+
+
+import atexit
+import collections
+import sys
+import threading
+import time
+
+# levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+
+class Logger:
+    # level: messages below it are not even recorded, echo: messages from it up are written to the
+    # console, the rest only kept for dump(); capacity: lines kept in each ring (console and history)
+    # dump_on_error: an error() writes out the history first; stream: None writes to sys.stdout
+    def __init__(self, level=DEBUG, echo=INFO, capacity=1024, interval=0.05, dump_on_error=True, stream=None):
+        self.level = level
+        self.echo = echo
+        self.interval = interval
+        self.dump_on_error = dump_on_error
+        self.stream = stream
+
+        # (monotonic time, level, format, args, suppressed) entries, appended without a lock
+        self.console = collections.deque(maxlen=capacity)
+        self.history = collections.deque(maxlen=capacity)
+        self.last = {}          # format -> time of its last recorded message, for rate limiting
+        self.suppressed = {}    # format -> messages rate limited since then
+        self.dropped = 0        # console lines lost because the console fell behind
+        self.start = time.monotonic()
+
+        self.lock = threading.Lock()    # one writer at a time
+        self.wake = threading.Event()
+        self.writer = None
+
+    # record a message (str.format style, formatted on the writer thread)
+    # every: rate limit for this format string, at most one message per every seconds
+    def log(self, level, fmt, *args, every=None):
+        if level < self.level:
+            return
+        now = time.monotonic()
+
+        suppressed = 0
+        if every is not None:
+            last = self.last.get(fmt)
+            if last is not None and now - last < every:
+                self.suppressed[fmt] = self.suppressed.get(fmt, 0) + 1
+                return
+            self.last[fmt] = now
+            suppressed = self.suppressed.pop(fmt, 0)
+
+        entry = (now, level, fmt, args, suppressed)
+        self.history.append(entry)
+        if level >= self.echo:
+            if len(self.console) == self.console.maxlen:
+                self.dropped += 1
+            self.console.append(entry)
+            if self.writer is None:
+                self._start()
+
+        if level >= ERROR and self.dump_on_error:
+            self.flush()
+            self.dump()
+
+    def debug(self, fmt, *args, every=None):
+        self.log(DEBUG, fmt, *args, every=every)
+
+    def info(self, fmt, *args, every=None):
+        self.log(INFO, fmt, *args, every=every)
+
+    def warning(self, fmt, *args, every=None):
+        self.log(WARNING, fmt, *args, every=every)
+
+    def error(self, fmt, *args, every=None):
+        self.log(ERROR, fmt, *args, every=every)
+
+    def _start(self):
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._run, daemon=True)
+                self.writer.start()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    # write out every console line recorded so far (called by the writer thread, and at exit)
+    def flush(self):
+        with self.lock:
+            lines = []
+            while self.console:
+                lines.append(self._format(self.console.popleft()))
+            if lines:
+                self._write("\n".join(lines) + "\n")
+
+    # write out the history, debug detail included, each line stamped with its time since start
+    def dump(self):
+        entries = list(self.history)
+        with self.lock:
+            lines = ["---- last " + str(len(entries)) + " log messages ----"]
+            for entry in entries:
+                lines.append("[+" + "{:.3f}".format(entry[0] - self.start) + " " + NAMES.get(entry[1], str(entry[1])) + "] " + self._format(entry))
+            lines.append("----")
+            self._write("\n".join(lines) + "\n")
+
+    def _format(self, entry):
+        t, level, fmt, args, suppressed = entry
+        try:
+            text = fmt.format(*args) if args else fmt
+        except (IndexError, KeyError, ValueError) as e:
+            text = fmt + " " + repr(args) + " (" + str(e) + ")"
+        if suppressed:
+            text += " (" + str(suppressed) + " more suppressed)"
+        return text
+
+    def _write(self, text):
+        stream = sys.stdout if self.stream is None else self.stream
+        try:
+            stream.write(text)
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    # context manager: an exception leaving the block dumps the history first
+    def dumping(self):
+        return Dumping(self)
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name) or name in ('console', 'history'):
+                raise AttributeError("unknown log setting: " + name)
+            setattr(self, name, value)
+
+
+class Dumping:
+    def __init__(self, logger):
+        self.logger = logger
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, tb):
+        if kind is not None and not issubclass(kind, (KeyboardInterrupt, SystemExit)):
+            self.logger.flush()
+            self.logger.dump()
+        return False
+
+
+# process-wide logger and shortcuts to it
+LOGGER = Logger()
+atexit.register(LOGGER.flush)
+
+log = LOGGER.log
+debug = LOGGER.debug
+info = LOGGER.info
+warning = LOGGER.warning
+error = LOGGER.error
+flush = LOGGER.flush
+dump = LOGGER.dump
+dumping = LOGGER.dumping
+configure = LOGGER.configure
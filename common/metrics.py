@@ -0,0 +1,179 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Low-overhead instrumentation shared by camera_node.py and centering.py: counters, gauges and
+#   fixed-bucket timing histograms, fed by a timer that works as a context manager or a decorator.
+#   Snapshots can be written as JSON or Prometheus text to a local file, and a short summary printed
+#   at the end of each drink cycle.
+#
+#   with metrics.timer('camera_rim_seconds'):
+#       ...
+#   @metrics.timed('camera_volume_seconds')
+#   def volume_estimate(...):
+#
+
+
+import functools
+import json
+import os
+import threading
+import time
+
+# histogram bucket upper bounds (s)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.n = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.n += 1
+        if value > self.max:
+            self.max = value
+
+    # approximate quantile from the bucket counts (upper bound of the bucket it falls in)
+    def quantile(self, q):
+        if self.n == 0:
+            return 0.0
+        target = q * self.n
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Timer:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.observe(value)
+
+    def timer(self, name):
+        return Timer(self, name)
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with Timer(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "time": time.time(),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: {"n": h.n, "sum": h.sum, "max": h.max,
+                                      "buckets": [[b if b != float('inf') else "+Inf", c] for b, c in zip(h.bounds, h.counts)]}
+                               for name, h in self.histograms.items()},
+            }
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append("# TYPE " + name + " counter")
+                lines.append(name + " " + repr(float(value)))
+            for name, value in sorted(self.gauges.items()):
+                lines.append("# TYPE " + name + " gauge")
+                lines.append(name + " " + repr(float(value)))
+            for name, h in sorted(self.histograms.items()):
+                lines.append("# TYPE " + name + " histogram")
+                seen = 0
+                for bound, count in zip(h.bounds, h.counts):
+                    seen += count
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(name + '_bucket{le="' + le + '"} ' + str(seen))
+                lines.append(name + "_sum " + repr(h.sum))
+                lines.append(name + "_count " + str(h.n))
+        return "\n".join(lines) + "\n"
+
+    # write a snapshot atomically, as JSON for *.json paths and Prometheus text otherwise
+    def export(self, path):
+        text = json.dumps(self.snapshot(), indent=1) if path.endswith('.json') else self.prometheus()
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    # one line per metric: counts, and mean / p50 / p90 / max for timings
+    def summary(self):
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(name + ": " + str(value))
+            for name, value in sorted(self.gauges.items()):
+                lines.append(name + ": " + str(value))
+            for name, h in sorted(self.histograms.items()):
+                mean = h.sum / h.n if h.n else 0.0
+                lines.append(name + ": n=" + str(h.n) + " mean=" + "{:.4f}".format(mean) + " p50<=" + "{:.4f}".format(h.quantile(0.5))
+                             + " p90<=" + "{:.4f}".format(h.quantile(0.9)) + " max=" + "{:.4f}".format(h.max))
+        return "\n".join(lines)
+
+
+# process-wide registry and shortcuts to it
+REGISTRY = Registry()
+
+count = REGISTRY.count
+gauge = REGISTRY.gauge
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+snapshot = REGISTRY.snapshot
+prometheus = REGISTRY.prometheus
+export = REGISTRY.export
+summary = REGISTRY.summary
+reset = REGISTRY.reset
@@ -0,0 +1,261 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Framed TCP protocol shared by camera_node.py (RPi3) and centering.py (RPi4). Every message is
+#   length-prefixed and carries a type, a sequence number and the capture time of the data it
+#   describes, so streamed messages can never run together and the receiver can skip straight to
+#   the newest one.
+#
+#   frame layout (network byte order):
+#       uint32 length of everything after this field
+#       uint8  message type
+#       uint32 sequence number (per sender)
+#       double capture timestamp (seconds since the epoch)
+#       ...    payload
+#
+
+
+import collections
+import select
+import socket
+import struct
+import time
+
+# message types
+START = 1           # master -> camera: begin a drink cycle (centering)
+CENTER = 2          # camera -> master: centering telemetry for one frame
+VOLUME = 3          # camera -> master: volume estimate (oz)
+POUR = 4            # master -> camera: pouring has started, carries per-valve fill targets (oz)
+TEXT = 5            # either way: free-form text, for logging
+SYNC = 6            # master -> camera -> master: clock offset / round trip measurement
+CENTERED = 7        # master -> camera: gantry stopped, centering is over
+LEVEL = 8           # camera -> master: fill target of a valve reached
+POURED = 9          # master -> camera: pouring is over
+HELLO = 10          # camera -> master: first message on a connection, names the camera's station
+READY = 11          # camera -> master: START acknowledged, centering telemetry follows
+REMOVED = 12        # camera -> master: the poured cup has been taken off the tray
+UNMONITORED = 13    # camera -> master: the pour can't be watched, the valve timers alone decide
+
+NAMES = {START: 'START', CENTER: 'CENTER', VOLUME: 'VOLUME', POUR: 'POUR', TEXT: 'TEXT', SYNC: 'SYNC', CENTERED: 'CENTERED',
+         LEVEL: 'LEVEL', POURED: 'POURED', HELLO: 'HELLO', READY: 'READY', REMOVED: 'REMOVED',
+         UNMONITORED: 'UNMONITORED'}
+
+LENGTH = struct.Struct('!I')
+HEADER = struct.Struct('!BId')
+VOLUME_PAYLOAD = struct.Struct('!d')
+SYNC_PAYLOAD = struct.Struct('!d')
+HELLO_PAYLOAD = struct.Struct('!B')
+
+# valve index and fill volume (oz), repeated per valve for POUR targets
+LEVEL_PAYLOAD = struct.Struct('!Bf')
+
+# present, centered, offset (pixels, signed), velocity (pixels / s), ground height, rim values and rim indices
+CENTER_PAYLOAD = struct.Struct('!BBfffffhh')
+CenterStatus = collections.namedtuple('CenterStatus', 'present centered offset velocity gnd val_1 val_2 idx_1 idx_2')
+
+Message = collections.namedtuple('Message', 'type seq stamp payload')
+
+MAX_FRAME = 1 << 20
+
+
+# convert a time.monotonic() capture time into a wall-clock timestamp for the wire
+def wall_clock(stamp=None):
+    if stamp is None:
+        return time.time()
+    return time.time() - (time.monotonic() - stamp)
+
+def pack_center(present, centered, offset, velocity=0.0, gnd=0.0, val_1=0.0, val_2=0.0, idx_1=0, idx_2=0):
+    return CENTER_PAYLOAD.pack(bool(present), bool(centered), offset, velocity, gnd, val_1, val_2, idx_1, idx_2)
+
+def unpack_center(payload):
+    present, centered, offset, velocity, gnd, val_1, val_2, idx_1, idx_2 = CENTER_PAYLOAD.unpack(payload)
+    return CenterStatus(bool(present), bool(centered), offset, velocity, gnd, val_1, val_2, idx_1, idx_2)
+
+def pack_targets(targets):
+    return b''.join(LEVEL_PAYLOAD.pack(valve, oz) for valve, oz in targets)
+
+def unpack_targets(payload):
+    return list(LEVEL_PAYLOAD.iter_unpack(payload))
+
+def pack_level(valve, oz):
+    return LEVEL_PAYLOAD.pack(valve, oz)
+
+def unpack_level(payload):
+    return LEVEL_PAYLOAD.unpack(payload)
+
+def pack_hello(station):
+    return HELLO_PAYLOAD.pack(station)
+
+def unpack_hello(payload):
+    return HELLO_PAYLOAD.unpack(payload)[0]
+
+def pack_volume(volume):
+    return VOLUME_PAYLOAD.pack(volume)
+
+def unpack_volume(payload):
+    return VOLUME_PAYLOAD.unpack(payload)[0]
+
+
+class Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.seq = 0
+        self.buffer = bytearray()
+        self.pending = collections.deque()
+
+        # small telemetry frames must go out as soon as they are written
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, kind, payload=b'', stamp=None):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        body = HEADER.pack(kind, self.seq, wall_clock(stamp)) + payload
+        self.sock.sendall(LENGTH.pack(len(body)) + body)
+        return self.seq
+
+    def send_text(self, text):
+        return self.send(TEXT, text.encode())
+
+    # split complete frames off the receive buffer
+    def _parse(self):
+        while len(self.buffer) >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(self.buffer)
+            if length < HEADER.size or length > MAX_FRAME:
+                raise ConnectionError("bad frame length " + str(length))
+            if len(self.buffer) < LENGTH.size + length:
+                return
+            kind, seq, stamp = HEADER.unpack_from(self.buffer, LENGTH.size)
+            payload = bytes(self.buffer[LENGTH.size + HEADER.size:LENGTH.size + length])
+            del self.buffer[:LENGTH.size + length]
+            self.pending.append(Message(kind, seq, stamp, payload))
+
+    # read whatever is on the socket; blocks up to timeout (None = forever, 0 = poll)
+    def _fill(self, timeout):
+        if timeout is not None:
+            ready, _, _ = select.select([self.sock], [], [], timeout)
+            if not ready:
+                return False
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError("connection closed")
+        self.buffer += data
+        self._parse()
+        return True
+
+    # drop already received messages of a given type (e.g. telemetry left over from the last cycle)
+    def discard(self, kind):
+        self.pending = collections.deque(m for m in self.pending if m.type != kind)
+
+    # next message in arrival order (None on timeout)
+    def recv(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.pending:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self._fill(remaining) and deadline is not None and time.monotonic() >= deadline:
+                return None
+        return self.pending.popleft()
+
+    # next message of a given type (or of any of a tuple of types) in arrival order, keeping messages
+    # of other types for recv (None on timeout)
+    def recv_next(self, kind, timeout=None):
+        kinds = kind if isinstance(kind, tuple) else (kind,)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for msg in self.pending:
+                if msg.type in kinds:
+                    self.pending.remove(msg)
+                    return msg
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._fill(remaining)
+
+    # newest message of a given type, skipping any older ones of that type already received
+    # messages of other types are kept in order for recv
+    def recv_latest(self, kind, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # take everything already sitting in the socket
+            while self._fill(0):
+                pass
+
+            latest = None
+            for msg in self.pending:
+                if msg.type == kind:
+                    latest = msg
+            if latest is not None:
+                self.pending = collections.deque(m for m in self.pending if m.type != kind)
+                return latest
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._fill(remaining)
+
+# turn on TCP keepalives so a dead peer (pulled cable, master lost power) shows up as a socket error
+# within about idle + interval * count seconds instead of a recv that never returns
+def keepalive(sock, idle=1, interval=1, count=3):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+# connect to host:port, retrying with bounded exponential backoff until the peer is up
+# gives up (raising the last error) after deadline seconds, None keeps trying
+def connect(host, port, timeout=1.0, backoff=0.05, max_backoff=0.5, deadline=None):
+    delay = backoff
+    end = None if deadline is None else time.monotonic() + deadline
+    while True:
+        try:
+            sock = socket.create_connection((host, port), timeout)
+        except OSError:
+            if end is not None and time.monotonic() + delay > end:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, max_backoff)
+            continue
+        sock.settimeout(None)
+        keepalive(sock)
+        return sock
+
+# measure the clock offset (peer clock - local clock) and round trip time with a few SYNC exchanges,
+# keeping the one with the shortest round trip
+# a reply only counts for the round whose send time it echoes, a late one from an earlier round (or an
+# earlier cycle) is dropped, it would be timed from the wrong send; raises TimeoutError if no round got
+# its reply (an offset of 0 would silently mistime everything stamped by the peer)
+def sync_clock(conn, rounds=5, timeout=1.0):
+    best = None
+    for i in range(rounds):
+        t0 = time.time()
+        payload = SYNC_PAYLOAD.pack(t0)
+        conn.send(SYNC, payload)
+        deadline = time.monotonic() + timeout
+        msg = conn.recv_next(SYNC, timeout)
+        while msg is not None and msg.payload != payload:
+            msg = conn.recv_next(SYNC, max(deadline - time.monotonic(), 0))
+        t2 = time.time()
+        if msg is None:
+            continue
+
+        rtt = t2 - t0
+        offset = msg.stamp - (t0 + t2) / 2
+        if best is None or rtt < best[1]:
+            best = (offset, rtt)
+
+    if best is None:
+        raise TimeoutError("no SYNC reply in " + str(rounds) + " rounds")
+    return best
+
+# reply to a SYNC request from the peer
+def answer_sync(conn, msg):
+    conn.send(SYNC, msg.payload)
@@ -0,0 +1,137 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Drop-in stand-in for Arducam's ArducamDepthCamera module. Put this folder on the python path ahead
+#   of the real SDK and camera_node.py runs on any machine. Frames come either from a synthetic scene
+#   (see scene.py) or from a recorded stack of depth frames replayed in a loop.
+#
+#   Configure before (or while) the camera is used:
+#       import ArducamDepthCamera as ac
+#       ac.configure(scene=scene.Scene(scene.Cup(x=0.05)), fps=30)
+#       ac.configure(replay='frames.npy')
+#
+
+
+import threading
+import time
+
+import numpy as np
+
+import scene as _scene
+
+
+class TOFConnect:
+    CSI = 0
+
+
+class TOFOutput:
+    RAW = 0
+    DEPTH = 1
+
+
+class TOFControl:
+    RANG = 0
+    FMT_WIDTH = 1
+    FMT_HEIGHT = 2
+
+
+# simulation settings shared by every camera instance
+settings = {
+    "scene": _scene.Scene(),
+    "replay": None,     # (N, 180, 240) depth frames, or a path to a .npy file holding them
+    "fps": 0,           # 0 delivers frames as fast as they are asked for
+    "startup": 0.0,     # seconds start() takes to bring the sensor up
+}
+
+
+def configure(scene=None, replay=None, fps=None, startup=None):
+    if scene is not None:
+        settings["scene"] = scene
+    if replay is not None:
+        settings["replay"] = np.load(replay) if isinstance(replay, str) else np.asarray(replay)
+    if fps is not None:
+        settings["fps"] = fps
+    if startup is not None:
+        settings["startup"] = startup
+
+
+class ArducamFrame:
+    def __init__(self, depth, amplitude):
+        self.depth = depth
+        self.amplitude = amplitude
+
+    def getDepthData(self):
+        return self.depth
+
+    def getAmplitudeData(self):
+        return self.amplitude
+
+
+class ArducamCamera:
+    def __init__(self):
+        self.opened = False
+        self.started = False
+        self.controls = {}
+        self.index = 0
+        self.next_time = 0.0
+        self.outstanding = 0
+        self.lock = threading.Lock()
+
+    def open(self, connect, index):
+        self.opened = True
+        return 0
+
+    def close(self):
+        self.opened = False
+        return 0
+
+    def start(self, output):
+        if not self.opened:
+            return -1
+        time.sleep(settings["startup"])
+        self.started = True
+        return 0
+
+    def stop(self):
+        self.started = False
+        return 0
+
+    def setControl(self, control, value):
+        self.controls[control] = value
+        return 0
+
+    def getControl(self, control):
+        return self.controls.get(control, 0)
+
+    def requestFrame(self, timeout):
+        if not self.started:
+            return None
+
+        # pace frames to the configured frame rate
+        fps = settings["fps"]
+        if fps:
+            now = time.monotonic()
+            if self.next_time > now:
+                time.sleep(self.next_time - now)
+            self.next_time = max(now, self.next_time) + 1.0 / fps
+
+        replay = settings["replay"]
+        with self.lock:
+            if replay is not None:
+                depth = np.array(replay[self.index % len(replay)], dtype=np.float32)
+                amplitude = (60.0 / np.maximum(depth, 0.05)**2).astype(np.float32)
+            else:
+                depth, amplitude = settings["scene"].render()
+            self.index += 1
+            self.outstanding += 1
+
+        return ArducamFrame(depth, amplitude)
+
+    def releaseFrame(self, frame):
+        with self.lock:
+            self.outstanding -= 1
+        # the SDK reuses the buffer after release, make stale reads obvious
+        frame.depth = None
+        frame.amplitude = None
+        return 0
@@ -0,0 +1,889 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Benchmarks for camera_node.py and centering.py on a plain Linux box, using the simulated camera,
+#   smbus and gantry in this folder. Reports throughput, latency percentiles and estimate error.
+#
+#   usage: python3 sim/benchmark.py [--frames N] [--runs N] [--fps FPS] [--json out.json]
+#
+
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+
+# simulated hardware first, then both nodes
+sys.path.insert(0, HERE)
+sys.path.insert(1, os.path.join(ROOT, 'RPi3', 'software', 'testing'))
+sys.path.insert(2, os.path.join(ROOT, 'RPi4', 'software', 'testing'))
+sys.path.insert(3, os.path.join(ROOT, 'common'))
+
+import ArducamDepthCamera as ac
+import dataset
+import scene
+import smbus
+
+import acquisition
+import background
+import calibrate
+import camera_node
+import centering
+import controller
+import log
+import metrics
+import order_queue
+import protocol
+import recorder
+import stations
+import volume_model
+
+
+# summary statistics of a list of durations (s), reported in ms
+def percentiles(samples):
+    if len(samples) == 0:
+        return {"n": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(ms),
+        "mean_ms": float(np.mean(ms)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(np.max(ms)),
+    }
+
+# start a simulated camera and its acquisition thread (copying amplitude when camera_node masks by it)
+def start_camera(sim_scene, fps):
+    ac.configure(scene=sim_scene, fps=fps)
+    cam = ac.ArducamCamera()
+    cam.open(ac.TOFConnect.CSI, 0)
+    cam.start(ac.TOFOutput.DEPTH)
+    acq = acquisition.Acquisition(cam, amplitude=camera_node.MIN_AMPLITUDE is not None)
+    acq.start()
+    return cam, acq
+
+# receive on the master end of a socket pair, timestamping every message
+def drain(sock, arrivals, limit):
+    conn = protocol.Connection(sock)
+    while len(arrivals) < limit:
+        try:
+            msg = conn.recv()
+        except OSError:
+            break
+        arrivals.append((time.monotonic(), msg))
+    sock.close()
+
+# time n calls of fn
+def timed(fn, n):
+    times = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+# learn camera_node's empty-tray model from an empty scene (kept in memory only)
+def learn_tray(frames=20):
+    tray = background.Background(path=None)
+    sim_scene = scene.Scene(None, seed=99)
+    for i in range(frames):
+        tray.observe(sim_scene.render()[0])
+    camera_node.tray = tray
+    return tray
+
+# ground height and cup presence: per-frame estimate from the scan against the empty-tray model
+def bench_ground(frames, ground=0.40):
+    tray = learn_tray()
+    sim_scene = scene.Scene(scene.Cup(), ground=ground, seed=3)
+    scan_times, tray_times = [], []
+    scan_errors, tray_errors = [], []
+    for i in range(frames):
+        depth = sim_scene.render()[0]
+        laserScan = camera_node.fusion.fill_scan(np.where(depth[90] <= 0.5, depth[90], np.nan))
+
+        start = time.perf_counter()
+        gnd_idx = np.argmax(laserScan)
+        gnd = camera_node.get_height(laserScan, laserScan[gnd_idx], gnd_idx)
+        scan_times.append(time.perf_counter() - start)
+        scan_errors.append(abs(gnd - ground) * 1000)
+
+        start = time.perf_counter()
+        gnd = tray.ground()
+        tray.rise(laserScan)
+        tray_times.append(time.perf_counter() - start)
+        tray_errors.append(abs(gnd - ground) * 1000)
+
+    return {
+        "per_frame": {"latency": percentiles(scan_times), "error_mm_mean": float(np.mean(scan_errors))},
+        "background": {"latency": percentiles(tray_times), "error_mm_mean": float(np.mean(tray_errors))},
+        "empty_frame_check": percentiles(timed(lambda: tray.empty(depth), 20)),
+    }
+
+# the rim search camera_node used before rim.detect, kept for comparison: the closest pixel, then the
+# closest pixel outside rad of it (overwrites the scan, callers passed a copy)
+def nearest_pixel_rims(laserScan, rad):
+    val_1 = np.amin(laserScan)
+    idx_1 = np.where(laserScan == val_1)[0][0]
+    for i in range(idx_1 - rad, idx_1 + rad):
+        try:
+            laserScan[i] = 2
+        except IndexError:
+            continue
+    val_2 = np.amin(laserScan)
+    idx_2 = np.where(laserScan == val_2)[0][0]
+    return val_1, val_2, idx_1, idx_2
+
+# rim.detect on single centering scans against the old nearest-pixel search plus the copy it needed,
+# at centering's and the volume scan's rim radius; us per scan, best of repeats over the same scans
+# (taken in turns, so both see the same load)
+def bench_rim(frames, repeats=50):
+    sim_scene = scene.Scene(scene.Cup(x=0.02), seed=3)
+    scans = []
+    for i in range(frames):
+        depth = sim_scene.render()[0]
+        scans.append(camera_node.fusion.fill_scan(np.where(depth[90] <= 0.5, depth[90], np.nan)))
+
+    results = {}
+    for name, rad in (('center', 15), ('volume', 5)):
+        runs = {
+            "nearest_pixel": lambda: [nearest_pixel_rims(laserScan.copy(), rad) for laserScan in scans],
+            "detect": lambda: [camera_node.rim.detect(laserScan, rad) for laserScan in scans],
+        }
+        best = {key: float('inf') for key in runs}
+        for i in range(repeats):
+            for key, fn in runs.items():
+                best[key] = min([best[key]] + timed(fn, 1))
+        results[name] = {key: best[key] / frames * 1e6 for key in runs}
+        results[name]["speedup"] = results[name]["nearest_pixel"] / results[name]["detect"]
+    return results
+
+# camera_node.center: frames/sec with an off-center cup that never gets centered
+def bench_center_throughput(frames, fps, recording=None):
+    sim_scene = scene.Scene(scene.Cup(x=0.06))
+    cam, acq = start_camera(sim_scene, fps)
+    acq.recorder = recording
+
+    s, peer = socket.socketpair()
+    arrivals = []
+    receiver = threading.Thread(target=drain, args=(peer, arrivals, frames))
+    receiver.start()
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            camera_node.center(protocol.Connection(s), acq)
+        except OSError:
+            pass
+    receiver.join()
+    elapsed = time.monotonic() - start
+    acq.stop()
+    s.close()
+
+    stamps = [t for t, msg in arrivals]
+    ages = [time.time() - time.monotonic() + t - msg.stamp for t, msg in arrivals]
+    return {
+        "messages": len(arrivals),
+        "frames_per_s": len(arrivals) / elapsed if elapsed > 0 else 0.0,
+        "frame_interval": percentiles(np.diff(stamps)),
+        "capture_to_master": percentiles(ages),
+        "dropped_frames": acq.dropped,
+    }
+
+# camera_node.center with the tray empty for a while, then a cup set down in view: processing time and
+# frames looked at per second of waiting, and how soon the master hears about the cup, with the coarse
+# presence check and idle frame rate against the full pipeline on every frame
+def bench_idle(fps, wait=2.0, idle_fps=camera_node.IDLE_FPS):
+    learn_tray()
+    results = {}
+    for name, setting in (('full_pipeline', None), ('coarse_idle', idle_fps)):
+        camera_node.IDLE_FPS = setting
+        sim_scene = scene.Scene(None, seed=5)
+        cam, acq = start_camera(sim_scene, fps)
+
+        s, peer = socket.socketpair()
+        camera = protocol.Connection(s)
+        master = protocol.Connection(peer)
+        cpu = []
+
+        def camera_side():
+            start = time.thread_time()
+            camera_node.center(camera, acq)
+            cpu.append(time.thread_time() - start)
+
+        counters = metrics.REGISTRY.counters
+        before = counters.get('camera_frames_total', 0) + counters.get('camera_idle_frames_total', 0)
+        node = threading.Thread(target=camera_side)
+        node.start()
+        time.sleep(wait)
+        looked = counters.get('camera_frames_total', 0) + counters.get('camera_idle_frames_total', 0) - before
+        messages = 0
+        while master.recv(timeout=0) is not None:
+            messages += 1
+
+        # set a cup down and wait for the first CENTER message
+        sim_scene.cup = scene.Cup(x=0.06)
+        placed = time.monotonic()
+        msg = master.recv_next(protocol.CENTER, timeout=5.0)
+        response = time.monotonic() - placed if msg is not None else None
+        master.send(protocol.CENTERED)
+        node.join()
+        acq.stop()
+        s.close()
+        peer.close()
+
+        results[name] = {
+            "frames_looked_at_per_s": looked / wait,
+            "messages_while_empty": messages,
+            "cpu_ms_per_s": 1000 * cpu[0] / (wait + response if response is not None else wait),
+            "response_ms": 1000 * response if response is not None else None,
+        }
+    camera_node.IDLE_FPS = idle_fps
+    return results
+
+# camera_node.center + centering.center: time for the gantry to bring the cup under the nozzle
+def bench_center_search(runs, fps):
+    times = []
+    errors = []
+    for run in range(runs):
+        gantry = scene.Gantry(speed=0.02)
+        bus = smbus.SMBus(1)
+        bus.listeners.append(gantry.on_write)
+        sim_scene = scene.Scene(scene.Cup(x=0.04 + 0.01 * run), seed=run)
+        sim_scene.gantry = gantry
+        cam, acq = start_camera(sim_scene, fps)
+
+        s, peer = socket.socketpair()
+        camera = protocol.Connection(s)
+        master = protocol.Connection(peer)
+
+        def camera_side():
+            msg = camera.recv()
+            while msg.type == protocol.SYNC:
+                protocol.answer_sync(camera, msg)
+                msg = camera.recv()
+            camera.send(protocol.READY)
+            camera_node.center(camera, acq)
+
+        node = threading.Thread(target=camera_side)
+        with contextlib.redirect_stdout(io.StringIO()):
+            node.start()
+            start = time.monotonic()
+            centering.center(master, bus, 0x8)
+            times.append(time.monotonic() - start)
+            node.join()
+
+        time.sleep(0.05)
+        errors.append(abs(sim_scene.cup_x()) * 1000)
+
+        acq.stop()
+        s.close()
+        peer.close()
+
+    return {
+        "time_to_center": percentiles(times),
+        "stop_error_mm_mean": float(np.mean(errors)),
+        "stop_error_mm_max": float(np.max(errors)),
+    }
+
+# camera_node.volume_estimate: latency and error of each estimator over a few cup shapes, with every
+# cup after its first couple of estimates recognised as a known cup type
+def bench_volume(runs, fps):
+    cups = [
+        scene.Cup(rim_radius=0.035, base_radius=0.028, height=0.08),
+        scene.Cup(rim_radius=0.04, base_radius=0.03, height=0.09),
+        scene.Cup(rim_radius=0.045, base_radius=0.035, height=0.11),
+    ]
+
+    results = {}
+    for estimator in ('scan', 'cloud'):
+        camera_node.profiles = camera_node.cup_profiles.ProfileStore()
+        latencies = []
+        known = []
+        errors = []
+        for i, cup in enumerate(cups):
+            sim_scene = scene.Scene(cup, seed=i)
+            cam, acq = start_camera(sim_scene, fps)
+            for run in range(runs):
+                hits = metrics.REGISTRY.counters.get('camera_profile_hits_total', 0)
+                start = time.monotonic()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    volume = camera_node.volume_estimate(None, acq, estimator)
+                elapsed = time.monotonic() - start
+                if metrics.REGISTRY.counters.get('camera_profile_hits_total', 0) > hits:
+                    known.append(elapsed)
+                else:
+                    latencies.append(elapsed)
+                errors.append(100 * (volume - cup.volume()) / cup.volume())
+            acq.stop()
+
+        results[estimator] = {
+            "latency": percentiles(latencies),
+            "known_cup_latency": percentiles(known),
+            "error_pct_mean": float(np.mean(errors)),
+            "error_pct_abs_mean": float(np.mean(np.abs(errors))),
+        }
+    return results
+
+# camera_node with per-pixel confidence (amplitude) masking against masking by range only, on a scene
+# whose stray returns also land inside the range: frames a full volume scan takes, spread of the volume
+# estimates, and error and jitter of a still cup's rim offset
+def bench_masking(runs, fps, outliers=0.01, min_amplitude=30):
+    cup = scene.Cup(x=0.02)
+    clean = scene.render_clean(cup.key(), 0.40, 0.0)[scene.SHAPE[0] // 2]
+    rims = camera_node.rim.detect(clean, 15)
+    truth = (rims.pos_1 + rims.pos_2) / 2 - len(clean) / 2
+
+    saved = camera_node.MIN_AMPLITUDE
+    results = {}
+    for mode, amplitude in (('range_only', None), ('confidence', min_amplitude)):
+        camera_node.MIN_AMPLITUDE = amplitude
+        cam, acq = start_camera(scene.Scene(cup, outliers=outliers, seed=5), fps)
+        frames, volumes, offsets = [], [], []
+        for run in range(runs):
+            # a new cup type every time, so every estimate is a full scan
+            camera_node.profiles = camera_node.cup_profiles.ProfileStore()
+            with contextlib.redirect_stdout(io.StringIO()):
+                volumes.append(camera_node.volume_estimate(None, acq, 'scan'))
+            frames.append(camera_node.volume_buffer.count)
+
+        camera_node.center_buffer.clear()
+        for i in range(10 * runs):
+            laserScan = camera_node.get_scan(acq, camera_node.center_buffer)
+            rims = camera_node.rim.detect(laserScan, 15)
+            offsets.append((rims.pos_1 + rims.pos_2) / 2 - len(laserScan) / 2)
+        acq.stop()
+
+        results[mode] = {
+            "volume_frames_mean": float(np.mean(frames)),
+            "volume_spread_pct": float(100 * np.std(volumes) / np.mean(volumes)),
+            "offset_error_px_mean": float(np.mean(np.abs(np.asarray(offsets) - truth))),
+            "offset_jitter_px": float(np.std(offsets)),
+        }
+    camera_node.MIN_AMPLITUDE = saved
+    return results
+
+# centering.center: when the stop command goes out compared to when it should, for a cup streamed in
+# at a known speed with some capture -> master latency
+def bench_master_center(runs, latency=0.03):
+    errors = []
+    for run in range(runs):
+        bus = smbus.SMBus(1)
+        c, camera = socket.socketpair()
+        c = protocol.Connection(c)
+        camera = protocol.Connection(camera)
+        velocity = -120.0
+        ideal = []
+
+        def camera_side():
+            msg = camera.recv()
+            while msg.type == protocol.SYNC:
+                protocol.answer_sync(camera, msg)
+                msg = camera.recv()
+            camera.send(protocol.READY)
+
+            # the cup crosses the center at t_center, the stop must land actuation latency before it
+            start = time.monotonic()
+            t_center = start + 40 / -velocity
+            ideal.append(t_center - centering.ACTUATION_LATENCY)
+            while camera.recv(timeout=0) is None:
+                capture = time.monotonic()
+                offset = 40 + velocity * (capture - start)
+                time.sleep(latency)
+                camera.send(protocol.CENTER, protocol.pack_center(True, abs(offset) < 12, offset, velocity), capture)
+                time.sleep(max(1 / 30 - latency, 0))
+
+        node = threading.Thread(target=camera_side)
+        node.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            centering.center(c, bus, 0x8)
+        node.join()
+
+        stop = [t for t, address, value in bus.writes if value == 0]
+        errors.append(stop[-1] - ideal[0])
+        c.close()
+        camera.close()
+
+    return {"stop_timing_error": percentiles(errors)}
+
+# centering.pour: wall time against the sum of the ingredient pour times
+def bench_master_pour(vol):
+    bus = smbus.SMBus(1)
+    recipe = [0.2, 0.5, 0.3]
+    planned = sum(vol * r / 0.2 for r in recipe)
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        centering.pour(vol, bus, 0x8, recipe)
+    elapsed = time.monotonic() - start
+
+    return {"volume_oz": vol, "pour_s": elapsed, "sum_of_pours_s": planned, "longest_pour_s": max(vol * r / 0.2 for r in recipe)}
+
+# centering.pour with camera_node.monitor: valves actually flow faster than the master assumes,
+# the camera has to catch the fill target before the timers (sized from the estimate) would
+# fill is reported as a fraction of the real cup, against what the recipe asked for
+# scan estimator constants fitted to simulated cups, as calibrate.py fits them to recorded ones
+def calibrate_scan(cups=20, frames=3):
+    path = tempfile.mkdtemp()
+    dataset.write(path, cups, frames, seed=100)
+    rows = [m for m in map(calibrate.measure_recording, calibrate.recordings([path])) if m is not None]
+    height, radius, truth, confidence = (np.array(column) for column in zip(*rows))
+    return calibrate.fit(height, radius, truth, volume_model.DEFAULTS, confidence)
+
+def bench_pour_monitor(fps, estimator, flow=0.25, constants=None):
+    valves = scene.Valves((flow,) * 4)
+    bus = smbus.SMBus(1)
+    bus.listeners.append(valves.on_write)
+    cup = scene.Cup()
+    sim_scene = scene.Scene(cup, seed=7)
+    sim_scene.valves = valves
+    cam, acq = start_camera(sim_scene, fps)
+
+    s, peer = socket.socketpair()
+    camera = protocol.Connection(s)
+    master = protocol.Connection(peer)
+    recipe = [0.2, 0.4, 0.2]
+    saved = camera_node.VOLUME_CONSTANTS
+    if constants is not None:
+        camera_node.VOLUME_CONSTANTS = constants
+    camera_node.profiles = camera_node.cup_profiles.ProfileStore()
+    timer_stops = metrics.REGISTRY.counters.get('master_pour_timer_stops_total', 0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        vol = camera_node.volume_estimate(camera, acq, estimator)
+
+        def camera_side():
+            msg = camera.recv()
+            camera_node.monitor(camera, acq, protocol.unpack_targets(msg.payload))
+
+        node = threading.Thread(target=camera_side)
+        node.start()
+        start = time.monotonic()
+        centering.pour(vol, bus, 0x8, recipe, c=master)
+        elapsed = time.monotonic() - start
+        node.join()
+
+    acq.stop()
+    s.close()
+    peer.close()
+    camera_node.VOLUME_CONSTANTS = saved
+
+    # valves cut by their safety timer (sized from the volume estimate) instead of the camera
+    return {
+        "requested_fill_pct": 100 * sum(recipe),
+        "fill_pct": 100 * valves.poured() / cup.volume(),
+        "volume_error_pct": 100 * (vol - cup.volume()) / cup.volume(),
+        "timer_stops": metrics.REGISTRY.counters.get('master_pour_timer_stops_total', 0) - timer_stops,
+        "timer_only_fill_pct": 100 * vol * sum(recipe) * flow / 0.2 / cup.volume(),
+        "pour_s": elapsed,
+        "timer_only_pour_s": max(vol * r / 0.2 for r in recipe),
+    }
+
+# camera_node.center with the flight recorder on: frame rate against recording off, and reading back
+# (the ring is made big enough not to wrap, a cycle slice across its end would be a copy)
+def bench_recorder(frames, fps):
+    path = os.path.join(tempfile.mkdtemp(), 'recording')
+    recording = recorder.Recorder(path, capacity=4 * frames)
+    recording.cycle = 1
+    recording.phase = 'center'
+    camera_node.recording = recording
+
+    off = bench_center_throughput(frames, fps)
+    on = bench_center_throughput(frames, fps, recording)
+    camera_node.recording = None
+    recording.close()
+
+    reader = recorder.RecordingReader(path)
+    start = time.perf_counter()
+    cycle, index = reader.cycle(1)
+    read = time.perf_counter() - start
+    return {
+        "frames_per_s_off": off["frames_per_s"],
+        "frames_per_s_on": on["frames_per_s"],
+        "recorded": recording.recorded,
+        "ring_wrapped": recording.recorded > recording.capacity,
+        "record_dropped": recording.dropped,
+        "decisions": int(np.count_nonzero(index['decision'])),
+        "cycle_frames": len(cycle),
+        "cycle_slice_ms": read * 1000,
+        "cycle_slice_is_view": bool(np.shares_memory(cycle, reader.frames)),
+    }
+
+# console that writes no faster than a serial line (115200 baud, about 11.5 bytes / ms)
+class SlowConsole:
+    def __init__(self, bytes_per_s=11520):
+        self.bytes_per_s = bytes_per_s
+        self.written = 0
+
+    def write(self, text):
+        time.sleep(len(text) / self.bytes_per_s)
+        self.written += len(text)
+
+    def flush(self):
+        pass
+
+# cost to the caller of one centering telemetry line on a slow console: printed directly, through the
+# logger to the console, and through the logger as debug detail kept only in memory
+def bench_logging(n, capacity=64):
+    line = "gnd: {}  {:.1f} vs {} : {:.2} - {:.2}"
+    args = (0.4, 118.5, 120, 0.352, 0.349)
+
+    console = SlowConsole()
+    with contextlib.redirect_stdout(console):
+        printed = timed(lambda: print(line.format(*args)), n)
+
+    results = {"print": percentiles(printed)}
+    for name, level in (('info', log.INFO), ('debug', log.DEBUG)):
+        logger = log.Logger(capacity=capacity, stream=SlowConsole())
+        results[name] = percentiles(timed(lambda: logger.log(level, line, *args), n))
+        logger.flush()
+        results[name]["console_lines_dropped"] = logger.dropped
+        results[name]["history"] = len(logger.history)
+    return results
+
+# controller.Controller on its in-memory FakeBus failing every fail_every-th write: latency of a valve
+# opened twice behind a close (the second open repeats the one still queued and finishes with it), and
+# how many repeats came back with an outcome other than the command they repeated
+def bench_controller(n, delay=0.0002, fail_every=7):
+    c = controller.Controller(controller.FakeBus(delay, fail_every), retries=0, repeat_window=0)
+    times = []
+    mismatched = 0
+    for i in range(n):
+        valve = i % len(controller.OPEN)
+        start = time.perf_counter()
+        c.close_valve(valve)
+        first = c.open_valve(valve)
+        second = c.open_valve(valve)
+        first.done.wait(1.0)
+        second.done.wait(1.0)
+        times.append(time.perf_counter() - start)
+        mismatched += first.ok != second.ok
+    c.close()
+    results = percentiles(times)
+    results["repeats_mismatched"] = mismatched
+    results.update(c.stats())
+    del results["latency_ms"]
+    return results
+
+# listen for the camera node on a local port, as the master does
+def listen(port):
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', port))
+    listener.listen(1)
+    return listener
+
+# accept one connection from the camera node
+def accept(listener):
+    c, addr = listener.accept()
+    listener.close()
+    return protocol.Connection(c)
+
+# a master coming up delay s from now, accepting one connection into accepted
+def serve_master(port, accepted, delay=0.0):
+    time.sleep(delay)
+    accepted.append(accept(listen(port)))
+
+# a free local port for the simulated master
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+# camera_node.init: time until the camera node is connected and has its first frame, with the master
+# coming up master_delay s after the node and the camera taking startup s to start, against connecting
+# first and opening the camera after
+def bench_startup(runs, startup=0.5, master_delay=0.3):
+    camera_node.HOST = '127.0.0.1'
+    ac.configure(scene=scene.Scene(None), startup=startup)
+    results = {}
+    for mode in ('sequential', 'parallel'):
+        times = []
+        for run in range(runs):
+            camera_node.PORT = free_port()
+            accepted = []
+            master = threading.Thread(target=serve_master, args=(camera_node.PORT, accepted, master_delay))
+            master.start()
+
+            start = time.monotonic()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if mode == 'parallel':
+                    conn, cam = camera_node.init()
+                else:
+                    conn = camera_node.connect()
+                    cam = camera_node.open_camera()
+            times.append(time.monotonic() - start)
+
+            master.join()
+            conn.close()
+            accepted[0].close()
+            cam.stop()
+        results[mode] = percentiles(times)
+    ac.configure(startup=0.0)
+    return results
+
+# camera_node.serve: time from the master dropping the connection until clock sync works again, for a
+# glitch (master still listening) and a restart (master down for restart s), camera running throughout;
+# reconnects whose sync got no reply are counted as unsynced, not timed
+def bench_reconnect(runs, fps, restart=0.5):
+    camera_node.HOST = '127.0.0.1'
+    camera_node.PORT = free_port()
+    cam, acq = start_camera(scene.Scene(None), fps)
+
+    frames = acq.seq
+    listener = listen(camera_node.PORT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        conn = camera_node.connect()
+        c = accept(listener)
+
+        # the node waits for START, answering clock sync, and reconnects by itself
+        node = threading.Thread(target=camera_node.serve, args=(conn, acq))
+        node.start()
+        protocol.sync_clock(c, rounds=1)
+
+        results = {}
+        for case, downtime in (('glitch', None), ('master_restart', restart)):
+            times = []
+            unsynced = 0
+            for run in range(runs):
+                if downtime is None:
+                    listener = listen(camera_node.PORT)
+                start = time.monotonic()
+                c.close()
+                if downtime is not None:
+                    time.sleep(downtime)
+                    listener = listen(camera_node.PORT)
+                c = accept(listener)
+                try:
+                    protocol.sync_clock(c, rounds=1)
+                except TimeoutError:
+                    unsynced += 1
+                    continue
+                times.append(time.monotonic() - start)
+            results[case] = percentiles(times)
+            results[case]["unsynced"] = unsynced
+
+        # the last drop ends the node
+        camera_node.serving = False
+        c.close()
+        node.join()
+    camera_node.serving = True
+
+    # the camera kept capturing throughout
+    results["frames_captured"] = acq.seq - frames
+    results["reconnects"] = metrics.REGISTRY.counters.get('camera_reconnects_total', 0)
+    acq.stop()
+    return results
+
+# a scripted camera node for one station: a cup slides in under the nozzle every cycle, its volume is
+# reported right away, the pour is left to the valve timers and the cup is taken as soon as it is done
+def fake_camera(port, station, velocity=-400.0):
+    conn = protocol.Connection(protocol.connect('127.0.0.1', port))
+    conn.send(protocol.HELLO, protocol.pack_hello(station))
+    try:
+        while True:
+            msg = conn.recv()
+            if msg.type == protocol.SYNC:
+                protocol.answer_sync(conn, msg)
+            elif msg.type == protocol.START:
+                conn.send(protocol.READY)
+                start = time.monotonic()
+                while conn.recv_next(protocol.CENTERED, timeout=1 / 30) is None:
+                    offset = 40 + velocity * (time.monotonic() - start)
+                    conn.send(protocol.CENTER, protocol.pack_center(True, abs(offset) < 12, offset, velocity))
+                conn.send(protocol.VOLUME, protocol.pack_volume(0.1))
+            elif msg.type == protocol.POURED:
+                conn.send(protocol.REMOVED)
+    except (ConnectionError, OSError):
+        conn.close()
+
+# stations.Master: drinks per hour with 1, 2, 4 ... stations on one master, each with its own camera
+# node and controller address (all on one shared bus), for a rush of orders per station
+def bench_stations(counts=(1, 2, 4), per_station=2):
+    results = {}
+    for n in counts:
+        port = free_port()
+        orders = order_queue.OrderQueue(os.path.join(tempfile.mkdtemp(), 'orders.db'), consumer=True)
+        bus, bus_lock = smbus.SMBus(1), threading.Lock()
+        station_list = [stations.Station(i, controller.Controller(bus, 0x8 + i, bus_lock=bus_lock), 0x8 + i)
+                        for i in range(n)]
+        master = stations.Master(listen(port), station_list, orders, centering.cycle, centering.parse_recipe)
+        cameras = [threading.Thread(target=fake_camera, args=(port, i)) for i in range(n)]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            loop = threading.Thread(target=master.run)
+            loop.start()
+            for camera in cameras:
+                camera.start()
+            while sum(station.conn is not None for station in station_list) < n:
+                time.sleep(0.01)
+
+            start = time.monotonic()
+            for i in range(n * per_station):
+                orders.put("Milk:20\nCoffee:40\nNon-Dairy:20")
+            while master.completed < n * per_station:
+                time.sleep(0.01)
+            elapsed = time.monotonic() - start
+
+            master.close()
+            loop.join()
+            for station in station_list:
+                station.conn.close()
+                station.bus.close()
+            for camera in cameras:
+                camera.join()
+            master.listener.close()
+            orders.close()
+
+        results[str(n) + "_stations"] = {
+            "drinks": master.completed,
+            "elapsed_s": elapsed,
+            "drinks_per_hour": 3600 * master.completed / elapsed,
+            "per_station": [station.orders for station in station_list],
+        }
+    return results
+
+# the drink cycle before it was event driven: fixed sleeps before the search, before asking for the
+# volume and for the gantry to get home
+def fixed_sleep_cycle(c, bus, address, recipe):
+    centering.center(c, bus, address)
+    time.sleep(1)
+    vol = protocol.unpack_volume(c.recv_latest(protocol.VOLUME).payload)
+    centering.pour(vol, bus, address, recipe, c=c)
+    bus.write_byte(address, 1)
+    time.sleep(5)
+
+# centering.cycle against camera_node.serve, drinks back to back on one simulated station: a customer
+# takes each cup pickup s after the valves shut and sets the next one down pickup s later, at
+# alternating spots so it is found on the gantry's way home or only after; reports time per drink
+# against the old fixed-sleep cycle
+def bench_turnaround(drinks, fps, pickup=0.5):
+    positions = [0.05, 0.03, 0.07, 0.04]
+    recipe = [0.05, 0.05, 0.05]
+    learn_tray()
+    results = {}
+    for mode, cycle in (('fixed_sleeps', fixed_sleep_cycle), ('event_driven', centering.cycle)):
+        camera_node.profiles = camera_node.cup_profiles.ProfileStore()
+        gantry = scene.Gantry(speed=0.05)
+        valves = scene.Valves((1.0,) * 4)
+        bus = smbus.SMBus(1)
+        bus.status = gantry.status
+        sim_scene = scene.Scene(scene.Cup(x=positions[0]), seed=11)
+        sim_scene.gantry = gantry
+        sim_scene.valves = valves
+        placed = [1]
+
+        def place():
+            sim_scene.cup = scene.Cup(x=positions[placed[0] % len(positions)])
+            placed[0] += 1
+
+        def take():
+            sim_scene.cup = None
+            with valves.lock:
+                valves.opened.clear()
+                valves.total = 0.0
+            threading.Timer(pickup, place).start()
+
+        # the customer takes the cup once the valves shut, the next one follows as long after
+        def customer(address, value, now):
+            if value == controller.ALL_OFF:
+                threading.Timer(pickup, take).start()
+
+        bus.listeners += [gantry.on_write, valves.on_write, customer]
+        cam, acq = start_camera(sim_scene, fps)
+        s, peer = socket.socketpair()
+        master = protocol.Connection(peer)
+        node = threading.Thread(target=camera_node.serve, args=(protocol.Connection(s), acq))
+
+        ready = metrics.REGISTRY.histograms.get('master_ready_wait_seconds')
+        ready_before = (ready.n, ready.sum) if ready is not None else (0, 0.0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            node.start()
+            times = []
+            for drink in range(drinks):
+                start = time.monotonic()
+                cycle(master, bus, 0x8, recipe)
+                times.append(time.monotonic() - start)
+
+            # let the last trip home finish, then end the node
+            while gantry.status() & controller.MOVING:
+                time.sleep(0.01)
+            camera_node.serving = False
+            master.close()
+            node.join()
+            camera_node.serving = True
+        acq.stop()
+
+        ready = metrics.REGISTRY.histograms['master_ready_wait_seconds']
+        results[mode] = {
+            "drink": percentiles(times),
+            "ready_wait_ms_mean": 1000 * (ready.sum - ready_before[1]) / max(ready.n - ready_before[0], 1),
+        }
+    results["saved_per_drink_s"] = (results['fixed_sleeps']['drink']['mean_ms'] - results['event_driven']['drink']['mean_ms']) / 1000
+    return results
+
+def print_report(report, indent=0):
+    for key, value in report.items():
+        if isinstance(value, dict):
+            print(" " * indent + key + ":")
+            print_report(value, indent + 2)
+        elif isinstance(value, float):
+            print(" " * indent + key + ": " + "{:.3f}".format(value))
+        else:
+            print(" " * indent + key + ": " + str(value))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SmartSip simulated benchmarks")
+    parser.add_argument("--frames", type=int, default=200, help="frames for the centering throughput run")
+    parser.add_argument("--runs", type=int, default=5, help="repetitions for latency runs")
+    parser.add_argument("--fps", type=float, default=0, help="simulated camera frame rate (0 = unlimited)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    # node output is kept in the log history only, the report is what gets printed
+    log.configure(echo=log.OFF)
+
+    # the nodes run with a learned empty-tray model, as they do after their first empty frames
+    report = {
+        "ground": bench_ground(args.frames),
+        "rim_us": bench_rim(args.frames),
+        "center_throughput": bench_center_throughput(args.frames, args.fps),
+        "recorder": bench_recorder(args.frames, args.fps or 30),
+        "logging": bench_logging(args.frames),
+        "controller": bench_controller(args.frames),
+        "center_search": bench_center_search(args.runs, args.fps or 30),
+        "idle": bench_idle(args.fps or 30),
+        "volume_estimate": bench_volume(args.runs, args.fps),
+        "masking": bench_masking(args.runs, args.fps),
+        "master_center": bench_master_center(args.runs),
+        "master_pour": bench_master_pour(0.2),
+        "pour_monitor": {
+            "scan": bench_pour_monitor(args.fps or 30, 'scan'),
+            "scan_calibrated": bench_pour_monitor(args.fps or 30, 'scan', constants=calibrate_scan()),
+            "cloud": bench_pour_monitor(args.fps or 30, 'cloud'),
+        },
+        "startup": bench_startup(args.runs),
+        "reconnect": bench_reconnect(args.runs, args.fps or 30),
+        "stations": bench_stations(),
+        "turnaround": bench_turnaround(args.runs, args.fps or 30),
+    }
+
+    print_report(report)
+    print("stages:")
+    print(metrics.summary())
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
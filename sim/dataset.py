@@ -0,0 +1,43 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Writes simulated cup recordings in the format calibrate.py reads (one .npz per cup with depth
+#   frames, true volume and an empty-tray frame), for trying out the calibration without real pours.
+#
+#   usage: python3 sim/dataset.py out_dir [--cups N] [--frames N] [--seed N]
+#
+
+
+import argparse
+import os
+
+import numpy as np
+
+import scene
+
+
+def write(out_dir, cups, frames, seed):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    background = scene.Scene(None, noise=0.0, outliers=0.0).render()[0]
+
+    for i in range(cups):
+        rim_radius = rng.uniform(0.03, 0.05)
+        cup = scene.Cup(x=rng.uniform(-0.002, 0.002), rim_radius=rim_radius,
+                        base_radius=rim_radius * rng.uniform(0.65, 0.9), height=rng.uniform(0.07, 0.13))
+        sim_scene = scene.Scene(cup, seed=seed + i)
+        depth = np.stack([sim_scene.render()[0] for f in range(frames)])
+        np.savez_compressed(os.path.join(out_dir, "cup_" + str(i).zfill(4) + ".npz"),
+                            depth=depth, volume=cup.volume(), background=background)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="simulated recordings for calibrate.py")
+    parser.add_argument("out_dir")
+    parser.add_argument("--cups", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write(args.out_dir, args.cups, args.frames, args.seed)
@@ -0,0 +1,106 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Headless benchmark of the SmartSip GUI (CoffeeApp.py): widgets constructed and time taken at
+#   startup, by every window transition, and by rebuilding a window from scratch as the GUI used to
+#   on every transition. Needs kivy; runs without a display on kivy's mock GL backend.
+#
+#   usage: python3 sim/gui_benchmark.py [--runs N] [--json out.json]
+#
+
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_GL_BACKEND', 'mock')
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(1, os.path.join(HERE, '..', 'RPi4', 'software', 'testing', 'TS', 'smartSip'))
+
+from kivy.base import EventLoop
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.uix.widget import Widget
+
+import CoffeeApp
+
+from benchmark import percentiles, print_report
+
+# every widget constructed anywhere, counted from Widget.__init__
+constructed = [0]
+widget_init = Widget.__init__
+
+def counting_init(self, **kwargs):
+    constructed[0] += 1
+    widget_init(self, **kwargs)
+
+Widget.__init__ = counting_init
+
+# run fn and one frame of layout and drawing, returns (seconds, widgets constructed)
+def measure(fn):
+    before = constructed[0]
+    start = time.perf_counter()
+    fn()
+    EventLoop.idle()
+    return time.perf_counter() - start, constructed[0] - before
+
+# CoffeeApp.SmartSip: startup, then a customer's walk through the windows (start, a rejected
+# selection, a custom drink, back home) runs times over
+def bench_gui(runs):
+    app = CoffeeApp.SmartSip()
+    app.orders_path = os.path.join(tempfile.mkdtemp(), 'orders.db')
+
+    startup, startup_widgets = measure(lambda: Window.add_widget(app.build()))
+
+    walk = [2, 6, 2, 4, 1]
+    times = []
+    widgets = 0
+    for run in range(runs):
+        for window in walk:
+            app.window = window
+            app.choices = ['Milk', ':50\n']
+            t, n = measure(app.update_window)
+            times.append(t)
+            widgets += n
+    Clock.unschedule(app.return_to_home)
+    Clock.unschedule(app.return_to_select)
+
+    # what every transition used to cost: the window's widgets built from scratch
+    rebuild_times = []
+    rebuild_widgets = 0
+    for run in range(runs):
+        for window in walk:
+            t, n = measure(lambda: app.build_window(window))
+            rebuild_times.append(t)
+            rebuild_widgets += n
+
+    app.orders.close()
+    return {
+        "startup_s": startup,
+        "startup_widgets": startup_widgets,
+        "transition": percentiles(times),
+        "transition_widgets": widgets,
+        "rebuild": percentiles(rebuild_times),
+        "rebuild_widgets_per_transition": rebuild_widgets / len(rebuild_times),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SmartSip GUI benchmark")
+    parser.add_argument("--runs", type=int, default=20, help="walks through the windows")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = {"gui": bench_gui(args.runs)}
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
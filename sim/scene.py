@@ -0,0 +1,198 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Synthetic depth frames for the simulated TOF camera. A cup (a frustum with a thin wall and a
+#   floor) stands on a flat tray below the camera. Every pixel's ray is stepped down through a stack
+#   of horizontal slices and stops at the first slice where it is inside something solid, which is
+#   enough to get rims, visible inner walls and occluded tray right.
+#
+
+
+import math
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'RPi3', 'software', 'testing'))
+import geometry
+
+# camera resolution (rows, cols)
+SHAPE = (180, 240)
+
+# rows rendered together (slices x rows x cols work arrays)
+ROW_BLOCK = 4
+
+# m^3 to oz
+M3_TO_OZ = 33814.023
+
+
+class Cup:
+    def __init__(self, x=0.0, y=0.0, rim_radius=0.04, base_radius=0.03, height=0.09, wall=0.003, floor=0.005):
+        self.x = x
+        self.y = y
+        self.rim_radius = rim_radius
+        self.base_radius = base_radius
+        self.height = height
+        self.wall = wall
+        self.floor = floor
+
+    # true inner volume in oz (what a perfect estimator would report)
+    def volume(self):
+        R = self.rim_radius - self.wall
+        r = self.base_radius - self.wall
+        h = self.height - self.floor
+        return math.pi * h / 3 * (R**2 + R * r + r**2) * M3_TO_OZ
+
+    def key(self):
+        return (round(self.x, 3), round(self.y, 3), self.rim_radius, self.base_radius, self.height, self.wall, self.floor)
+
+
+class Scene:
+    def __init__(self, cup=None, ground=0.40, noise=0.002, outliers=0.001, fill=0.0, seed=0):
+        self.cup = cup
+        self.ground = ground
+        self.noise = noise          # std. dev. of range noise (m)
+        self.outliers = outliers    # fraction of pixels returning garbage range
+        self.fill = fill            # liquid level as a fraction of the cup's inner height
+        self.gantry = None          # camera moves with the gantry, shifting the cup in view
+        self.valves = None          # liquid poured by the solenoids raises the fill level
+        self.rng = np.random.default_rng(seed)
+
+    # cup position relative to the camera at time now (time.monotonic, default right now)
+    def cup_x(self, now=None):
+        offset = 0.0 if self.gantry is None else self.gantry.position(now)
+        return self.cup.x - offset
+
+    # render one noisy depth frame (range in meters) and its amplitude image as seen at time now
+    # (time.monotonic, default right now); with row given only that row is rendered, as a (1, cols) frame
+    def render(self, now=None, row=None):
+        cup = None
+        fill = self.fill
+        if self.cup is not None:
+            cup = (round(self.cup_x(now), 3),) + self.cup.key()[1:]
+            if self.valves is not None:
+                fill = min(self.valves.poured(now) / self.cup.volume(), 1.0)
+        depth = render_clean(cup, self.ground, round(fill, 3), row=row).astype(np.float32)
+
+        if self.noise:
+            depth += self.rng.normal(0, self.noise, depth.shape).astype(np.float32)
+
+        # amplitude falls off with range, bad pixels (stray and multipath returns, which land anywhere,
+        # inside the working range too) come back dark
+        amplitude = (60.0 / np.maximum(depth, 0.05)**2).astype(np.float32)
+        if self.outliers:
+            bad = self.rng.random(depth.shape) < self.outliers
+            depth[bad] = self.rng.uniform(0.05, 2.0, np.count_nonzero(bad))
+            amplitude[bad] = self.rng.uniform(0, 20, np.count_nonzero(bad))
+
+        return depth, amplitude
+
+
+# noiseless range image of a scene (or just one row of it), cached since the same cup position is
+# rendered many times
+@lru_cache(maxsize=256)
+def render_clean(cup, ground, fill, slices=120, row=None):
+    rays = geometry.pixel_rays(SHAPE)
+    if row is not None:
+        rays = rays[row:row + 1]
+    shape = rays.shape[:2]
+    tray = ground / rays[..., 2]
+
+    if cup is None:
+        return tray
+
+    x, y, R, rb, h, wall, floor = cup
+    top = ground - h
+    surface = ground - floor - fill * (h - floor)
+
+    # all slices at once, a block of rows at a time to bound memory
+    z = np.linspace(top, ground, slices)[:, None, None]
+    r = R + (rb - R) * (z - top) / h
+    depth = tray.copy()
+    for start in range(0, shape[0], ROW_BLOCK):
+        block = rays[start:start + ROW_BLOCK]
+        t = z / block[..., 2]
+        rho = np.hypot(block[..., 0] * t - x, block[..., 1] * t - y)
+        solid = (rho <= r) & ((rho >= r - wall) | (z >= surface))
+
+        # range of the first slice each ray is inside something solid at
+        hit = solid.any(axis=0)
+        first = np.take_along_axis(t, solid.argmax(axis=0)[None], axis=0)[0]
+        depth[start:start + ROW_BLOCK][hit] = first[hit]
+
+    return depth
+
+
+# gantry carrying the camera and nozzle, driven by the controller command set (0 stop, 1 left, 2 right)
+# use Gantry.on_write as a listener on the simulated smbus and Gantry.status as its status
+class Gantry:
+    def __init__(self, speed=0.02, travel=0.3):
+        self.speed = speed          # m/s
+        self.travel = travel        # distance between the limit switches (m)
+        self.x = 0.0
+        self.velocity = 0.0
+        self.since = time.monotonic()
+        self.lock = threading.Lock()
+
+    def position(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            x = self.x + self.velocity * (now - self.since)
+        return min(max(x, 0.0), self.travel)
+
+    # controller status byte: bit 0 at the left limit, bit 1 moving, bit 2 at the right limit
+    # like the Arduino, the gantry stops at the left limit and reports itself no longer moving
+    def status(self, address=None, now=None):
+        now = time.monotonic() if now is None else now
+        x = self.position(now)
+        with self.lock:
+            velocity = self.velocity
+        left = x <= 0.0
+        right = x >= self.travel
+        moving = velocity != 0 and not (left and velocity < 0) and not (right and velocity > 0)
+        return (1 if left else 0) | (2 if moving else 0) | (4 if right else 0)
+
+    def on_write(self, address, value, now):
+        if value not in (0, 1, 2):
+            return
+        x = self.position(now)
+        with self.lock:
+            self.x = x
+            self.since = now
+            self.velocity = {0: 0.0, 1: -self.speed, 2: self.speed}[value]
+
+
+# solenoid valves feeding the cup, driven by the controller command set
+# (3 - 6 open, 8 - 11 close one valve, 7 closes all, 0 - 2 move the gantry which closes all)
+# use Valves.on_write as a listener on the simulated smbus
+class Valves:
+    def __init__(self, flowrates=(0.2, 0.2, 0.2, 0.2)):
+        self.flowrates = flowrates  # oz / s
+        self.opened = {}            # valve -> time it opened
+        self.total = 0.0            # oz poured by valves that have since closed
+        self.lock = threading.Lock()
+
+    def poured(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return self.total + sum(self.flowrates[v] * (now - t) for v, t in self.opened.items())
+
+    def _close(self, valve, now):
+        t = self.opened.pop(valve, None)
+        if t is not None:
+            self.total += self.flowrates[valve] * (now - t)
+
+    def on_write(self, address, value, now):
+        with self.lock:
+            if 3 <= value <= 6:
+                self.opened.setdefault(value - 3, now)
+            elif 8 <= value <= 11:
+                self._close(value - 8, now)
+            elif value in (0, 1, 2, 7):
+                for valve in list(self.opened):
+                    self._close(valve, now)
@@ -0,0 +1,41 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Drop-in stand-in for the smbus module. Every write is recorded with a timestamp and forwarded to
+#   an optional listener (e.g. a gantry model), so centering.py and i2c_controller_direct.py run
+#   without the Arduino attached.
+#
+
+
+import threading
+import time
+
+
+class SMBus:
+    # per-write delay (s), roughly a single byte at 100 kHz plus driver overhead
+    write_delay = 0.0002
+
+    def __init__(self, bus=None):
+        self.bus = bus
+        self.writes = []    # (time.monotonic, address, value)
+        self.listeners = []
+        self.status = None  # status(address) answers read_byte (e.g. Gantry.status), 0 without
+        self.lock = threading.Lock()
+
+    def write_byte(self, address, value):
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        now = time.monotonic()
+        with self.lock:
+            self.writes.append((now, address, value))
+        for listener in self.listeners:
+            listener(address, value, now)
+
+    def read_byte(self, address):
+        if self.status is not None:
+            return self.status(address)
+        return 0
+
+    def close(self):
+        pass
@@ -0,0 +1,646 @@
+# Author: Elliot Weiner
+# Date: 10 / 18 / 2026
+# Organization: University of Rochester Electrical and Computer Engineering Department
+# Description:
+#   Discrete-event digital twin of a SmartSip machine for capacity planning. The real master of
+#   stations.py (its selector loop, order handling and station workers), the drink cycle of centering.py
+#   and the serve loop of camera_node.py run unmodified on a virtual clock, against simulated hardware:
+#   a TOF camera with its frame rate and noise (scene.py), a gantry with limit switches, solenoid valves
+#   fed by tanks that drain as they pour, TCP and I2C links with latency, and customers who order at
+#   random, set their cup down when called and pick it up once poured. Every process (the master's loop,
+#   its workers and a camera node per station) is a thread, but only one runs at a time and only when the
+#   event queue says so, so a simulated hour takes about a minute. Reports drinks per hour, queue wait and
+#   order latency percentiles for every scheduling policy.
+#
+#   usage: python3 sim/twin.py [--hours H] [--rate ORDERS_PER_HOUR] [--policy NAME ...] [--seed N] [--json out.json]
+#
+
+
+import argparse
+import collections
+import contextlib
+import functools
+import heapq
+import importlib.util
+import json
+import math
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+
+# simulated hardware first, then both nodes
+sys.path.insert(0, HERE)
+sys.path.insert(1, os.path.join(ROOT, 'RPi3', 'software', 'testing'))
+sys.path.insert(2, os.path.join(ROOT, 'RPi4', 'software', 'testing'))
+sys.path.insert(3, os.path.join(ROOT, 'common'))
+
+import scene
+
+import background
+import camera_node
+import centering
+import controller
+import fusion
+import log
+import metrics
+import pour_scheduler
+import protocol
+import stations
+
+import benchmark
+from benchmark import percentiles, print_report
+
+# simulated hardware and customers
+HARDWARE = {
+    "fps": 30,              # TOF frame rate
+    "frame_cost": 0.005,    # camera_node processing per frame on the RPi3 (s)
+    "noise": 0.002,         # range noise std. dev. (m)
+    "outliers": 0.001,      # fraction of pixels returning garbage range
+    "gantry_speed": 0.05,   # m/s
+    "travel": 0.3,          # distance between the limit switches (m)
+    "tcp_latency": 0.0005,  # one way (s)
+    "i2c_latency": 0.0005,  # per byte written or read, including the Arduino loop (s)
+    "flow": 0.2,            # oz/s through a valve fed by a full tank
+    "tank": 64.0,           # oz per ingredient tank
+    "refill_below": 8.0,    # oz left in a tank when the station stops to refill it
+    "refill_time": 60.0,    # s a refill takes
+    "place_time": 3.0,      # mean s for a called customer to set the cup down
+    "pickup_time": 2.0,     # mean s for the customer to take the poured cup
+}
+
+# orders as the GUI writes them: one ingredient and a percentage of the cup
+RECIPES = [name + ':' + str(percent) + '\n' for name in ("Milk", "Coffee", "Non-Dairy") for percent in (25, 50, 75, 100)]
+
+# scheduling options: drink cycle, order dispatch (fifo, or shortest pour first) and stations on the master
+POLICIES = {
+    "fixed_sleeps": {"cycle": benchmark.fixed_sleep_cycle},
+    "event_driven": {},
+    "shortest_first": {"dispatch": "shortest"},
+    "two_stations": {"stations": 2},
+}
+DEFAULT_POLICY = {"cycle": centering.cycle, "dispatch": "fifo", "stations": 1}
+
+# modules whose time readings and sleeps go to the virtual clock while a policy runs
+TIMED = (protocol, centering, pour_scheduler, metrics, benchmark, stations, log)
+# modules whose threads, socket pairs and selectors are the simulation's as well (the master's loop)
+THREADED = (stations,)
+
+
+# virtual clock and event queue; processes are threads that take turns, one at a time
+class Simulation:
+    def __init__(self):
+        self.now = 0.0
+        self.events = []        # (time, seq, fn)
+        self.seq = 0
+        self.turn = threading.Condition()
+        self.running = None     # process whose turn it is, None while the event loop has it
+        self.error = None
+
+        # stands in for the time module, every reading is the virtual clock
+        self.time = types.SimpleNamespace(time=self.clock, monotonic=self.clock, perf_counter=self.clock, sleep=self.sleep)
+
+        # and for threading, socket and selectors: threads are processes, a socket pair is a Pipe and
+        # a selector waits on io, fired whenever a link or pipe gets something to read
+        self.io = Signal(self)
+        self.threading = types.SimpleNamespace(Thread=functools.partial(Thread, self))
+        self.socket = types.SimpleNamespace(socketpair=lambda: 2 * (Pipe(self),), SHUT_RDWR=socket.SHUT_RDWR)
+        self.selectors = types.SimpleNamespace(DefaultSelector=functools.partial(Selector, self), EVENT_READ=selectors.EVENT_READ)
+
+    def clock(self):
+        return self.now
+
+    # call fn at virtual time t, or delay seconds from now
+    def at(self, t, fn):
+        self.seq += 1
+        heapq.heappush(self.events, (t, self.seq, fn))
+
+    def call(self, delay, fn):
+        self.at(self.now + delay, fn)
+
+    # run fn(*args) as a process, starting now
+    def spawn(self, fn, *args):
+        process = Process(self, fn, args)
+        process.thread.start()
+        self.call(0.0, lambda: process.wake(process.token))
+        return process
+
+    # run events until virtual time until
+    def run(self, until):
+        while self.events and self.events[0][0] <= until:
+            t, seq, fn = heapq.heappop(self.events)
+            self.now = t
+            fn()
+            if self.error is not None:
+                raise self.error
+        self.now = until
+
+    # from inside a process: give up the turn until signal fires (returns True) or timeout passes (False)
+    def suspend(self, timeout=None, signal=None):
+        process = self.running
+        token = process.token
+        if timeout is not None:
+            self.call(timeout, lambda: process.wake(token, False))
+        if signal is not None:
+            signal.waiters.append((process, token))
+        process.block()
+        return process.result
+
+    def sleep(self, seconds):
+        self.suspend(timeout=max(seconds, 0.0))
+
+
+class Process:
+    def __init__(self, sim, fn, args):
+        self.sim = sim
+        self.token = 0          # bumped on every wake, so a second wake for the same wait is ignored
+        self.result = None
+        self.done = False
+        self.thread = threading.Thread(target=self._main, args=(fn, args), daemon=True)
+
+    def _main(self, fn, args):
+        with self.sim.turn:
+            self.sim.turn.wait_for(lambda: self.sim.running is self)
+        try:
+            fn(*args)
+        except BaseException as e:
+            self.sim.error = e
+        with self.sim.turn:
+            self.done = True
+            self.sim.running = None
+            self.sim.turn.notify_all()
+
+    # event loop side: hand the turn over and wait until the process gives it back
+    def wake(self, token, result=None):
+        if token != self.token or self.done:
+            return
+        self.token += 1
+        self.result = result
+        with self.sim.turn:
+            self.sim.running = self
+            self.sim.turn.notify_all()
+            self.sim.turn.wait_for(lambda: self.sim.running is None)
+
+    # process side: give the turn back and wait for the next wake
+    def block(self):
+        with self.sim.turn:
+            self.sim.running = None
+            self.sim.turn.notify_all()
+            self.sim.turn.wait_for(lambda: self.sim.running is self)
+
+
+# stands in for threading.Thread, started as a process
+class Thread:
+    def __init__(self, sim, target, args=(), daemon=None):
+        self.sim = sim
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.sim.spawn(self.target, *self.args)
+
+
+# wakes every process suspended on it
+class Signal:
+    def __init__(self, sim):
+        self.sim = sim
+        self.waiters = []
+
+    def fire(self):
+        waiters, self.waiters = self.waiters, []
+        for process, token in waiters:
+            self.sim.call(0.0, lambda process=process, token=token: process.wake(token, True))
+
+
+# one end of a simulated TCP connection: protocol.Connection's own receive logic over a link that
+# delivers every message latency seconds after it is sent
+class Link(protocol.Connection):
+    def __init__(self, sim, latency):
+        self.sock = None
+        self.seq = 0
+        self.buffer = bytearray()
+        self.pending = collections.deque()
+        self.sim = sim
+        self.latency = latency
+        self.peer = None
+        self.inbox = []
+        self.arrived = Signal(sim)
+
+    def close(self):
+        pass
+
+    # something arrived that the socket would still hold (what a selector waits for)
+    def ready(self):
+        return bool(self.inbox)
+
+    def send(self, kind, payload=b'', stamp=None):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        msg = protocol.Message(kind, self.seq, protocol.wall_clock(stamp), payload)
+        self.sim.call(self.latency, lambda: self.peer._deliver(msg))
+        return self.seq
+
+    def _deliver(self, msg):
+        self.inbox.append(msg)
+        self.arrived.fire()
+        self.sim.io.fire()
+
+    def _fill(self, timeout):
+        if not self.inbox and (timeout == 0 or not self.sim.suspend(timeout, self.arrived)):
+            return False
+        self.pending.extend(self.inbox)
+        self.inbox = []
+        return True
+
+# a connected pair of links (master end, camera end)
+def link_pair(sim, latency):
+    master, camera = Link(sim, latency), Link(sim, latency)
+    master.peer, camera.peer = camera, master
+    return master, camera
+
+
+# stands in for a local socket pair (both ends are the same object): the master's wake-up from its
+# workers and the order store's doorbell
+class Pipe:
+    def __init__(self, sim):
+        self.sim = sim
+        self.data = b''
+
+    def send(self, data):
+        self.data += data
+        self.sim.io.fire()
+        return len(data)
+
+    def recv(self, size):
+        data, self.data = self.data[:size], self.data[size:]
+        return data
+
+    def ready(self):
+        return bool(self.data)
+
+    def close(self):
+        pass
+
+
+# stands in for selectors.DefaultSelector over links and pipes: select() gives up the turn until one
+# of the registered objects has something to read
+class Selector:
+    def __init__(self, sim):
+        self.sim = sim
+        self.keys = {}
+
+    def register(self, fileobj, events, data=None):
+        key = selectors.SelectorKey(fileobj, 0, events, data)
+        self.keys[fileobj] = key
+        return key
+
+    def unregister(self, fileobj):
+        return self.keys.pop(fileobj)
+
+    def select(self, timeout=None):
+        while True:
+            ready = [(key, selectors.EVENT_READ) for key in list(self.keys.values()) if key.fileobj.ready()]
+            if ready:
+                return ready
+            self.sim.suspend(signal=self.sim.io)
+
+    def close(self):
+        self.keys.clear()
+
+
+# stands in for acquisition.Acquisition: frames are rendered from the station's scene at their capture
+# times on the virtual clock, latest() waits for the next one like the real thread, after charging the
+# processing of the last one; a cup in view is only rendered along the center row (all the scan logic
+# looks at), the bare tray in full
+class Camera:
+    def __init__(self, sim, sim_scene, fps, cost):
+        self.sim = sim
+        self.scene = sim_scene
+        self.period = 1.0 / fps
+        self.cost = cost
+        self.last = -1          # index of the last frame handed out
+        self.held_stamp = 0.0
+        self.frame = None
+        self.amplitude = None
+        self.dropped = 0
+        self.recorder = None
+
+    def latest(self, timeout=1.0):
+        if self.last >= 0:
+            self.sim.sleep(self.cost)
+        index = math.floor(self.sim.now / self.period + 1e-9)
+        if index <= self.last:
+            index = self.last + 1
+            self.sim.sleep(index * self.period - self.sim.now)
+        if self.last >= 0:
+            self.dropped += index - self.last - 1
+        self.last = index
+        self.held_stamp = index * self.period
+
+        row = None if self.scene.cup is None else scene.SHAPE[0] // 2
+        self.frame, self.amplitude = self.scene.render(self.held_stamp, row)
+        return self.frame
+
+    def current(self):
+        return self.frame
+
+    def current_amplitude(self):
+        return self.amplitude
+
+
+# stands in for the station's controller.Controller: every write and status read costs latency on the
+# virtual clock, and writes go on to the gantry, the valves and the customer
+class Bus:
+    def __init__(self, sim, latency, status):
+        self.sim = sim
+        self.latency = latency
+        self.status = status
+        self.listeners = []
+
+    def write_byte(self, address, value):
+        self.sim.sleep(self.latency)
+        for listener in self.listeners:
+            listener(address, value, self.sim.now)
+
+    def read_byte(self, address):
+        self.sim.sleep(self.latency)
+        return self.status(address, self.sim.now)
+
+
+# solenoid valves fed by gravity from tanks that drain as they pour: a valve runs at flow * sqrt(level / tank)
+# (the head of liquid above it), set when it opens
+class Tanks(scene.Valves):
+    def __init__(self, flow, tank, valves=4):
+        super().__init__([flow] * valves)
+        self.flow = flow
+        self.tank = tank
+        self.level = [tank] * valves
+
+    def _close(self, valve, now):
+        t = self.opened.get(valve)
+        if t is not None:
+            self.level[valve] = max(self.level[valve] - self.flowrates[valve] * (now - t), 0.0)
+        super()._close(valve, now)
+
+    def on_write(self, address, value, now):
+        if 3 <= value <= 6:
+            with self.lock:
+                valve = value - 3
+                if valve not in self.opened:
+                    self.flowrates[valve] = self.flow * math.sqrt(self.level[valve] / self.tank)
+        super().on_write(address, value, now)
+
+    def refill(self):
+        self.level = [self.tank] * len(self.level)
+
+
+class Order:
+    def __init__(self, number, text, arrived):
+        self.number = number
+        self.text = text
+        self.recipe = centering.parse_recipe(text)
+        self.arrived = arrived
+        self.started = None         # first handed to a station
+        self.done = None
+        self.center_error = None    # cup offset from the nozzle when the valves opened (mm)
+        self.fill_error = None      # poured minus ordered (oz)
+
+
+# stands in for order_queue.OrderQueue on the master: waiting orders, handed out first come first
+# served or shortest pour first, and the doorbell the GUI rings after every new one
+class Orders:
+    def __init__(self, sim, dispatch):
+        self.sim = sim
+        self.dispatch = dispatch
+        self.orders = {}            # id -> Order
+        self.waiting = []
+        self.finished = []
+        self.failed = []
+        self.listener = Pipe(sim)
+
+    def put(self, order):
+        self.orders[order.number] = order
+        self.waiting.append(order)
+        self.listener.send(b'1')
+
+    def try_get(self):
+        if not self.waiting:
+            return None
+        if self.dispatch == 'shortest':
+            order = min(self.waiting, key=lambda order: sum(order.recipe))
+        else:
+            order = self.waiting[0]
+        self.waiting.remove(order)
+        if order.started is None:
+            order.started = self.sim.now
+        return order.number, order.text
+
+    def done(self, order_id):
+        order = self.orders[order_id]
+        order.done = self.sim.now
+        self.finished.append(order)
+
+    def requeue(self, order_id):
+        self.waiting.append(self.orders[order_id])
+        self.waiting.sort(key=lambda order: order.number)
+
+    def fail(self, order_id):
+        self.failed.append(self.orders[order_id])
+
+    def pending(self):
+        return len(self.waiting)
+
+
+# one dispenser: gantry, tanks, camera node and the customer at its tray
+class Station:
+    def __init__(self, sim, number, hw, rng, orders):
+        self.sim = sim
+        self.number = number
+        self.address = 0x8 + number
+        self.rng = rng
+        self.orders = orders
+        self.place_time = hw["place_time"]
+        self.pickup_time = hw["pickup_time"]
+        self.refill_below = hw["refill_below"]
+        self.refill_time = hw["refill_time"]
+
+        self.gantry = scene.Gantry(speed=hw["gantry_speed"], travel=hw["travel"])
+        self.gantry.since = 0.0
+        self.tanks = Tanks(hw["flow"], hw["tank"])
+        self.scene = scene.Scene(None, noise=hw["noise"], outliers=hw["outliers"], seed=int(rng.integers(1 << 30)))
+        self.scene.gantry = self.gantry
+        self.scene.valves = self.tanks
+
+        self.bus = Bus(sim, hw["i2c_latency"], self.gantry.status)
+        self.bus.listeners += [self.gantry.on_write, self.tanks.on_write, self.on_write]
+        self.camera = Camera(sim, self.scene, hw["fps"], hw["frame_cost"])
+        self.master, self.link = link_pair(sim, hw["tcp_latency"])
+
+        # the master's side of this station
+        self.desk = stations.Station(number, self.bus, self.address)
+
+        self.order = None
+        self.cleared = Signal(sim)  # the last customer took their cup, or the tanks were topped up
+        self.refilling = False
+        self.refills = 0
+
+        # a camera node of its own, which has already learned the empty tray
+        self.node = load_camera_node(number)
+        self.node.tray = background.Background(path=None)
+        for i in range(self.node.tray.min_frames):
+            depth, amplitude = self.scene.render(0.0)
+            self.node.tray.observe(depth, fusion.confidence_mask(depth, amplitude, self.node.MIN_AMPLITUDE))
+        self.node.METRICS_PATH = os.path.join(tempfile.gettempdir(), 'smartsip_twin_camera.prom')
+
+    # the camera node's side of camera_node.connect(): name the station, then serve the master
+    def run_node(self):
+        self.link.send(protocol.HELLO, protocol.pack_hello(self.number))
+        self.node.serve(self.link, self.camera)
+
+    # run by the master's worker in place of cycle: the order's customer is called over and sets their
+    # cup down once the tray is clear and the tanks are topped up, then the drink is made
+    def make(self, cycle, conn, bus, address, recipe):
+        while self.scene.cup is not None or self.refilling:
+            self.sim.suspend(signal=self.cleared)
+        self.sim.sleep(self.rng.exponential(self.place_time))
+        self.order = self.orders.orders[self.desk.order]
+        self.scene.cup = scene.Cup(x=self.rng.uniform(0.03, 0.2))
+        cycle(conn, bus, address, recipe)
+
+    # what the drink's customer sees: where the cup stood when the pour began, how much went in,
+    # and the valves shutting, after which they come for the cup
+    def on_write(self, address, value, now):
+        order, cup = self.order, self.scene.cup
+        if order is None or cup is None:
+            return
+        if value in controller.OPEN and order.center_error is None:
+            order.center_error = (cup.x - self.gantry.position(now)) * 1000
+        elif value == controller.ALL_OFF:
+            order.fill_error = self.tanks.poured(now) - sum(order.recipe) * cup.volume()
+            self.sim.call(self.rng.exponential(self.pickup_time), lambda: self.take(cup))
+
+    def take(self, cup):
+        if self.scene.cup is not cup:
+            return
+        self.scene.cup = None
+        self.order = None
+        with self.tanks.lock:
+            self.tanks.opened.clear()
+            self.tanks.total = 0.0
+
+        # an operator tops the tanks up once one runs low
+        if min(self.tanks.level) < self.refill_below:
+            self.refilling = True
+            self.sim.call(self.refill_time, self.refilled)
+        self.cleared.fire()
+
+    def refilled(self):
+        self.tanks.refill()
+        self.refills += 1
+        self.refilling = False
+        self.cleared.fire()
+
+
+# a fresh copy of camera_node for every station, as if each ran on its own RPi3 (the module keeps its
+# cup, frame buffers and empty-tray model in globals)
+def load_camera_node(number):
+    spec = importlib.util.spec_from_file_location('camera_node_' + str(number), camera_node.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# run one policy for hours of simulated time with orders arriving at rate per hour (Poisson)
+def run_policy(policy, hours, rate, hw, seed):
+    settings = dict(DEFAULT_POLICY, **policy)
+    sim = Simulation()
+
+    # every policy sees the same orders, the stations and their customers draw from a stream of their own
+    arrivals = np.random.default_rng(seed)
+    rng = np.random.default_rng(seed + 1)
+    orders = Orders(sim, settings["dispatch"])
+
+    patches = [(module, 'time', sim.time) for module in TIMED]
+    patches += [(module, name, getattr(sim, name)) for module in THREADED for name in ('threading', 'socket', 'selectors')]
+    saved = [(module, name, getattr(module, name)) for module, name, value in patches]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    metrics.reset()
+    log.configure(start=sim.now, last={}, suppressed={})
+    wall = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            dispensers = [Station(sim, number, hw, rng, orders) for number in range(settings["stations"])]
+            by_address = {station.address: station for station in dispensers}
+            def cycle(conn, bus, address, recipe):
+                by_address[address].make(settings["cycle"], conn, bus, address, recipe)
+            master = stations.Master(Pipe(sim), [station.desk for station in dispensers], orders, cycle, centering.parse_recipe)
+
+            # what master._accept does for a camera node that connects (the links are connected from the start)
+            for station in dispensers:
+                master.selector.register(station.master, selectors.EVENT_READ, lambda conn, addr=('twin', station.number): master._hello(conn, addr))
+                sim.spawn(station.run_node)
+            sim.spawn(master.run)
+
+            count = [0]
+            def arrive():
+                count[0] += 1
+                orders.put(Order(count[0], RECIPES[arrivals.integers(len(RECIPES))], sim.now))
+                sim.call(arrivals.exponential(3600 / rate), arrive)
+            sim.call(arrivals.exponential(3600 / rate), arrive)
+
+            sim.run(hours * 3600)
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+    wall = time.perf_counter() - wall
+
+    stages = {name[len('master_'):-len('_seconds')] + "_s_mean": h.sum / h.n
+              for name, h in sorted(metrics.REGISTRY.histograms.items())
+              if name.startswith('master_') and name.endswith('_seconds') and h.n}
+    done = orders.finished
+    return {
+        "drinks": len(done),
+        "failed": len(orders.failed),
+        "drinks_per_hour": len(done) / hours,
+        "orders": count[0],
+        "waiting_at_end": orders.pending(),
+        "queue_wait": percentiles([order.started - order.arrived for order in done]),
+        "latency": percentiles([order.done - order.arrived for order in done]),
+        "service": percentiles([order.done - order.started for order in done]),
+        "utilization": sum(order.done - order.started for order in done) / (hours * 3600 * len(dispensers)),
+        "center_error_mm_mean": float(np.mean([abs(order.center_error) for order in done if order.center_error is not None] or [0.0])),
+        "fill_error_oz_mean": float(np.mean([order.fill_error for order in done if order.fill_error is not None] or [0.0])),
+        "refills": sum(station.refills for station in dispensers),
+        "stages": stages,
+        "speedup": hours * 3600 / wall,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SmartSip digital twin")
+    parser.add_argument("--hours", type=float, default=1.0, help="simulated time per policy")
+    parser.add_argument("--rate", type=float, default=90, help="orders per hour")
+    parser.add_argument("--policy", nargs='*', choices=sorted(POLICIES), help="policies to run (default all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    for key, value in HARDWARE.items():
+        parser.add_argument("--" + key.replace('_', '-'), type=type(value), default=value)
+    args = parser.parse_args()
+
+    # node output is kept in the log history only, the report is what gets printed
+    log.configure(echo=log.OFF)
+
+    hw = {key: getattr(args, key) for key in HARDWARE}
+    report = {name: run_policy(POLICIES[name], args.hours, args.rate, hw, args.seed) for name in (args.policy or POLICIES)}
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)